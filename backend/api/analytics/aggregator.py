@@ -3,7 +3,9 @@ Data aggregation utilities for analytics dashboard.
 Processes raw metrics and events into aggregated statistics for efficient display.
 """
 
+from django.db import transaction
 from django.db.models import Avg, Count, Max, F, Q, Sum
+from django.db.models.functions import TruncDate
 from django.contrib.auth.models import User
 from django.utils import timezone
 import datetime
@@ -18,6 +20,7 @@ from .models import (
     QueryTypeAggregate,
     SecurityEvent
 )
+from .rollups import summarize_by_day
 
 
 class MetricsAggregator:
@@ -26,6 +29,8 @@ class MetricsAggregator:
     Used for generating dashboard data and scheduled reports.
     """
     
+    SYSTEM_METRIC_TYPES = ['cpu_usage', 'memory_usage', 'vector_search_time', 'llm_generation_time']
+    
     @classmethod
     def aggregate_daily_metrics(cls, date=None):
         """
@@ -36,119 +41,185 @@ class MetricsAggregator:
             # Default to yesterday
             date = (timezone.now() - datetime.timedelta(days=1)).date()
         
-        # Define date range for the day
-        start_datetime = datetime.datetime.combine(date, datetime.time.min)
-        end_datetime = datetime.datetime.combine(date, datetime.time.max)
-        
-        # Get or create the daily aggregate object
-        daily_agg, created = DailyMetricAggregate.objects.get_or_create(date=date)
+        return cls.aggregate_metrics_range(date, date)[0]
+    
+    @classmethod
+    def aggregate_metrics_range(cls, start_date, end_date):
+        """
+        Aggregate metrics for every day from start_date to end_date (inclusive).
+        Runs one grouped query per source table for the whole range, so the
+        cost does not grow with the number of days times the number of counters.
         
-        # Count total queries
-        query_logs = UserActivityLog.objects.filter(
-            activity_type='query',
-            timestamp__gte=start_datetime,
-            timestamp__lte=end_datetime
+        Returns:
+            list: DailyMetricAggregate objects, oldest first
+        """
+        start_datetime = timezone.make_aware(datetime.datetime.combine(start_date, datetime.time.min))
+        end_datetime = timezone.make_aware(
+            datetime.datetime.combine(end_date + datetime.timedelta(days=1), datetime.time.min)
         )
-        daily_agg.total_queries = query_logs.count()
         
-        # Count unique users
-        daily_agg.unique_users = UserActivityLog.objects.filter(
-            timestamp__gte=start_datetime,
-            timestamp__lte=end_datetime
-        ).values('user').distinct().count()
-        
-        # Calculate average response time
-        response_time_metrics = SystemMetric.objects.filter(
-            metric_type='response_time',
-            timestamp__gte=start_datetime,
-            timestamp__lte=end_datetime
+        activity = cls._daily_activity_counts(start_datetime, end_datetime)
+        audit_events = cls._daily_audit_counts(start_datetime, end_datetime)
+        metric_summaries = cls._daily_metric_summaries(
+            ['response_time'] + cls.SYSTEM_METRIC_TYPES, start_date, end_date
         )
-        if response_time_metrics.exists():
-            daily_agg.avg_response_time = response_time_metrics.aggregate(avg=Avg('value'))['avg']
-            daily_agg.max_response_time = response_time_metrics.aggregate(max=Max('value'))['max']
-        
-        # Count document uploads
-        daily_agg.document_uploads = UserActivityLog.objects.filter(
-            activity_type='document_upload',
-            timestamp__gte=start_datetime,
-            timestamp__lte=end_datetime
-        ).count()
         
-        # Count document views
-        daily_agg.document_views = UserActivityLog.objects.filter(
-            activity_type='document_view',
-            timestamp__gte=start_datetime,
-            timestamp__lte=end_datetime
-        ).count()
-        
-        # Count errors
-        daily_agg.error_count = UserActivityLog.objects.filter(
-            status='failure',
-            timestamp__gte=start_datetime,
-            timestamp__lte=end_datetime
-        ).count()
-        
-        # Count PII detections
-        daily_agg.pii_detection_count = AuditEvent.objects.filter(
-            event_type='pii_detection',
-            timestamp__gte=start_datetime,
-            timestamp__lte=end_datetime
-        ).count()
-        
-        # Additional metrics
-        daily_agg.metadata = cls._calculate_additional_metrics(start_datetime, end_datetime)
+        existing = {
+            agg.date: agg
+            for agg in DailyMetricAggregate.objects.filter(date__gte=start_date, date__lte=end_date)
+        }
         
-        # Save the updated aggregate
-        daily_agg.save()
+        aggregates = []
+        date = start_date
+        while date <= end_date:
+            daily_agg = existing.get(date) or DailyMetricAggregate(date=date)
+            day_activity = activity.get(date, {'unique_users': 0, 'errors': 0, 'types': {}})
+            day_events = audit_events.get(date, {})
+            
+            daily_agg.total_queries = day_activity['types'].get('query', 0)
+            daily_agg.unique_users = day_activity['unique_users']
+            daily_agg.document_uploads = day_activity['types'].get('document_upload', 0)
+            daily_agg.document_views = day_activity['types'].get('document_view', 0)
+            daily_agg.error_count = day_activity['errors']
+            daily_agg.pii_detection_count = day_events.get('pii_detection', 0)
+            
+            response_time = metric_summaries.get((date, 'response_time'))
+            if response_time:
+                daily_agg.avg_response_time = response_time['avg']
+                daily_agg.max_response_time = response_time['max']
+            
+            # Additional metrics
+            metadata = {}
+            system_metrics = {}
+            for metric_type in cls.SYSTEM_METRIC_TYPES:
+                summary = metric_summaries.get((date, metric_type))
+                if summary:
+                    system_metrics[metric_type] = {
+                        key: summary[key] for key in ('avg', 'max', 'p50', 'p95', 'p99') if key in summary
+                    }
+            if system_metrics:
+                metadata['system_metrics'] = system_metrics
+            if day_events:
+                metadata['security_events'] = day_events
+            if day_activity['types']:
+                metadata['user_activity'] = day_activity['types']
+            daily_agg.metadata = metadata
+            
+            aggregates.append(daily_agg)
+            date += datetime.timedelta(days=1)
+        
+        with transaction.atomic():
+            DailyMetricAggregate.objects.bulk_create([agg for agg in aggregates if agg.pk is None])
+            DailyMetricAggregate.objects.bulk_update(
+                [agg for agg in aggregates if agg.pk is not None],
+                [
+                    'total_queries', 'unique_users', 'avg_response_time', 'error_count',
+                    'pii_detection_count', 'document_views', 'document_uploads'
+                ]
+            )
         
-        return daily_agg
+        return aggregates
     
     @classmethod
-    def _calculate_additional_metrics(cls, start_datetime, end_datetime):
-        """Calculate additional metrics for the metadata field"""
-        metadata = {}
-        
-        # Add system component performance
-        system_metrics = {}
-        for metric_type in ['cpu_usage', 'memory_usage', 'vector_search_time', 'llm_generation_time']:
-            metrics = SystemMetric.objects.filter(
-                metric_type=metric_type,
-                timestamp__gte=start_datetime,
-                timestamp__lte=end_datetime
-            )
-            
-            if metrics.exists():
-                system_metrics[metric_type] = {
-                    'avg': metrics.aggregate(avg=Avg('value'))['avg'],
-                    'max': metrics.aggregate(max=Max('value'))['max'],
-                }
-        
-        if system_metrics:
-            metadata['system_metrics'] = system_metrics
+    def _daily_activity_counts(cls, start_datetime, end_datetime):
+        """
+        Per-day UserActivityLog counters in a single grouped query.
         
-        # Security events summary
-        security_events = AuditEvent.objects.filter(
+        Returns:
+            dict: date -> {'unique_users', 'errors', 'types': {activity_type: count}}
+        """
+        type_counts = {
+            f'type_{activity_type}': Count('id', filter=Q(activity_type=activity_type))
+            for activity_type, _ in UserActivityLog.ACTIVITY_TYPES
+        }
+        rows = UserActivityLog.objects.filter(
             timestamp__gte=start_datetime,
-            timestamp__lte=end_datetime
-        ).values('event_type').annotate(count=Count('id'))
-        
-        if security_events:
-            metadata['security_events'] = {
-                item['event_type']: item['count'] for item in security_events
+            timestamp__lt=end_datetime
+        ).annotate(day=TruncDate('timestamp')).values('day').annotate(
+            users=Count('user', distinct=True),
+            anonymous=Count('id', filter=Q(user__isnull=True)),
+            errors=Count('id', filter=Q(status='failure')),
+            **type_counts
+        ).order_by()
+        
+        activity = {}
+        for row in rows:
+            activity[row['day']] = {
+                # Anonymous activity counts as one distinct (null) user
+                'unique_users': row['users'] + (1 if row['anonymous'] else 0),
+                'errors': row['errors'],
+                'types': {
+                    activity_type: row[f'type_{activity_type}']
+                    for activity_type, _ in UserActivityLog.ACTIVITY_TYPES
+                    if row[f'type_{activity_type}']
+                },
             }
+        return activity
+    
+    @classmethod
+    def _daily_audit_counts(cls, start_datetime, end_datetime):
+        """
+        Per-day AuditEvent counts by event type in a single grouped query.
         
-        # User activity patterns
-        user_activity = UserActivityLog.objects.filter(
+        Returns:
+            dict: date -> {event_type: count}
+        """
+        type_counts = {
+            f'type_{event_type}': Count('id', filter=Q(event_type=event_type))
+            for event_type, _ in AuditEvent.EVENT_TYPES
+        }
+        rows = AuditEvent.objects.filter(
             timestamp__gte=start_datetime,
-            timestamp__lte=end_datetime
-        ).values('activity_type').annotate(count=Count('id'))
-        
-        if user_activity:
-            metadata['user_activity'] = {
-                item['activity_type']: item['count'] for item in user_activity
+            timestamp__lt=end_datetime
+        ).annotate(day=TruncDate('timestamp')).values('day').annotate(**type_counts).order_by()
+        
+        return {
+            row['day']: {
+                event_type: row[f'type_{event_type}']
+                for event_type, _ in AuditEvent.EVENT_TYPES
+                if row[f'type_{event_type}']
             }
+            for row in rows
+        }
+    
+    @classmethod
+    def _daily_metric_summaries(cls, metric_types, start_date, end_date):
+        """
+        Per-day SystemMetric summaries, read from the day rollup buckets.
+        Days without any rollup (recorded before rollups existed) fall back to
+        one grouped aggregate over the raw rows.
         
-        return metadata
+        Returns:
+            dict: (date, metric_type) -> summary dict
+        """
+        summaries = summarize_by_day(metric_types, start_date, end_date)
+        
+        covered_days = {day for day, _ in summaries}
+        missing_days = [
+            start_date + datetime.timedelta(days=offset)
+            for offset in range((end_date - start_date).days + 1)
+            if start_date + datetime.timedelta(days=offset) not in covered_days
+        ]
+        if not missing_days:
+            return summaries
+        
+        rows = SystemMetric.objects.filter(
+            metric_type__in=metric_types,
+            timestamp__gte=timezone.make_aware(datetime.datetime.combine(missing_days[0], datetime.time.min)),
+            timestamp__lt=timezone.make_aware(
+                datetime.datetime.combine(missing_days[-1] + datetime.timedelta(days=1), datetime.time.min)
+            )
+        ).annotate(day=TruncDate('timestamp')).values('day', 'metric_type').annotate(
+            count=Count('id'), avg=Avg('value'), max=Max('value')
+        ).order_by()
+        
+        missing = set(missing_days)
+        for row in rows:
+            if row['day'] in missing:
+                summaries[(row['day'], row['metric_type'])] = {
+                    'count': row['count'], 'avg': row['avg'], 'max': row['max']
+                }
+        return summaries
     
     @classmethod
     def aggregate_query_types(cls, date=None, num_days=1):
@@ -0,0 +1,242 @@
+"""
+Buffered, batched writes for high-volume analytics rows.
+
+Metrics and activity logs recorded on the request path are queued as unsaved
+model instances in a bounded in-process ring buffer. A background thread
+writes them with `bulk_create` whenever a batch fills up or the flush
+interval elapses, so request latency does not depend on database write
+latency. When the buffer is full the oldest queued rows are dropped and
+counted instead of blocking the request.
+"""
+
+import os
+import time
+import atexit
+import logging
+import threading
+from collections import deque, defaultdict
+from typing import Any, Callable, Dict
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class BackgroundFlusher:
+    """
+    Daemon thread that calls a flush function periodically, for the
+    in-process write-behind buffers.
+
+    Threads do not survive fork, so `ensure_running()` starts a new thread
+    in any process (e.g. a gunicorn or Celery worker) that has none running.
+    """
+
+    def __init__(self, flush: Callable[[], Any], interval: float, name: str,
+                 wait: Callable[[], None] = None):
+        """
+        Initialize the flusher. No thread is started until `ensure_running()`.
+
+        Args:
+            flush: Zero-argument callable writing pending data
+            interval (float): Seconds between flushes
+            name (str): Thread name, also used in log messages
+            wait (optional): Callable blocking until the next flush is due.
+                Defaults to sleeping `interval` seconds.
+        """
+        self.flush = flush
+        self.interval = interval
+        self.name = name
+        self._wait = wait or (lambda: time.sleep(self.interval))
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def ensure_running(self) -> None:
+        """Start the flush thread in this process if it is not running."""
+        pid = os.getpid()
+        if self._thread is not None and self._pid == pid and self._thread.is_alive():
+            return
+
+        with self._lock:
+            if self._thread is not None and self._pid == pid and self._thread.is_alive():
+                return
+            self._pid = pid
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        from django.db import close_old_connections
+
+        while True:
+            self._wait()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Background flush ({self.name}) failed: {e}")
+            finally:
+                close_old_connections()
+
+
+class MetricBuffer:
+    """
+    Bounded ring buffer of unsaved model instances with a background flusher.
+    """
+
+    def __init__(self, max_size: int = None, batch_size: int = None, flush_interval_ms: int = None):
+        """
+        Initialize the buffer.
+
+        Args:
+            max_size (int, optional): Maximum queued rows before the oldest are dropped
+            batch_size (int, optional): Queued rows that trigger an early flush,
+                and rows per bulk INSERT
+            flush_interval_ms (int, optional): Maximum time a row waits before being written
+        """
+        self.max_size = max_size or getattr(settings, 'ANALYTICS_BUFFER_MAX_SIZE', 10000)
+        self.batch_size = batch_size or getattr(settings, 'ANALYTICS_BUFFER_BATCH_SIZE', 500)
+        self.flush_interval = (flush_interval_ms or getattr(settings, 'ANALYTICS_BUFFER_FLUSH_MS', 1000)) / 1000.0
+
+        self._queue = deque()
+        self._condition = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._flusher = BackgroundFlusher(
+            self.flush, self.flush_interval, "analytics-buffer-flusher", wait=self._wait_for_batch
+        )
+
+        self.enqueued = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.flushes = 0
+
+    def __len__(self):
+        return len(self._queue)
+
+    def add(self, instance) -> None:
+        """
+        Queue an unsaved model instance for writing.
+
+        Args:
+            instance: Unsaved Django model instance
+        """
+        with self._condition:
+            if len(self._queue) >= self.max_size:
+                # Backpressure: shed the oldest row rather than block the request
+                self._queue.popleft()
+                self.dropped += 1
+                if self.dropped % 1000 == 1:
+                    logger.warning(f"Analytics buffer full; {self.dropped} rows dropped so far")
+            self._queue.append(instance)
+            self.enqueued += 1
+            if len(self._queue) >= self.batch_size:
+                self._condition.notify()
+
+        self._flusher.ensure_running()
+
+    def flush(self) -> int:
+        """
+        Write everything queued so far.
+
+        Returns:
+            int: Number of rows written
+        """
+        with self._flush_lock:
+            with self._condition:
+                pending, self._queue = self._queue, deque()
+            if not pending:
+                return 0
+
+            by_model = defaultdict(list)
+            for instance in pending:
+                by_model[type(instance)].append(instance)
+
+            written = 0
+            for model, instances in by_model.items():
+                try:
+                    model.objects.bulk_create(instances, batch_size=self.batch_size)
+                    written += len(instances)
+                    _update_rollups(model, instances)
+                except Exception as e:
+                    self.failed += len(instances)
+                    logger.error(f"Error writing {len(instances)} buffered {model.__name__} rows: {e}")
+
+            self.written += written
+            self.flushes += 1
+            return written
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Get buffer counters.
+
+        Returns:
+            dict: Queue depth and enqueued/written/dropped/failed/flush counters
+        """
+        return {
+            'queued': len(self._queue),
+            'enqueued': self.enqueued,
+            'written': self.written,
+            'dropped': self.dropped,
+            'failed': self.failed,
+            'flushes': self.flushes,
+        }
+
+    def _wait_for_batch(self) -> None:
+        # Flush early once a full batch is queued
+        deadline = time.monotonic() + self.flush_interval
+        with self._condition:
+            while len(self._queue) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+
+
+_metric_buffer = None
+_metric_buffer_lock = threading.Lock()
+
+
+def get_metric_buffer() -> MetricBuffer:
+    """
+    Get the process-wide analytics write buffer.
+
+    Returns:
+        MetricBuffer: Shared buffer instance
+    """
+    global _metric_buffer
+
+    if _metric_buffer is None:
+        with _metric_buffer_lock:
+            if _metric_buffer is None:
+                _metric_buffer = MetricBuffer()
+                atexit.register(_metric_buffer.flush)
+
+    return _metric_buffer
+
+
+def buffered_create(model, **fields):
+    """
+    Drop-in replacement for `model.objects.create(**fields)` on hot paths.
+    The row is written asynchronously when ANALYTICS_BUFFERED_WRITES is on.
+
+    Args:
+        model: Django model class
+        **fields: Field values for the new row
+
+    Returns:
+        The (possibly not yet saved) model instance
+    """
+    instance = model(**fields)
+    if getattr(settings, 'ANALYTICS_BUFFERED_WRITES', True):
+        get_metric_buffer().add(instance)
+    else:
+        instance.save()
+        _update_rollups(model, [instance])
+    return instance
+
+
+def _update_rollups(model, instances) -> None:
+    # SystemMetric rows also feed the minute/hour/day rollup buckets
+    from .models import SystemMetric
+    if model is SystemMetric and getattr(settings, 'METRIC_ROLLUPS_ENABLED', True):
+        from .rollups import update_rollups
+        update_rollups(instances)
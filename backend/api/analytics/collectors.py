@@ -12,6 +12,7 @@ from django.conf import settings
 from django.db import transaction
 from django.contrib.auth.models import User, AnonymousUser
 
+from .buffer import buffered_create
 from .models import (
     SystemMetric,
     AuditEvent,
@@ -50,7 +51,8 @@ class MetricsCollector:
         })
         
         try:
-            SystemMetric.objects.create(
+            buffered_create(
+                SystemMetric,
                 metric_type='response_time',
                 value=time_ms,
                 unit='ms',
@@ -79,7 +81,8 @@ class MetricsCollector:
         })
         
         try:
-            SystemMetric.objects.create(
+            buffered_create(
+                SystemMetric,
                 metric_type='query_latency',
                 value=latency_ms,
                 unit='ms',
@@ -111,7 +114,8 @@ class MetricsCollector:
         })
         
         try:
-            SystemMetric.objects.create(
+            buffered_create(
+                SystemMetric,
                 metric_type='llm_generation_time',
                 value=time_ms,
                 unit='ms',
@@ -142,7 +146,8 @@ class MetricsCollector:
         })
         
         try:
-            SystemMetric.objects.create(
+            buffered_create(
+                SystemMetric,
                 metric_type='vector_search_time',
                 value=time_ms,
                 unit='ms',
@@ -164,7 +169,8 @@ class MetricsCollector:
             
             # CPU usage
             cpu_percent = psutil.cpu_percent(interval=1)
-            SystemMetric.objects.create(
+            buffered_create(
+                SystemMetric,
                 metric_type='cpu_usage',
                 value=cpu_percent,
                 unit='%'
@@ -172,7 +178,8 @@ class MetricsCollector:
             
             # Memory usage
             memory = psutil.virtual_memory()
-            SystemMetric.objects.create(
+            buffered_create(
+                SystemMetric,
                 metric_type='memory_usage',
                 value=memory.percent,
                 unit='%',
@@ -185,7 +192,8 @@ class MetricsCollector:
             
             # Disk usage
             disk = psutil.disk_usage('/')
-            SystemMetric.objects.create(
+            buffered_create(
+                SystemMetric,
                 metric_type='disk_usage',
                 value=disk.percent,
                 unit='%',
@@ -233,7 +241,8 @@ class ActivityCollector:
             # Don't store user object for anonymous users
             user_obj = None if isinstance(user, AnonymousUser) else user
             
-            UserActivityLog.objects.create(
+            buffered_create(
+                UserActivityLog,
                 user=user_obj,
                 activity_type=activity_type,
                 timestamp=timezone.now(),
@@ -4,13 +4,15 @@ Tracks response times, user activity, and provides data for the analytics dashbo
 """
 
 import time
-import json
 import uuid
 from django.utils import timezone
 from django.utils.deprecation import MiddlewareMixin
 from django.contrib.auth.models import AnonymousUser
 from django.conf import settings
 
+from api.security.request_context import get_request_context, get_route_classifier
+
+from .buffer import buffered_create
 from .models import UserActivityLog, SystemMetric, AuditEvent
 
 
@@ -20,6 +22,17 @@ class AnalyticsMiddleware(MiddlewareMixin):
     Tracks response times, request patterns, and user activity.
     """
     
+    SKIP_PREFIXES = [
+        '/static/',
+        '/favicon.ico',
+        '/admin/jsi18n/',
+        '/__debug__/',  # Django Debug Toolbar
+    ]
+    
+    def __init__(self, get_response=None):
+        super().__init__(get_response)
+        get_route_classifier().register('analytics_skipped', self.SKIP_PREFIXES)
+    
     def process_request(self, request):
         # Add start time to request
         request.analytics_start_time = time.time()
@@ -54,18 +67,13 @@ class AnalyticsMiddleware(MiddlewareMixin):
     
     def _should_skip_analytics(self, path):
         """Determine if analytics should be skipped for this path"""
-        skip_prefixes = [
-            '/static/',
-            '/favicon.ico',
-            '/admin/jsi18n/',
-            '/__debug__/',  # Django Debug Toolbar
-        ]
-        return any(path.startswith(prefix) for prefix in skip_prefixes)
+        return 'analytics_skipped' in get_route_classifier().classify(path)
     
     def _record_metrics(self, request, response, response_time):
-        """Record system metrics for this request/response"""
+        """Record system metrics for this request/response (written in the background)"""
         # Record response time metric
-        SystemMetric.objects.create(
+        buffered_create(
+            SystemMetric,
             metric_type='response_time',
             value=response_time,
             unit='ms',
@@ -94,7 +102,8 @@ class AnalyticsMiddleware(MiddlewareMixin):
             metadata = self._extract_metadata(request, response)
             
             # Create the activity log
-            UserActivityLog.objects.create(
+            buffered_create(
+                UserActivityLog,
                 user=request.user if not isinstance(request.user, AnonymousUser) else None,
                 activity_type=activity_type,
                 ip_address=self._get_client_ip(request),
@@ -169,18 +178,15 @@ class AnalyticsMiddleware(MiddlewareMixin):
         }
         
         # Attempt to extract query text from request body for chat/query endpoints
-        if request.method == 'POST' and hasattr(request, 'body'):
-            try:
-                if request.content_type == 'application/json':
-                    body = json.loads(request.body.decode('utf-8'))
-                    if 'query' in body:
-                        metadata['query_text'] = body['query']
-                    elif 'question' in body:
-                        metadata['query_text'] = body['question']
-                    elif 'message' in body:
-                        metadata['query_text'] = body['message']
-            except (json.JSONDecodeError, UnicodeDecodeError):
-                pass
+        if request.method == 'POST':
+            body = get_request_context(request).json_body
+            if isinstance(body, dict):
+                if 'query' in body:
+                    metadata['query_text'] = body['query']
+                elif 'question' in body:
+                    metadata['query_text'] = body['question']
+                elif 'message' in body:
+                    metadata['query_text'] = body['message']
         
         # Add user agent info
         if 'HTTP_USER_AGENT' in request.META:
@@ -190,12 +196,7 @@ class AnalyticsMiddleware(MiddlewareMixin):
     
     def _get_client_ip(self, request):
         """Get client IP from request"""
-        x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-        if x_forwarded_for:
-            ip = x_forwarded_for.split(',')[0]
-        else:
-            ip = request.META.get('REMOTE_ADDR')
-        return ip
+        return get_request_context(request).client_ip
     
     def _is_security_relevant(self, request, response):
         """Determine if this request/response is security relevant for audit logging"""
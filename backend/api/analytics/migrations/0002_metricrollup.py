@@ -0,0 +1,67 @@
+# Generated by Django 4.2.10 on 2026-10-18 10:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api_analytics", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="MetricRollup",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "metric_type",
+                    models.CharField(
+                        choices=[
+                            ("response_time", "Response Time"),
+                            ("cpu_usage", "CPU Usage"),
+                            ("memory_usage", "Memory Usage"),
+                            ("db_query_time", "Database Query Time"),
+                            ("vector_search_time", "Vector Search Time"),
+                            ("llm_generation_time", "LLM Generation Time"),
+                            ("embedding_generation_time", "Embedding Generation Time"),
+                            ("cache_hit_rate", "Cache Hit Rate"),
+                            ("error_rate", "Error Rate"),
+                        ],
+                        max_length=50,
+                    ),
+                ),
+                (
+                    "granularity",
+                    models.CharField(
+                        choices=[("minute", "Minute"), ("hour", "Hour"), ("day", "Day")],
+                        max_length=10,
+                    ),
+                ),
+                ("bucket_start", models.DateTimeField()),
+                ("count", models.PositiveIntegerField(default=0)),
+                ("total", models.FloatField(default=0.0)),
+                ("min_value", models.FloatField(blank=True, null=True)),
+                ("max_value", models.FloatField(blank=True, null=True)),
+                ("sketch", models.JSONField(blank=True, default=dict)),
+            ],
+            options={
+                "ordering": ["-bucket_start"],
+                "indexes": [
+                    models.Index(
+                        fields=["granularity", "bucket_start"],
+                        name="api_analyti_granula_b6706a_idx",
+                    )
+                ],
+                "unique_together": {("metric_type", "granularity", "bucket_start")},
+            },
+        ),
+    ]
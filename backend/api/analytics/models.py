@@ -43,6 +43,43 @@ class SystemMetric(models.Model):
         return f"{self.metric_type}: {self.value} {self.unit} ({self.timestamp.strftime('%Y-%m-%d %H:%M')})"
 
 
+class MetricRollup(models.Model):
+    """
+    Model for pre-aggregated SystemMetric time buckets.
+    Updated incrementally as metrics are written, so dashboards and daily
+    aggregation read a handful of buckets instead of scanning raw metrics.
+    """
+    
+    GRANULARITIES = (
+        ('minute', 'Minute'),
+        ('hour', 'Hour'),
+        ('day', 'Day'),
+    )
+    
+    metric_type = models.CharField(max_length=50, choices=SystemMetric.METRIC_TYPES)
+    granularity = models.CharField(max_length=10, choices=GRANULARITIES)
+    bucket_start = models.DateTimeField()
+    count = models.PositiveIntegerField(default=0)
+    total = models.FloatField(default=0.0)
+    min_value = models.FloatField(null=True, blank=True)
+    max_value = models.FloatField(null=True, blank=True)
+    sketch = models.JSONField(default=dict, blank=True)  # Mergeable quantile sketch (see rollups.QuantileSketch)
+    
+    class Meta:
+        unique_together = ['metric_type', 'granularity', 'bucket_start']
+        indexes = [
+            models.Index(fields=['granularity', 'bucket_start']),
+        ]
+        ordering = ['-bucket_start']
+    
+    def __str__(self):
+        return f"{self.metric_type} {self.granularity} rollup ({self.bucket_start.strftime('%Y-%m-%d %H:%M')}): {self.count}"
+    
+    @property
+    def avg_value(self):
+        return self.total / self.count if self.count else None
+
+
 class AuditEvent(models.Model):
     """
     Model for storing audit events.
@@ -15,6 +15,7 @@ import threading
 import traceback
 
 from .models import SystemMetric, SystemStatusLog
+from .rollups import update_rollups
 
 logger = logging.getLogger(__name__)
 
@@ -110,6 +111,8 @@ class SystemMonitor:
             
             # Save all metrics
             SystemMetric.objects.bulk_create(metrics)
+            if getattr(settings, 'METRIC_ROLLUPS_ENABLED', True):
+                update_rollups(metrics)
             return metrics
         except Exception as e:
             logger.error(f"Error collecting system metrics: {e}")
@@ -379,6 +382,7 @@ class SystemMonitor:
             tuple: (status, message, details)
         """
         from ..offline import get_llm_client, is_offline_mode
+        from ..llm.clients import get_client_registry
         
         try:
             # Get LLM client
@@ -404,6 +408,7 @@ class SystemMonitor:
                         'query_time_ms': query_time_ms,
                         'mode': 'online',
                         'model': settings.OPENAI_MODEL,
+                        'connections': get_client_registry().stats(),
                     }
                     
                     if query_time_ms > 1000:  # More than 1 second is slow
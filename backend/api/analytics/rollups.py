@@ -0,0 +1,460 @@
+"""
+Incremental time-series rollups for SystemMetric.
+
+Every metric written through the analytics buffer (or the system monitor) is
+folded into per-minute, per-hour and per-day MetricRollup buckets holding
+count, sum, min, max and a mergeable quantile sketch. Summaries over any
+time range are answered by merging the coarsest buckets that tile the range,
+so reads cost O(buckets) instead of O(raw metrics).
+"""
+
+import math
+import logging
+import datetime
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import MetricRollup, SystemMetric
+
+logger = logging.getLogger(__name__)
+
+GRANULARITY_STEPS = {
+    'minute': datetime.timedelta(minutes=1),
+    'hour': datetime.timedelta(hours=1),
+    'day': datetime.timedelta(days=1),
+}
+
+# Coarsest first; used to tile a time range with as few buckets as possible
+GRANULARITY_ORDER = ('day', 'hour', 'minute')
+
+DEFAULT_QUANTILES = (0.5, 0.95, 0.99)
+
+
+class QuantileSketch:
+    """
+    Log-bucketed histogram with bounded relative error (DDSketch-style).
+
+    Values are counted in buckets whose bounds grow geometrically by
+    gamma = (1 + a) / (1 - a), so every quantile estimate is within a
+    relative error `a` of the true value. Sketches merge by adding bucket
+    counts, which makes minute buckets combinable into hours and days.
+    """
+
+    # Values closer to zero than this are counted in the zero bucket
+    MIN_INDEXABLE = 1e-9
+    MAX_BINS = 2048
+
+    def __init__(self, relative_accuracy: float = 0.01):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.positive: Dict[int, int] = defaultdict(int)
+        self.negative: Dict[int, int] = defaultdict(int)
+        self.zero_count = 0
+
+    @property
+    def count(self) -> int:
+        return sum(self.positive.values()) + sum(self.negative.values()) + self.zero_count
+
+    def _key(self, magnitude: float) -> int:
+        return int(math.ceil(math.log(magnitude) / self._log_gamma))
+
+    def _value(self, key: int) -> float:
+        return 2 * self.gamma ** key / (self.gamma + 1)
+
+    def add(self, value: float, count: int = 1) -> None:
+        if value > self.MIN_INDEXABLE:
+            self.positive[self._key(value)] += count
+        elif value < -self.MIN_INDEXABLE:
+            self.negative[self._key(-value)] += count
+        else:
+            self.zero_count += count
+        self._collapse(self.positive)
+        self._collapse(self.negative)
+
+    def merge(self, other: "QuantileSketch") -> None:
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("Cannot merge sketches with different relative accuracy")
+        for key, count in other.positive.items():
+            self.positive[key] += count
+        for key, count in other.negative.items():
+            self.negative[key] += count
+        self.zero_count += other.zero_count
+        self._collapse(self.positive)
+        self._collapse(self.negative)
+
+    def _collapse(self, bins: Dict[int, int]) -> None:
+        # Keep storage bounded by folding the smallest magnitudes together
+        if len(bins) <= self.MAX_BINS:
+            return
+        keys = sorted(bins)
+        overflow = keys[:len(keys) - self.MAX_BINS + 1]
+        folded = sum(bins.pop(key) for key in overflow)
+        bins[keys[len(overflow)]] += folded
+
+    def quantile(self, q: float) -> Optional[float]:
+        """
+        Estimate a quantile.
+
+        Args:
+            q (float): Quantile in [0, 1]
+
+        Returns:
+            float: Estimated value, or None for an empty sketch
+        """
+        total = self.count
+        if total == 0:
+            return None
+
+        rank = q * (total - 1)
+        seen = 0
+        for key in sorted(self.negative, reverse=True):
+            seen += self.negative[key]
+            if seen > rank:
+                return -self._value(key)
+        seen += self.zero_count
+        if seen > rank:
+            return 0.0
+        for key in sorted(self.positive):
+            seen += self.positive[key]
+            if seen > rank:
+                return self._value(key)
+        return self._value(max(self.positive)) if self.positive else 0.0
+
+    def to_dict(self) -> Dict:
+        return {
+            'a': self.relative_accuracy,
+            'p': {str(key): count for key, count in self.positive.items()},
+            'n': {str(key): count for key, count in self.negative.items()},
+            'z': self.zero_count,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict]) -> "QuantileSketch":
+        data = data or {}
+        sketch = cls(data.get('a', getattr(settings, 'METRIC_ROLLUP_SKETCH_ACCURACY', 0.01)))
+        for key, count in data.get('p', {}).items():
+            sketch.positive[int(key)] = count
+        for key, count in data.get('n', {}).items():
+            sketch.negative[int(key)] = count
+        sketch.zero_count = data.get('z', 0)
+        return sketch
+
+
+class _BucketStats:
+    """In-memory accumulator for one rollup bucket."""
+
+    def __init__(self, sketch: QuantileSketch = None):
+        self.count = 0
+        self.total = 0.0
+        self.min_value = None
+        self.max_value = None
+        self.sketch = sketch or QuantileSketch(getattr(settings, 'METRIC_ROLLUP_SKETCH_ACCURACY', 0.01))
+
+    def add(self, value: float) -> None:
+        self.count += 1
+        self.total += value
+        self.min_value = value if self.min_value is None else min(self.min_value, value)
+        self.max_value = value if self.max_value is None else max(self.max_value, value)
+        self.sketch.add(value)
+
+    def merge_row(self, row: MetricRollup) -> None:
+        self.count += row.count
+        self.total += row.total
+        if row.min_value is not None:
+            self.min_value = row.min_value if self.min_value is None else min(self.min_value, row.min_value)
+        if row.max_value is not None:
+            self.max_value = row.max_value if self.max_value is None else max(self.max_value, row.max_value)
+        self.sketch.merge(QuantileSketch.from_dict(row.sketch))
+
+    def apply_to(self, row: MetricRollup) -> None:
+        sketch = QuantileSketch.from_dict(row.sketch)
+        sketch.merge(self.sketch)
+        row.count += self.count
+        row.total += self.total
+        row.min_value = self.min_value if row.min_value is None else min(row.min_value, self.min_value)
+        row.max_value = self.max_value if row.max_value is None else max(row.max_value, self.max_value)
+        row.sketch = sketch.to_dict()
+
+    def summary(self, quantiles: Iterable[float] = DEFAULT_QUANTILES) -> Dict:
+        result = {
+            'count': self.count,
+            'sum': self.total,
+            'avg': self.total / self.count if self.count else None,
+            'min': self.min_value,
+            'max': self.max_value,
+        }
+        for q in quantiles:
+            result[f'p{int(round(q * 100))}'] = self.sketch.quantile(q)
+        return result
+
+
+def bucket_floor(timestamp: datetime.datetime, granularity: str) -> datetime.datetime:
+    """
+    Truncate a timestamp to the start of its bucket (UTC).
+
+    Args:
+        timestamp (datetime): Timestamp, naive values are taken as the default timezone
+        granularity (str): 'minute', 'hour' or 'day'
+
+    Returns:
+        datetime: Aware bucket start
+    """
+    if timezone.is_naive(timestamp):
+        timestamp = timezone.make_aware(timestamp)
+    timestamp = timestamp.astimezone(datetime.timezone.utc)
+    if granularity == 'minute':
+        return timestamp.replace(second=0, microsecond=0)
+    if granularity == 'hour':
+        return timestamp.replace(minute=0, second=0, microsecond=0)
+    return timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _bucket_ceil(timestamp: datetime.datetime, granularity: str) -> datetime.datetime:
+    floor = bucket_floor(timestamp, granularity)
+    return floor if floor == timestamp else floor + GRANULARITY_STEPS[granularity]
+
+
+def update_rollups(metrics: Iterable[SystemMetric]) -> int:
+    """
+    Fold newly written metrics into their minute, hour and day buckets.
+
+    Args:
+        metrics: SystemMetric instances (saved or about to be saved)
+
+    Returns:
+        int: Number of buckets updated
+    """
+    deltas: Dict[Tuple[str, str, datetime.datetime], _BucketStats] = {}
+    for metric in metrics:
+        if metric.value is None:
+            continue
+        timestamp = metric.timestamp or timezone.now()
+        for granularity in GRANULARITY_ORDER:
+            key = (metric.metric_type, granularity, bucket_floor(timestamp, granularity))
+            if key not in deltas:
+                deltas[key] = _BucketStats()
+            deltas[key].add(metric.value)
+
+    if not deltas:
+        return 0
+
+    keys = sorted(deltas)
+    try:
+        with transaction.atomic():
+            # Create missing buckets first so concurrent writers lock the same rows
+            MetricRollup.objects.bulk_create(
+                [
+                    MetricRollup(metric_type=metric_type, granularity=granularity, bucket_start=bucket_start)
+                    for metric_type, granularity, bucket_start in keys
+                ],
+                ignore_conflicts=True
+            )
+
+            condition = Q()
+            for metric_type, granularity, bucket_start in keys:
+                condition |= Q(metric_type=metric_type, granularity=granularity, bucket_start=bucket_start)
+
+            # Consistent lock order avoids deadlocks between workers
+            rows = list(
+                MetricRollup.objects.select_for_update()
+                .filter(condition)
+                .order_by('metric_type', 'granularity', 'bucket_start')
+            )
+            for row in rows:
+                deltas[(row.metric_type, row.granularity, row.bucket_start)].apply_to(row)
+
+            MetricRollup.objects.bulk_update(rows, ['count', 'total', 'min_value', 'max_value', 'sketch'])
+    except Exception as e:
+        logger.error(f"Error updating metric rollups: {e}")
+        return 0
+
+    return len(rows)
+
+
+def plan_buckets(start: datetime.datetime, end: datetime.datetime) -> List[Tuple[str, datetime.datetime, datetime.datetime]]:
+    """
+    Tile [start, end) with the coarsest buckets available.
+
+    Full days are read from day buckets, the remaining full hours from hour
+    buckets, and the edges from minute buckets.
+
+    Returns:
+        list: (granularity, first bucket_start, end bucket_start exclusive) ranges
+    """
+    plan = []
+
+    def cover(low, high, levels):
+        if low >= high:
+            return
+        granularity, finer = levels[0], levels[1:]
+        if not finer:
+            plan.append((granularity, bucket_floor(low, granularity), high))
+            return
+        aligned_low = _bucket_ceil(low, granularity)
+        aligned_high = bucket_floor(high, granularity)
+        if aligned_low < aligned_high:
+            plan.append((granularity, aligned_low, aligned_high))
+            cover(low, aligned_low, finer)
+            cover(aligned_high, high, finer)
+        else:
+            cover(low, high, finer)
+
+    if timezone.is_naive(start):
+        start = timezone.make_aware(start)
+    if timezone.is_naive(end):
+        end = timezone.make_aware(end)
+    cover(start, end, GRANULARITY_ORDER)
+    return plan
+
+
+def summarize_metrics(metric_types: Iterable[str], start: datetime.datetime, end: datetime.datetime,
+                      quantiles: Iterable[float] = DEFAULT_QUANTILES) -> Dict[str, Dict]:
+    """
+    Summarize metrics over [start, end) from rollup buckets.
+
+    Args:
+        metric_types: Metric types to summarize
+        start (datetime): Range start (inclusive)
+        end (datetime): Range end (exclusive)
+        quantiles: Quantiles to estimate
+
+    Returns:
+        dict: metric_type -> {count, sum, avg, min, max, p50, p95, p99}; types
+            without data in the range are omitted
+    """
+    plan = plan_buckets(start, end)
+    if not plan:
+        return {}
+
+    condition = Q()
+    for granularity, bucket_from, bucket_to in plan:
+        condition |= Q(granularity=granularity, bucket_start__gte=bucket_from, bucket_start__lt=bucket_to)
+
+    stats = defaultdict(_BucketStats)
+    for row in MetricRollup.objects.filter(metric_type__in=list(metric_types)).filter(condition):
+        stats[row.metric_type].merge_row(row)
+
+    return {
+        metric_type: bucket.summary(quantiles)
+        for metric_type, bucket in stats.items()
+        if bucket.count
+    }
+
+
+def summarize_by_day(metric_types: Iterable[str], start_date: datetime.date, end_date: datetime.date,
+                     quantiles: Iterable[float] = DEFAULT_QUANTILES) -> Dict[Tuple[datetime.date, str], Dict]:
+    """
+    Summarize metrics per UTC day for an inclusive date range in one query.
+
+    Args:
+        metric_types: Metric types to summarize
+        start_date (date): First day
+        end_date (date): Last day (inclusive)
+        quantiles: Quantiles to estimate
+
+    Returns:
+        dict: (date, metric_type) -> summary dict; days without data are omitted
+    """
+    start = datetime.datetime.combine(start_date, datetime.time.min, tzinfo=datetime.timezone.utc)
+    end = datetime.datetime.combine(end_date + datetime.timedelta(days=1), datetime.time.min,
+                                    tzinfo=datetime.timezone.utc)
+
+    summaries = {}
+    rows = MetricRollup.objects.filter(
+        metric_type__in=list(metric_types),
+        granularity='day',
+        bucket_start__gte=start,
+        bucket_start__lt=end
+    )
+    for row in rows:
+        bucket = _BucketStats()
+        bucket.merge_row(row)
+        if bucket.count:
+            summaries[(row.bucket_start.date(), row.metric_type)] = bucket.summary(quantiles)
+    return summaries
+
+
+def metric_series(metric_type: str, start: datetime.datetime, end: datetime.datetime,
+                  granularity: str = 'minute', quantiles: Iterable[float] = DEFAULT_QUANTILES) -> List[Dict]:
+    """
+    Time series of bucket summaries for one metric type.
+
+    Returns:
+        list: One summary dict per non-empty bucket, with `timestamp`, oldest first
+    """
+    rows = MetricRollup.objects.filter(
+        metric_type=metric_type,
+        granularity=granularity,
+        bucket_start__gte=bucket_floor(start, granularity),
+        bucket_start__lt=end
+    ).order_by('bucket_start')
+
+    series = []
+    for row in rows:
+        bucket = _BucketStats()
+        bucket.merge_row(row)
+        series.append({'timestamp': row.bucket_start, **bucket.summary(quantiles)})
+    return series
+
+
+def rebuild_rollups(start: datetime.datetime, end: datetime.datetime, chunk_size: int = 5000) -> int:
+    """
+    Rebuild all rollup buckets for whole days in [start, end) from raw metrics.
+
+    Args:
+        start (datetime): Range start; widened to the start of its day
+        end (datetime): Range end; widened to the end of its day
+        chunk_size (int): Raw metrics folded per database round trip
+
+    Returns:
+        int: Number of raw metrics processed
+    """
+    start = bucket_floor(start, 'day')
+    end = _bucket_ceil(end if timezone.is_aware(end) else timezone.make_aware(end), 'day')
+
+    MetricRollup.objects.filter(bucket_start__gte=start, bucket_start__lt=end).delete()
+
+    raw = (
+        SystemMetric.objects.filter(timestamp__gte=start, timestamp__lt=end)
+        .order_by('timestamp')
+        .only('metric_type', 'value', 'timestamp')
+    )
+
+    processed = 0
+    chunk = []
+    for metric in raw.iterator(chunk_size=chunk_size):
+        chunk.append(metric)
+        if len(chunk) >= chunk_size:
+            update_rollups(chunk)
+            processed += len(chunk)
+            chunk = []
+    if chunk:
+        update_rollups(chunk)
+        processed += len(chunk)
+
+    return processed
+
+
+def prune_rollups(now: datetime.datetime = None) -> int:
+    """
+    Delete fine-grained buckets past their retention period.
+    Day buckets are kept indefinitely.
+
+    Returns:
+        int: Number of buckets deleted
+    """
+    now = now or timezone.now()
+    minute_cutoff = now - datetime.timedelta(days=getattr(settings, 'METRIC_ROLLUP_MINUTE_RETENTION_DAYS', 7))
+    hour_cutoff = now - datetime.timedelta(days=getattr(settings, 'METRIC_ROLLUP_HOUR_RETENTION_DAYS', 90))
+
+    deleted, _ = MetricRollup.objects.filter(
+        Q(granularity='minute', bucket_start__lt=minute_cutoff) |
+        Q(granularity='hour', bucket_start__lt=hour_cutoff)
+    ).delete()
+    return deleted
@@ -10,6 +10,7 @@ import logging
 
 from .aggregator import MetricsAggregator
 from .models import SystemMetric, UserActivityLog, AuditEvent
+from .rollups import prune_rollups
 
 logger = logging.getLogger(__name__)
 
@@ -58,8 +59,11 @@ def cleanup_old_metrics(days_to_keep=90):
         logs_count = old_logs.count()
         old_logs.delete()
         
-        logger.info(f"Cleaned up {metrics_count} old metrics and {logs_count} activity logs")
-        return f"Cleaned up {metrics_count} metrics and {logs_count} logs"
+        # Expire fine-grained rollup buckets; day buckets are kept
+        rollups_count = prune_rollups()
+        
+        logger.info(f"Cleaned up {metrics_count} old metrics, {logs_count} activity logs and {rollups_count} rollup buckets")
+        return f"Cleaned up {metrics_count} metrics, {logs_count} logs and {rollups_count} rollups"
     except Exception as e:
         logger.error(f"Error cleaning up old metrics: {str(e)}")
         raise
@@ -76,9 +80,9 @@ def generate_weekly_report():
         start_date = end_date - datetime.timedelta(days=7)
         
         # Ensure all daily aggregates are calculated
+        MetricsAggregator.aggregate_metrics_range(end_date - datetime.timedelta(days=6), end_date)
         for i in range(7):
             date = end_date - datetime.timedelta(days=i)
-            MetricsAggregator.aggregate_daily_metrics(date)
             MetricsAggregator.aggregate_query_types(date)
         
         # Generate summary
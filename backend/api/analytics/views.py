@@ -11,18 +11,20 @@ from django.contrib.auth.decorators import user_passes_test
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import permissions, status
+from django.db.models import Count, Sum
 import datetime
 import json
 
 from .models import (
-    SystemMetric,
     AuditEvent,
     UserActivityLog,
     DailyMetricAggregate,
     QueryTypeAggregate,
-    SecurityEvent
+    SecurityEvent,
+    SystemStatusLog
 )
 from .aggregator import MetricsAggregator
+from .rollups import metric_series
 
 
 class DashboardDataView(APIView):
@@ -53,34 +55,21 @@ def system_health_view(request):
     end_time = timezone.now()
     start_time = end_time - datetime.timedelta(hours=6)
     
-    # Get recent system metrics
-    cpu_metrics = SystemMetric.objects.filter(
-        metric_type='cpu_usage',
-        timestamp__gte=start_time,
-        timestamp__lte=end_time
-    ).order_by('timestamp')
-    
-    memory_metrics = SystemMetric.objects.filter(
-        metric_type='memory_usage',
-        timestamp__gte=start_time,
-        timestamp__lte=end_time
-    ).order_by('timestamp')
-    
-    # Format data for charts
+    # Get recent system metrics from the per-minute rollups
     cpu_data = [
         {
-            'timestamp': metric.timestamp.strftime('%Y-%m-%d %H:%M'),
-            'value': metric.value
+            'timestamp': bucket['timestamp'].strftime('%Y-%m-%d %H:%M'),
+            'value': bucket['avg']
         }
-        for metric in cpu_metrics
+        for bucket in metric_series('cpu_usage', start_time, end_time, 'minute')
     ]
     
     memory_data = [
         {
-            'timestamp': metric.timestamp.strftime('%Y-%m-%d %H:%M'),
-            'value': metric.value
+            'timestamp': bucket['timestamp'].strftime('%Y-%m-%d %H:%M'),
+            'value': bucket['avg']
         }
-        for metric in memory_metrics
+        for bucket in metric_series('memory_usage', start_time, end_time, 'minute')
     ]
     
     # Get latest metrics for each system component
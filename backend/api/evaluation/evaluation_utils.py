@@ -4,11 +4,9 @@ Utility functions for automated evaluation of the RAG system.
 
 import time
 import numpy as np
-from django.conf import settings
 from django.db import transaction
 from django.db.models import Avg, Count
 from django.utils import timezone
-from openai import OpenAI
 
 from ..models import (
     EvaluationSet,
@@ -17,6 +15,7 @@ from ..models import (
     QuestionResult
 )
 from ..ingestion.embeddings_utils import search_weaviate
+from ..llm.clients import get_openai_client
 
 # Import moved inside functions to avoid circular import
 # from ..views import QueryView
@@ -68,7 +67,7 @@ def evaluate_answer_relevance(answer, expected_answer):
     Returns:
         float: Relevance score between 0-1
     """
-    client = OpenAI(api_key=settings.OPENAI_API_KEY)
+    client = get_openai_client()
     
     # Prompt for evaluating answer relevance
     prompt = f"""
@@ -186,7 +185,7 @@ def run_evaluation(evaluation_set_id, use_hybrid=True, use_cache=False):
             selected_model = query_view.select_model(question.question_text, reranked_results)
             
             # Get answer from OpenAI
-            client = OpenAI(api_key=settings.OPENAI_API_KEY)
+            client = get_openai_client()
             response = client.chat.completions.create(
                 model=selected_model,
                 messages=[
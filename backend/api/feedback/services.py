@@ -5,6 +5,7 @@ Service layer for feedback processing and analysis.
 import datetime
 from django.utils import timezone
 from django.db.models import Count, Avg, F, Q, Sum
+from django.db.models.functions import TruncDate
 import json
 import logging
 
@@ -528,37 +529,37 @@ class FeedbackAnalysisService:
         """
         end_date = timezone.now().date()
         start_date = end_date - datetime.timedelta(days=days-1)
+        start_datetime = timezone.make_aware(datetime.datetime.combine(start_date, datetime.time.min))
+        
+        # One grouped query for the whole range, counting ratings per day
+        rows = EnhancedFeedback.objects.filter(
+            created_at__gte=start_datetime
+        ).annotate(day=TruncDate('created_at')).values('day').annotate(
+            total=Count('id'),
+            positive=Count('id', filter=Q(rating='thumbs_up')),
+            negative=Count('id', filter=Q(rating='thumbs_down')),
+            neutral=Count('id', filter=Q(rating='neutral'))
+        ).order_by()
+        counts_by_day = {row['day']: row for row in rows}
         
         daily_stats = []
         
         current_date = start_date
         while current_date <= end_date:
-            current_datetime = datetime.datetime.combine(current_date, datetime.time.min)
-            next_date = current_date + datetime.timedelta(days=1)
-            next_datetime = datetime.datetime.combine(next_date, datetime.time.min)
-            
-            # Get feedback for the day
-            day_feedback = EnhancedFeedback.objects.filter(
-                created_at__gte=current_datetime,
-                created_at__lt=next_datetime
-            )
-            
-            # Count by rating
-            total = day_feedback.count()
-            positive = day_feedback.filter(rating='thumbs_up').count()
-            negative = day_feedback.filter(rating='thumbs_down').count()
-            neutral = day_feedback.filter(rating='neutral').count()
+            counts = counts_by_day.get(current_date, {})
+            total = counts.get('total', 0)
+            positive = counts.get('positive', 0)
             
             # Add to results
             daily_stats.append({
                 'date': current_date.strftime('%Y-%m-%d'),
                 'total': total,
                 'positive': positive,
-                'negative': negative,
-                'neutral': neutral,
+                'negative': counts.get('negative', 0),
+                'neutral': counts.get('neutral', 0),
                 'positive_ratio': (positive / total * 100) if total > 0 else 0
             })
             
-            current_date = next_date
+            current_date += datetime.timedelta(days=1)
         
         return daily_stats
\ No newline at end of file
@@ -0,0 +1,315 @@
+"""
+Batched ingestion engine for loading document chunks into the vector store.
+
+Chunks are collected into batches, embedded with one multi-input request per
+batch (several batches in flight at once), and written with the Weaviate
+batch API. Request and token throughput are shaped with token buckets
+instead of fixed sleeps.
+"""
+
+import time
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, ALL_COMPLETED, FIRST_COMPLETED, wait
+from dataclasses import dataclass
+from typing import List, Dict, Any, Optional, Tuple
+
+from django.conf import settings
+
+from .embeddings_utils import get_embeddings_with_cache, get_weaviate_client
+from ..security.differential_privacy import protect_embedding_deterministic
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket.
+    Tokens refill continuously at `rate` per second up to `capacity`.
+    The balance can go negative after a request larger than the capacity.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        """
+        Initialize the bucket (starts full).
+
+        Args:
+            rate (float): Tokens added per second
+            capacity (float): Maximum number of stored tokens
+        """
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, tokens: float = 1.0) -> float:
+        """
+        Block until `tokens` are available, then consume them.
+        Requests larger than the capacity wait for a full bucket and leave it
+        in debt, so later requests wait until the overdraft has refilled and
+        the long-run rate still holds.
+
+        Args:
+            tokens (float): Number of tokens to consume
+
+        Returns:
+            float: Seconds spent waiting
+        """
+        tokens = float(tokens)
+        needed = min(tokens, self.capacity)
+        waited = 0.0
+
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= needed:
+                    self._tokens -= tokens
+                    return waited
+                delay = (needed - self._tokens) / self.rate
+
+            time.sleep(delay)
+            waited += delay
+
+
+@dataclass
+class IngestionStats:
+    """Throughput statistics for an ingestion run."""
+    chunks_submitted: int = 0
+    chunks_written: int = 0
+    chunks_failed: int = 0
+    embedding_requests: int = 0
+    rate_limit_wait_seconds: float = 0.0
+    elapsed_seconds: float = 0.0
+
+    @property
+    def chunks_per_second(self) -> float:
+        if self.elapsed_seconds <= 0:
+            return 0.0
+        return self.chunks_written / self.elapsed_seconds
+
+    def summary(self) -> str:
+        return (
+            f"{self.chunks_written} chunks written, {self.chunks_failed} failed, "
+            f"{self.embedding_requests} embedding requests in {self.elapsed_seconds:.1f}s "
+            f"({self.chunks_per_second:.1f} chunks/sec, "
+            f"{self.rate_limit_wait_seconds:.1f}s rate-limited)"
+        )
+
+
+class BatchIngestionEngine:
+    """
+    Collects chunks and ingests them in embedded batches.
+
+    Usage:
+        with BatchIngestionEngine() as engine:
+            for chunk in chunks:
+                engine.add_chunk(chunk, metadata)
+        print(engine.stats.summary())
+    """
+
+    def __init__(self, batch_size: int = None, max_workers: int = None,
+                 requests_per_minute: int = None, tokens_per_minute: int = None,
+                 class_name: str = "Document", max_retries: int = 3):
+        """
+        Initialize the ingestion engine.
+
+        Args:
+            batch_size (int, optional): Chunks per embedding request and vector-store batch
+            max_workers (int, optional): Concurrent embedding requests
+            requests_per_minute (int, optional): Embedding request rate limit
+            tokens_per_minute (int, optional): Embedding token rate limit
+            class_name (str): Vector store collection to write to
+            max_retries (int): Attempts per embedding batch before giving up
+        """
+        self.batch_size = batch_size or getattr(settings, 'INGESTION_BATCH_SIZE', 64)
+        self.max_workers = max_workers or getattr(settings, 'INGESTION_MAX_WORKERS', 4)
+        self.class_name = class_name
+        self.max_retries = max_retries
+
+        requests_per_minute = requests_per_minute or getattr(settings, 'EMBEDDING_REQUESTS_PER_MINUTE', 3000)
+        tokens_per_minute = tokens_per_minute or getattr(settings, 'EMBEDDING_TOKENS_PER_MINUTE', 1000000)
+        # Allow roughly one second worth of burst
+        self.request_bucket = TokenBucket(requests_per_minute / 60.0, max(1, requests_per_minute / 60.0))
+        self.token_bucket = TokenBucket(tokens_per_minute / 60.0, max(1, tokens_per_minute / 60.0))
+
+        self.apply_dp = getattr(settings, 'ENABLE_DP_EMBEDDING_PROTECTION', False)
+        self.client = get_weaviate_client()
+        self.stats = IngestionStats()
+
+        self._pending: List[Tuple[str, Dict[str, Any]]] = []
+        self._in_flight = set()
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                            thread_name_prefix="ingest-embed")
+        self._stats_lock = threading.Lock()
+        self._start_time = None
+        self._closed = False
+        self._batch_errors = 0
+
+        if hasattr(self.client, 'batch'):
+            self.client.batch.configure(batch_size=self.batch_size, dynamic=False,
+                                        timeout_retries=3, callback=self._check_batch_results)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+    def add_chunk(self, content: str, metadata: Dict[str, Any]) -> None:
+        """
+        Queue a chunk for ingestion.
+
+        Args:
+            content (str): Text content of the chunk
+            metadata (dict): Metadata for the chunk (doc_type, title, author, etc.)
+        """
+        if self._closed:
+            raise RuntimeError("BatchIngestionEngine is closed")
+
+        if not content or not content.strip():
+            return
+
+        if self._start_time is None:
+            self._start_time = time.monotonic()
+
+        self._pending.append((content, metadata))
+        self.stats.chunks_submitted += 1
+
+        if len(self._pending) >= self.batch_size:
+            self._submit_pending()
+
+    def flush(self) -> None:
+        """Embed and write everything queued so far."""
+        if self._pending:
+            self._submit_pending()
+
+        while self._in_flight:
+            self._drain(return_when_any=False)
+
+        if self._start_time is not None:
+            self.stats.elapsed_seconds = time.monotonic() - self._start_time
+
+    def close(self) -> IngestionStats:
+        """
+        Flush remaining chunks and release worker threads.
+
+        Returns:
+            IngestionStats: Final throughput statistics
+        """
+        if self._closed:
+            return self.stats
+
+        try:
+            self.flush()
+        finally:
+            self._executor.shutdown(wait=True)
+            self._closed = True
+
+        logger.info(f"Batch ingestion finished: {self.stats.summary()}")
+        return self.stats
+
+    def _submit_pending(self) -> None:
+        batch, self._pending = self._pending, []
+
+        # Backpressure: keep at most two batches per worker in flight
+        while len(self._in_flight) >= self.max_workers * 2:
+            self._drain(return_when_any=True)
+
+        future = self._executor.submit(self._embed_batch, batch)
+        self._in_flight.add(future)
+
+    def _drain(self, return_when_any: bool) -> None:
+        done, _ = wait(self._in_flight, return_when=FIRST_COMPLETED if return_when_any else ALL_COMPLETED)
+        for future in done:
+            self._in_flight.discard(future)
+            batch, embeddings = future.result()
+            # Vector-store writes stay on the calling thread; the batch client is not thread-safe
+            self._write_batch(batch, embeddings)
+
+    def _embed_batch(self, batch: List[Tuple[str, Dict[str, Any]]]) -> Tuple[list, list]:
+        texts = [content for content, _ in batch]
+        # Rough approximation: 1 token ≈ 4 chars in English
+        estimated_tokens = sum(len(text) for text in texts) // 4 + 1
+
+        for attempt in range(1, self.max_retries + 1):
+            waited = self.request_bucket.acquire(1)
+            waited += self.token_bucket.acquire(estimated_tokens)
+
+            with self._stats_lock:
+                self.stats.embedding_requests += 1
+                self.stats.rate_limit_wait_seconds += waited
+
+            try:
+                return batch, get_embeddings_with_cache(texts)
+            except Exception as e:
+                if attempt == self.max_retries:
+                    logger.error(f"Embedding batch of {len(batch)} chunks failed: {e}")
+                    break
+                backoff = 2 ** attempt
+                logger.warning(f"Embedding batch failed (attempt {attempt}), retrying in {backoff}s: {e}")
+                time.sleep(backoff)
+
+        return batch, [[] for _ in batch]
+
+    def _protect(self, content: str, metadata: Dict[str, Any], embedding: list) -> list:
+        if not self.apply_dp:
+            return embedding
+        doc_id = f"{metadata.get('doc_type', 'unknown')}_{metadata.get('title', 'untitled')}"
+        content_hash = hashlib.sha256(content.encode()).hexdigest()
+        return protect_embedding_deterministic(embedding, doc_id, content_hash)
+
+    def _check_batch_results(self, results: Optional[list]) -> None:
+        """Weaviate batch callback: count objects the server rejected."""
+        for result in results or []:
+            errors = (result.get('result') or {}).get('errors')
+            if not errors:
+                continue
+            self._batch_errors += 1
+            messages = [error.get('message') for error in errors.get('error', [])]
+            logger.error(f"Weaviate rejected object {result.get('id')}: {'; '.join(filter(None, messages))}")
+
+    def _write_batch(self, batch: List[Tuple[str, Dict[str, Any]]], embeddings: list) -> None:
+        objects = []
+        for (content, metadata), embedding in zip(batch, embeddings):
+            if not embedding:
+                self.stats.chunks_failed += 1
+                continue
+            data_object = {"content": content, **metadata}
+            objects.append((data_object, self._protect(content, metadata, embedding)))
+
+        if not objects:
+            return
+
+        # Weaviate per-object errors do not raise; they are counted by the batch callback
+        self._batch_errors = 0
+        try:
+            if hasattr(self.client, 'batch'):
+                with self.client.batch as weaviate_batch:
+                    for data_object, vector in objects:
+                        weaviate_batch.add_data_object(
+                            data_object=data_object,
+                            class_name=self.class_name,
+                            vector=vector
+                        )
+            else:
+                # Local vector DB in offline mode writes the whole batch at once
+                written = self.client.add_many(
+                    self.class_name,
+                    [data_object for data_object, _ in objects],
+                    [vector for _, vector in objects]
+                )
+                if len(written) != len(objects):
+                    raise RuntimeError("local vector DB rejected the batch")
+            self.stats.chunks_written += len(objects) - self._batch_errors
+            self.stats.chunks_failed += self._batch_errors
+        except Exception as e:
+            logger.error(f"Error writing batch of {len(objects)} chunks to vector store: {e}")
+            self.stats.chunks_failed += len(objects)
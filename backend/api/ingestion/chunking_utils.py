@@ -100,6 +100,107 @@ def split_by_chapter(text):
     return chapters
 
 
+# Chapter headings such as "CHAPTER 1", "Chapter 1:", "CHAPTER IV."
+CHAPTER_HEADING_PATTERN = re.compile(r'(?i)CHAPTER\s+(\d+|[IVXLCDM]+)[\s\.:]*')
+
+
+class _WordWindow:
+    """
+    Sliding word window that emits the same chunks as chunk_text without
+    holding the whole text: a chunk is emitted as soon as chunk_size words
+    are buffered, then the window advances by chunk_size - chunk_overlap.
+    """
+    
+    def __init__(self, chunk_size, chunk_overlap):
+        self.chunk_size = chunk_size
+        self.step_size = chunk_size - chunk_overlap
+        self.words = []
+        self.emitted = False
+    
+    def feed(self, text):
+        self.words.extend(text.split())
+        while len(self.words) > self.chunk_size:
+            yield ' '.join(self.words[:self.chunk_size])
+            del self.words[:self.step_size]
+            self.emitted = True
+    
+    def finish(self):
+        if not self.emitted and len(self.words) <= self.chunk_size:
+            if self.words:
+                yield ' '.join(self.words)
+        else:
+            while self.words:
+                yield ' '.join(self.words[:self.chunk_size])
+                del self.words[:self.step_size]
+        self.words = []
+        self.emitted = False
+
+
+def iter_chunks(texts, chunk_size=None, chunk_overlap=None):
+    """
+    Streaming counterpart of chunk_text for text that arrives in pieces
+    (e.g. PDF pages). Memory is bounded by the chunk window, not the text.
+    
+    Args:
+        texts: Iterable of text fragments, in order
+        chunk_size (int, optional): Target size for chunks in words. Defaults to settings.CHUNK_SIZE.
+        chunk_overlap (int, optional): Number of words to overlap. Defaults to settings.CHUNK_OVERLAP.
+        
+    Yields:
+        str: Text chunks
+    """
+    window = _WordWindow(chunk_size or settings.CHUNK_SIZE, chunk_overlap or settings.CHUNK_OVERLAP)
+    for text in texts:
+        if text:
+            yield from window.feed(text)
+    yield from window.finish()
+
+
+def iter_chapter_chunks(texts, chunk_size=None, chunk_overlap=None):
+    """
+    Streaming counterpart of split_by_chapter + chunk_text.
+    
+    Chapter headings are detected fragment by fragment, and each chapter is
+    chunked as its text arrives. Text before the first heading (or the whole
+    text, if there are no headings) is reported as "Introduction".
+    
+    Args:
+        texts: Iterable of text fragments (e.g. PDF pages), in order
+        chunk_size (int, optional): Target size for chunks in words
+        chunk_overlap (int, optional): Number of words to overlap
+        
+    Yields:
+        tuple: (chapter key, chunk text)
+    """
+    window = _WordWindow(chunk_size or settings.CHUNK_SIZE, chunk_overlap or settings.CHUNK_OVERLAP)
+    chapter = "Introduction"
+    
+    for text in texts:
+        if not text:
+            continue
+        
+        position = 0
+        for match in CHAPTER_HEADING_PATTERN.finditer(text):
+            for chunk in window.feed(text[position:match.start()]):
+                yield chapter, chunk
+            for chunk in window.finish():
+                yield chapter, chunk
+            
+            chapter_number = match.group(1)
+            # Normalize arabic numerals; keep roman numerals as strings
+            try:
+                chapter = str(int(chapter_number))
+            except ValueError:
+                chapter = chapter_number
+            position = match.end()
+        
+        for chunk in window.feed(text[position:]):
+            yield chapter, chunk
+    
+    for chunk in window.finish():
+        yield chapter, chunk
+
+
 def chunk_thesis_by_chapter(text):
     """
     Split thesis text into chunks based on chapters and then chunk each chapter.
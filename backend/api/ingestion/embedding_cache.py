@@ -0,0 +1,192 @@
+"""
+Content-addressed embedding cache backed by Redis.
+
+Keys are SHA-256 digests of the embedding model name plus the full text, so
+identical text embedded by the same model always maps to the same entry and
+different chunks never collide. Vectors are stored as packed little-endian
+float32 (or float16) bytes rather than JSON, and bulk lookups use a single
+MGET / pipelined SETEX round trip.
+"""
+
+import hashlib
+import logging
+import threading
+from typing import List, Optional, Sequence
+
+import numpy as np
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "emb:v2"
+
+# Maximum keys per MGET / pipeline to keep individual commands bounded
+BULK_CHUNK_SIZE = 1000
+
+_SUPPORTED_DTYPES = {
+    "float32": np.dtype("<f4"),
+    "float16": np.dtype("<f2"),
+}
+
+_redis_pool = None
+_redis_pool_lock = threading.Lock()
+
+
+def get_redis_client():
+    """
+    Get a Redis client backed by a process-wide connection pool.
+    redis-py resets the pool automatically in forked child processes.
+
+    Returns:
+        redis.Redis: Pooled Redis client
+    """
+    global _redis_pool
+    import redis
+
+    if _redis_pool is None:
+        with _redis_pool_lock:
+            if _redis_pool is None:
+                _redis_pool = redis.ConnectionPool.from_url(
+                    settings.REDIS_URL,
+                    max_connections=getattr(settings, 'EMBEDDING_CACHE_MAX_CONNECTIONS', 50),
+                    socket_timeout=getattr(settings, 'EMBEDDING_CACHE_SOCKET_TIMEOUT', 2.0),
+                )
+
+    return redis.Redis(connection_pool=_redis_pool)
+
+
+class EmbeddingCache:
+    """
+    Redis cache for embedding vectors keyed by SHA-256(model + text).
+    """
+
+    def __init__(self, model_name: str, dtype: str = None, ttl: int = None, client=None):
+        """
+        Initialize the cache.
+
+        Args:
+            model_name (str): Embedding model name, part of every key
+            dtype (str, optional): Storage precision ("float32" or "float16").
+                Defaults to settings.EMBEDDING_CACHE_DTYPE.
+            ttl (int, optional): Entry lifetime in seconds.
+                Defaults to settings.EMBEDDING_CACHE_TTL.
+            client (redis.Redis, optional): Redis client to use instead of the shared pool
+        """
+        dtype = dtype or getattr(settings, 'EMBEDDING_CACHE_DTYPE', 'float32')
+        if dtype not in _SUPPORTED_DTYPES:
+            raise ValueError(f"Unsupported embedding cache dtype: {dtype}")
+
+        self.model_name = model_name
+        self.dtype_name = dtype
+        self.dtype = _SUPPORTED_DTYPES[dtype]
+        self.ttl = ttl or getattr(settings, 'EMBEDDING_CACHE_TTL', 60 * 60 * 24 * 30)
+        self._client = client
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = get_redis_client()
+        return self._client
+
+    def key_for(self, text: str) -> str:
+        """
+        Build the cache key for a text.
+
+        Args:
+            text (str): Full text that was embedded
+
+        Returns:
+            str: Redis key
+        """
+        digest = hashlib.sha256()
+        digest.update(self.model_name.encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(text.encode("utf-8"))
+        return f"{KEY_PREFIX}:{self.dtype_name}:{digest.hexdigest()}"
+
+    def encode(self, embedding: Sequence[float]) -> bytes:
+        return np.asarray(embedding, dtype=self.dtype).tobytes()
+
+    def decode(self, data: bytes) -> List[float]:
+        return np.frombuffer(data, dtype=self.dtype).astype(np.float32).tolist()
+
+    def get(self, text: str) -> Optional[List[float]]:
+        """
+        Look up a single embedding.
+
+        Args:
+            text (str): Text to look up
+
+        Returns:
+            list: Cached vector, or None on a miss or Redis error
+        """
+        return self.get_many([text])[0]
+
+    def set(self, text: str, embedding: Sequence[float]) -> None:
+        """
+        Store a single embedding.
+
+        Args:
+            text (str): Text that was embedded
+            embedding: Vector to store
+        """
+        self.set_many([text], [embedding])
+
+    def get_many(self, texts: Sequence[str]) -> List[Optional[List[float]]]:
+        """
+        Look up many embeddings with MGET.
+
+        Args:
+            texts: Texts to look up
+
+        Returns:
+            list: One entry per text; None for misses
+        """
+        results: List[Optional[List[float]]] = [None] * len(texts)
+        if not texts:
+            return results
+
+        keys = [self.key_for(text) for text in texts]
+
+        try:
+            for start in range(0, len(keys), BULK_CHUNK_SIZE):
+                values = self.client.mget(keys[start:start + BULK_CHUNK_SIZE])
+                for offset, value in enumerate(values):
+                    if value:
+                        results[start + offset] = self.decode(value)
+        except Exception as e:
+            logger.warning(f"Error reading embeddings from cache: {e}")
+
+        return results
+
+    def set_many(self, texts: Sequence[str], embeddings: Sequence[Sequence[float]]) -> int:
+        """
+        Store many embeddings with one pipelined round trip per chunk.
+        Empty embeddings are skipped.
+
+        Args:
+            texts: Texts that were embedded
+            embeddings: Vectors, aligned with texts
+
+        Returns:
+            int: Number of vectors written
+        """
+        items = [
+            (self.key_for(text), self.encode(embedding))
+            for text, embedding in zip(texts, embeddings)
+            if embedding is not None and len(embedding) > 0
+        ]
+        if not items:
+            return 0
+
+        try:
+            for start in range(0, len(items), BULK_CHUNK_SIZE):
+                pipe = self.client.pipeline(transaction=False)
+                for key, value in items[start:start + BULK_CHUNK_SIZE]:
+                    pipe.setex(key, self.ttl, value)
+                pipe.execute()
+        except Exception as e:
+            logger.warning(f"Could not cache embeddings: {e}")
+            return 0
+
+        return len(items)
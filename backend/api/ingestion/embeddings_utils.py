@@ -3,10 +3,16 @@ Utility functions for generating embeddings and interacting with the vector stor
 """
 
 import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
 from django.conf import settings
 from ..offline import get_llm_client, get_vector_db_client, is_offline_mode
 from ..security.differential_privacy import protect_embedding, protect_embedding_deterministic
 
+# Shared pool for concurrent collection queries in search_weaviate
+_search_executor = None
+_search_executor_lock = threading.Lock()
+
 
 def create_embeddings(text):
     """
@@ -341,66 +347,116 @@ def generate_embedding(text):
         return []
 
 
-def get_embedding_with_cache(text, doc_id=None, chunk_index=None):
+def generate_embeddings(texts):
+    """
+    Generate embeddings for several texts with a single request.
+    Works with both OpenAI in online mode and local embeddings in offline mode.
+    
+    Args:
+        texts (list): Texts to embed
+        
+    Returns:
+        list: One vector per input text (empty list for texts that failed)
+        
+    Raises:
+        Exception: Propagates client errors so callers can retry the batch
+    """
+    if not texts:
+        return []
+    
+    # Truncate texts that are too long (same limit as generate_embedding)
+    max_chars = 8000 * 4
+    inputs = [text[:max_chars] if text else " " for text in texts]
+    
+    client = get_openai_client()
+    
+    if is_offline_mode():
+        response = client.embeddings().create(input=inputs)
+        data = response["data"] if "data" in response else []
+        embeddings = [None] * len(inputs)
+        for i, item in enumerate(data):
+            embeddings[item.get("index", i)] = item["embedding"]
+    else:
+        response = client.embeddings.create(
+            model="text-embedding-ada-002",
+            input=inputs
+        )
+        embeddings = [None] * len(inputs)
+        for item in response.data:
+            embeddings[item.index] = item.embedding
+    
+    return [embedding or [] for embedding in embeddings]
+
+
+def get_embedding_model_name():
+    """
+    Get the name of the embedding model currently in use.
+    Used to namespace cached embeddings so vectors from different models never mix.
+    
+    Returns:
+        str: Embedding model identifier
+    """
+    if is_offline_mode():
+        config = getattr(settings, 'LOCAL_LLM_CONFIG', {})
+        return f"local:{config.get('embedding_model_path', 'local-embedding-model')}"
+    return "text-embedding-ada-002"
+
+
+def get_embedding_cache():
+    """
+    Get an embedding cache for the current embedding model.
+    
+    Returns:
+        EmbeddingCache: Cache backed by the shared Redis connection pool
+    """
+    from .embedding_cache import EmbeddingCache
+    return EmbeddingCache(get_embedding_model_name())
+
+
+def get_embedding_with_cache(text):
     """
     Generate or retrieve a cached embedding for the given text.
-    Uses SHA-256(document_id + chunk_index) or SHA-256(text) to cache embeddings.
+    Cache entries are keyed on SHA-256(model name + full text).
     
     Args:
         text (str): Text to embed
-        doc_id (str, optional): Document ID
-        chunk_index (int, optional): Chunk index within document
         
     Returns:
         list: Vector embedding
     """
-    from django.conf import settings
-    import redis
-    import json
+    return get_embeddings_with_cache([text])[0]
+
+
+def get_embeddings_with_cache(texts):
+    """
+    Generate or retrieve cached embeddings for many texts.
+    Cached vectors are fetched with one MGET; misses are embedded with a single
+    multi-input request and written back in one pipelined round trip.
     
-    # Initialize Redis connection
-    try:
-        redis_client = redis.Redis.from_url(settings.REDIS_URL)
-    except Exception as e:
-        print(f"Warning: Could not connect to Redis for embedding cache: {e}")
-        return generate_embedding(text)
-    
-    # Generate a cache key
-    if doc_id and chunk_index is not None:
-        # Use document_id + chunk_index if provided
-        cache_key = f"embedding:{doc_id}_{chunk_index}"
-        hash_key = hashlib.sha256(cache_key.encode()).hexdigest()
-    else:
-        # Otherwise use the text content itself
-        # This is fine for relatively short text, but for very long text,
-        # you might want to hash only the first N characters
-        text_for_hash = text[:1000] if len(text) > 1000 else text
-        hash_key = hashlib.sha256(text_for_hash.encode()).hexdigest()
-        cache_key = f"embedding:text_{hash_key}"
-    
-    # Try to get cached embedding
-    try:
-        cached_embedding = redis_client.get(cache_key)
-        if cached_embedding:
-            return json.loads(cached_embedding)
-    except Exception as e:
-        print(f"Warning: Error retrieving embedding from cache: {e}")
+    Args:
+        texts (list): Texts to embed
+        
+    Returns:
+        list: One vector per text (empty list if embedding failed)
+        
+    Raises:
+        Exception: Propagates embedding client errors so callers can retry
+    """
+    if not texts:
+        return []
     
-    # If no cached embedding, generate a new one
-    embedding = generate_embedding(text)
+    cache = get_embedding_cache()
+    embeddings = cache.get_many(texts)
     
-    # Cache the embedding with a 30-day TTL
-    try:
-        if embedding:
-            redis_client.setex(
-                cache_key,
-                60 * 60 * 24 * 30,  # 30 days in seconds
-                json.dumps(embedding)
-            )
-    except Exception as e:
-        print(f"Warning: Could not cache embedding: {e}")
+    missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+    if missing:
+        missing_texts = [texts[i] for i in missing]
+        generated = generate_embeddings(missing_texts)
+        cache.set_many(missing_texts, generated)
+        for i, embedding in zip(missing, generated):
+            embeddings[i] = embedding
     
-    return embedding
+    return embeddings
 
 
 def add_document_chunk_to_weaviate(content, metadata):
@@ -418,10 +474,11 @@ def add_document_chunk_to_weaviate(content, metadata):
     client = get_weaviate_client()
     
     # Generate embedding using cache system
-    # Use metadata to create a unique cache key
-    doc_id = f"{metadata.get('doc_type', 'unknown')}_{metadata.get('title', 'untitled')}"
-    chunk_index = metadata.get('chapter', '0')
-    embedding = get_embedding_with_cache(content, doc_id, chunk_index)
+    try:
+        embedding = get_embedding_with_cache(content)
+    except Exception as e:
+        print(f"Error generating embedding: {e}")
+        embedding = []
     
     if not embedding:
         print("Warning: Failed to generate embedding, skipping chunk")
@@ -429,6 +486,7 @@ def add_document_chunk_to_weaviate(content, metadata):
         
     # Apply differential privacy protection if enabled
     if getattr(settings, 'ENABLE_DP_EMBEDDING_PROTECTION', False):
+        doc_id = f"{metadata.get('doc_type', 'unknown')}_{metadata.get('title', 'untitled')}"
         content_hash = hashlib.sha256(content.encode()).hexdigest()
         embedding = protect_embedding_deterministic(embedding, doc_id, content_hash)
     
@@ -471,7 +529,11 @@ def add_figure_to_weaviate(figure_data):
     
     # Generate embedding from caption
     figure_id = figure_data.get("figure_id", "unknown")
-    embedding = get_embedding_with_cache(caption, f"figure_{figure_id}")
+    try:
+        embedding = get_embedding_with_cache(caption)
+    except Exception as e:
+        print(f"Error generating embedding for figure {figure_id}: {e}")
+        embedding = []
     
     if not embedding:
         print(f"Warning: Failed to generate embedding for figure {figure_id}")
@@ -490,11 +552,50 @@ def add_figure_to_weaviate(figure_data):
         return None
 
 
+def _get_search_executor():
+    """
+    Get the shared thread pool used to query vector store collections concurrently.
+    
+    Returns:
+        ThreadPoolExecutor: Process-wide executor
+    """
+    global _search_executor
+    
+    if _search_executor is None:
+        with _search_executor_lock:
+            if _search_executor is None:
+                _search_executor = ThreadPoolExecutor(
+                    max_workers=getattr(settings, 'VECTOR_SEARCH_MAX_WORKERS', 8),
+                    thread_name_prefix="vector-search"
+                )
+    
+    return _search_executor
+
+
+def _run_collection_query(collection_name, query):
+    """
+    Execute one collection query and time it.
+    
+    Returns:
+        tuple: (results, elapsed_ms)
+    """
+    import time
+    start_time = time.time()
+    query_results = query.do()
+    elapsed_ms = (time.time() - start_time) * 1000
+    return query_results.get("data", {}).get("Get", {}).get(collection_name, []), elapsed_ms
+
+
 def search_weaviate(query_text, doc_type=None, limit=10, use_hybrid=True, alpha=0.75, 
                  collection="Document", include_figures=False, filters=None):
     """
     Search for relevant document chunks or figures in Weaviate.
     
+    When both the Document and Figure collections are searched, the two
+    queries run concurrently. Each collection has its own timeout
+    (settings.VECTOR_SEARCH_TIMEOUT); a collection that fails or times out
+    is left out and the results from the other are still returned.
+    
     Args:
         query_text (str): The query text
         doc_type (str, optional): Filter by document type
@@ -524,6 +625,9 @@ def search_weaviate(query_text, doc_type=None, limit=10, use_hybrid=True, alpha=
     start_time = time.time()
     total_documents_searched = 0
     
+    # Collection name -> query builder
+    queries = {}
+    
     # Search Document collection
     if collection == "Document" or include_figures:
         # Build query for Document collection
@@ -559,13 +663,7 @@ def search_weaviate(query_text, doc_type=None, limit=10, use_hybrid=True, alpha=
                 "valueString": doc_type
             })
         
-        # Execute query
-        try:
-            query_results = query.do()
-            documents = query_results.get("data", {}).get("Get", {}).get("Document", [])
-            results.extend(documents)
-        except Exception as e:
-            print(f"Error searching Document collection: {e}")
+        queries["Document"] = query
     
     # Search Figure collection if requested or it's the specified collection
     if collection == "Figure" or (include_figures and collection == "Document"):
@@ -609,23 +707,44 @@ def search_weaviate(query_text, doc_type=None, limit=10, use_hybrid=True, alpha=
                 "valueString": doc_type
             })
         
-        # Execute query
+        queries["Figure"] = fig_query
+    
+    # Execute the collection queries concurrently
+    timeout = getattr(settings, 'VECTOR_SEARCH_TIMEOUT', 10.0)
+    executor = _get_search_executor()
+    futures = {
+        name: executor.submit(_run_collection_query, name, query)
+        for name, query in queries.items()
+    }
+    
+    collection_results = {}
+    collection_times = {}
+    failed_collections = []
+    for name, future in futures.items():
+        # Each collection gets its own timeout, measured from dispatch
+        remaining = max(0.0, timeout - (time.time() - start_time))
         try:
-            fig_results = fig_query.do()
-            figures = fig_results.get("data", {}).get("Get", {}).get("Figure", [])
-            
-            # If we're mixing Documents and Figures, mark the type
-            if collection == "Document" and include_figures:
-                for figure in figures:
-                    figure["result_type"] = "figure"
-                
-                # Mark document results as well
-                for doc in results:
-                    doc["result_type"] = "document"
-            
-            results.extend(figures)
+            collection_results[name], collection_times[name] = future.result(timeout=remaining)
+        except FuturesTimeoutError:
+            future.cancel()
+            failed_collections.append(name)
+            print(f"Timed out searching {name} collection after {timeout}s")
         except Exception as e:
-            print(f"Error searching Figure collection: {e}")
+            failed_collections.append(name)
+            print(f"Error searching {name} collection: {e}")
+    
+    documents = collection_results.get("Document", [])
+    figures = collection_results.get("Figure", [])
+    
+    # If we're mixing Documents and Figures, mark the type
+    if collection == "Document" and include_figures:
+        for doc in documents:
+            doc["result_type"] = "document"
+        for figure in figures:
+            figure["result_type"] = "figure"
+    
+    results.extend(documents)
+    results.extend(figures)
     
     # Record metrics for vector search if available
     if metrics_available:
@@ -642,7 +761,12 @@ def search_weaviate(query_text, doc_type=None, limit=10, use_hybrid=True, alpha=
                     'include_figures': include_figures,
                     'doc_type': doc_type,
                     'has_advanced_filters': filters is not None,
-                    'results_count': len(results)
+                    'results_count': len(results),
+                    'collection_times_ms': collection_times,
+                    'collection_results_count': {
+                        name: len(items) for name, items in collection_results.items()
+                    },
+                    'failed_collections': failed_collections
                 }
             )
         except Exception as e:
@@ -4,11 +4,10 @@ Usage: python ingest_thesis.py /path/Thesis.pdf "Author Name" 2023 [--extract-fi
 """
 
 import argparse
+import itertools
 import os
 import sys
 import django
-import pdfplumber
-import time
 from pathlib import Path
 
 # Add the parent directory to the Python path
@@ -22,17 +21,17 @@ django.setup()
 
 # Now Django models and utils can be imported
 from api.models import Document
-from api.ingestion.chunking_utils import chunk_text, split_by_chapter
-from api.ingestion.embeddings_utils import (
-    create_schema_if_not_exists,
-    add_document_chunk_to_weaviate
-)
+from api.ingestion.chunking_utils import iter_chunks, iter_chapter_chunks
+from api.ingestion.pdf_text import iter_pdf_pages
+from api.ingestion.embeddings_utils import create_schema_if_not_exists
+from api.ingestion.batch_ingest import BatchIngestionEngine
 from api.ingestion.figure_extractor import extract_figures_from_pdf
 
 
 def extract_text_from_pdf(pdf_path):
     """
     Extract text from a PDF file.
+    Prefer iter_pages_from_pdf for large documents; this joins every page.
     
     Args:
         pdf_path (str): Path to the PDF file
@@ -40,22 +39,33 @@ def extract_text_from_pdf(pdf_path):
     Returns:
         str: Extracted text
     """
-    text = ""
+    return "".join(page_text + "\n\n" for page_text in iter_pages_from_pdf(pdf_path))
+
+
+def iter_pages_from_pdf(pdf_path, stats=None):
+    """
+    Yield the text of each page of a PDF, extracted in parallel.
     
+    Args:
+        pdf_path (str): Path to the PDF file
+        stats (dict, optional): Updated in place with "pages" and "characters"
+        
+    Yields:
+        str: Text of one page
+    """
     # Check if file exists
     if not os.path.exists(pdf_path):
         print(f"Error: File not found at {pdf_path}")
-        return text
+        return
     
     try:
-        with pdfplumber.open(pdf_path) as pdf:
-            for page in pdf.pages:
-                page_text = page.extract_text() or ""
-                text += page_text + "\n\n"
+        for page_text in iter_pdf_pages(pdf_path):
+            if stats is not None:
+                stats["pages"] = stats.get("pages", 0) + 1
+                stats["characters"] = stats.get("characters", 0) + len(page_text)
+            yield page_text
     except Exception as e:
         print(f"Error extracting text from PDF: {e}")
-    
-    return text
 
 
 def ingest_thesis(pdf_path, author, year, extract_figures=False):
@@ -74,16 +84,16 @@ def ingest_thesis(pdf_path, author, year, extract_figures=False):
     # Get the filename for the title (fallback)
     filename = Path(pdf_path).stem
     
-    # Extract text from PDF
+    # Stream pages from the PDF straight into the chapter splitter and chunker
     print("Extracting text from PDF...")
-    text = extract_text_from_pdf(pdf_path)
+    extraction = {}
+    chapter_chunks = iter_chapter_chunks(iter_pages_from_pdf(pdf_path, extraction))
+    first_chunk = next(chapter_chunks, None)
     
-    if not text:
+    if first_chunk is None:
         print("Error: Could not extract text from PDF")
         return False
     
-    print(f"Extracted {len(text)} characters")
-    
     # Create Document record
     doc = Document.objects.create(
         title=filename,
@@ -95,29 +105,13 @@ def ingest_thesis(pdf_path, author, year, extract_figures=False):
     # Ensure Weaviate schema exists
     create_schema_if_not_exists()
     
-    # Split text by chapters
-    print("Splitting text by chapters...")
-    chapters = split_by_chapter(text)
-    
-    if not chapters:
-        print("No chapters found, treating the entire document as a single text")
-        chapters = {"Introduction": text}
-    
-    print(f"Found {len(chapters)} chapters")
-    
-    # Process each chapter
-    total_chunks = 0
-    for chapter_num, chapter_text in chapters.items():
-        print(f"Processing Chapter {chapter_num}...")
-        
-        # Chunk the chapter text
-        chunks = chunk_text(chapter_text)
-        
-        # Store each chunk in Weaviate
-        for i, chunk in enumerate(chunks):
-            # Skip empty chunks
-            if not chunk.strip():
-                continue
+    # Process each chapter as its pages arrive; chunks are embedded and stored in batches
+    chapters = set()
+    with BatchIngestionEngine() as engine:
+        for chapter_num, chunk in itertools.chain([first_chunk], chapter_chunks):
+            if chapter_num not in chapters:
+                chapters.add(chapter_num)
+                print(f"Processing Chapter {chapter_num}...")
             
             metadata = {
                 "doc_type": "thesis",
@@ -128,16 +122,13 @@ def ingest_thesis(pdf_path, author, year, extract_figures=False):
                 "source": pdf_path
             }
             
-            # Add to Weaviate
-            result = add_document_chunk_to_weaviate(chunk, metadata)
-            
-            if result:
-                total_chunks += 1
-            
-            # Rate limiting to avoid OpenAI API rate limits
-            if i > 0 and i % 10 == 0:
-                time.sleep(1)
+            engine.add_chunk(chunk, metadata)
     
+    print(f"Extracted {extraction.get('characters', 0)} characters from {extraction.get('pages', 0)} pages")
+    print(f"Found {len(chapters)} chapters")
+    
+    total_chunks = engine.stats.chunks_written
+    print(f"Ingestion throughput: {engine.stats.summary()}")
     print(f"Successfully added {total_chunks} chunks to the vector store")
     
     # Extract figures if requested
@@ -184,16 +175,16 @@ def ingest_protocol(pdf_path, title=None, author=None, year=None, extract_figure
     if not title:
         title = Path(pdf_path).stem
     
-    # Extract text from PDF
+    # Stream pages from the PDF straight into the chunker
     print("Extracting text from PDF...")
-    text = extract_text_from_pdf(pdf_path)
+    extraction = {}
+    chunks = iter_chunks(iter_pages_from_pdf(pdf_path, extraction))
+    first_chunk = next(chunks, None)
     
-    if not text:
+    if first_chunk is None:
         print("Error: Could not extract text from PDF")
         return False
     
-    print(f"Extracted {len(text)} characters")
-    
     # Create Document record
     doc = Document.objects.create(
         title=title,
@@ -205,34 +196,22 @@ def ingest_protocol(pdf_path, title=None, author=None, year=None, extract_figure
     # Ensure Weaviate schema exists
     create_schema_if_not_exists()
     
-    # Chunk the text
-    chunks = chunk_text(text)
-    
-    # Store each chunk in Weaviate
-    total_chunks = 0
-    for i, chunk in enumerate(chunks):
-        # Skip empty chunks
-        if not chunk.strip():
-            continue
-        
-        metadata = {
-            "doc_type": "protocol",
-            "title": title,
-            "author": author or "",
-            "year": year,
-            "source": pdf_path
-        }
-        
-        # Add to Weaviate
-        result = add_document_chunk_to_weaviate(chunk, metadata)
-        
-        if result:
-            total_chunks += 1
-        
-        # Rate limiting to avoid OpenAI API rate limits
-        if i > 0 and i % 10 == 0:
-            time.sleep(1)
-    
+    metadata = {
+        "doc_type": "protocol",
+        "title": title,
+        "author": author or "",
+        "year": year,
+        "source": pdf_path
+    }
+    
+    # Embed and store chunks in batches
+    with BatchIngestionEngine() as engine:
+        for chunk in itertools.chain([first_chunk], chunks):
+            engine.add_chunk(chunk, metadata)
+    
+    print(f"Extracted {extraction.get('characters', 0)} characters from {extraction.get('pages', 0)} pages")
+    total_chunks = engine.stats.chunks_written
+    print(f"Ingestion throughput: {engine.stats.summary()}")
     print(f"Successfully added {total_chunks} chunks to the vector store")
     
     # Extract figures if requested
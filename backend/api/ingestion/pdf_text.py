@@ -0,0 +1,100 @@
+"""
+Streaming, page-parallel PDF text extraction.
+
+Pages are extracted in small page ranges on a process pool and yielded in
+order. Only a bounded window of ranges is in flight at any time, so peak
+memory depends on the window size rather than on the length of the document.
+"""
+
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, List, Tuple
+
+import pdfplumber
+from django.conf import settings
+
+
+def _extract_page_range(pdf_path: str, start: int, end: int) -> List[str]:
+    """
+    Extract the text of pages [start, end) from a PDF.
+    Runs in a worker process, so the PDF is opened once per range.
+
+    Args:
+        pdf_path (str): Path to the PDF file
+        start (int): First page index (inclusive)
+        end (int): Last page index (exclusive)
+
+    Returns:
+        list: Page texts, in page order
+    """
+    texts = []
+    with pdfplumber.open(pdf_path) as pdf:
+        for page in pdf.pages[start:end]:
+            texts.append(page.extract_text() or "")
+            # Drop parsed layout objects as soon as the page is done
+            if hasattr(page, "close"):
+                page.close()
+    return texts
+
+
+def count_pdf_pages(pdf_path: str) -> int:
+    """
+    Count the pages in a PDF.
+
+    Args:
+        pdf_path (str): Path to the PDF file
+
+    Returns:
+        int: Number of pages
+    """
+    with pdfplumber.open(pdf_path) as pdf:
+        return len(pdf.pages)
+
+
+def _page_ranges(page_count: int, pages_per_task: int) -> Iterator[Tuple[int, int]]:
+    for start in range(0, page_count, pages_per_task):
+        yield start, min(start + pages_per_task, page_count)
+
+
+def iter_pdf_pages(pdf_path: str, max_workers: int = None, pages_per_task: int = None) -> Iterator[str]:
+    """
+    Yield the text of each page of a PDF, in order.
+
+    Args:
+        pdf_path (str): Path to the PDF file
+        max_workers (int, optional): Extraction processes.
+            Defaults to settings.PDF_EXTRACTION_WORKERS; 1 extracts in-process.
+        pages_per_task (int, optional): Pages extracted per task.
+            Defaults to settings.PDF_PAGES_PER_TASK.
+
+    Yields:
+        str: Text of one page ("" for pages without extractable text)
+    """
+    max_workers = max_workers or getattr(settings, 'PDF_EXTRACTION_WORKERS', None) or os.cpu_count() or 1
+    pages_per_task = pages_per_task or getattr(settings, 'PDF_PAGES_PER_TASK', 8)
+
+    page_count = count_pdf_pages(pdf_path)
+    ranges = _page_ranges(page_count, pages_per_task)
+
+    if max_workers <= 1 or page_count <= pages_per_task:
+        for start, end in ranges:
+            yield from _extract_page_range(pdf_path, start, end)
+        return
+
+    # Keep two ranges per worker in flight; results are consumed in order
+    window = max_workers * 2
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        pending = deque()
+        try:
+            for start, end in ranges:
+                pending.append(executor.submit(_extract_page_range, pdf_path, start, end))
+                if len(pending) >= window:
+                    yield from pending.popleft().result()
+
+            while pending:
+                yield from pending.popleft().result()
+        finally:
+            # Consumer stopped early or extraction failed: drop queued work
+            for future in pending:
+                future.cancel()
@@ -44,8 +44,8 @@ def get_llm_client(isolation_level="auto"):
         from .local_llm import get_ollama_client
         return get_ollama_client()
     else:
-        from openai import OpenAI
-        return OpenAI(api_key=settings.OPENAI_API_KEY)
+        from .clients import get_openai_client
+        return get_openai_client()
 
 
 def is_llm_isolated():
@@ -59,8 +59,12 @@ def get_embedding_model():
     In isolated mode, uses a local embedding model.
     """
     if is_llm_isolated():
-        from .local_embeddings import LocalEmbeddingModel
-        return LocalEmbeddingModel()
+        # Loaded once per process on first use
+        from api.model_registry import get_model
+        model = get_model('local_embedding')
+        if model is None:
+            raise RuntimeError("Local embedding model could not be loaded")
+        return model
     else:
         # Use OpenAI's embedding model in non-isolated mode
         from .openai_embeddings import OpenAIEmbeddingModel
@@ -0,0 +1,285 @@
+"""
+Process-wide registry of pooled LLM and embedding HTTP clients.
+
+Building an `OpenAI(...)` client or calling bare `requests.post` for every
+query and every chunk pays for client construction and a fresh TCP/TLS
+handshake each time. The registry keeps one OpenAI client (backed by a
+keep-alive `httpx.Client`) and one `requests.Session` per named endpoint
+per process, with a bounded connection pool and per-endpoint timeouts.
+
+Clients are thread-safe and shared across threads. Sockets must not be
+shared across processes, so a forked worker (gunicorn, Celery prefork)
+drops the inherited clients and builds its own on first use.
+"""
+
+import os
+import logging
+import threading
+from collections import Counter
+from typing import Any, Dict, Tuple
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# httpcore trace events marking a new connection
+_CONNECT_EVENTS = ('connection.connect_tcp.complete', 'connection.connect_unix_socket.complete')
+
+
+def endpoint_timeout(name: str) -> Tuple[float, float]:
+    """
+    (connect, read) timeout in seconds for a named endpoint.
+
+    Args:
+        name (str): Endpoint name, e.g. 'openai' or 'ollama'
+
+    Returns:
+        tuple: Connect and read timeouts
+    """
+    timeouts = getattr(settings, 'LLM_HTTP_TIMEOUTS', {})
+    if name in timeouts:
+        connect, read = timeouts[name]
+        return float(connect), float(read)
+
+    connect = float(getattr(settings, 'LLM_HTTP_CONNECT_TIMEOUT', 5))
+    defaults = {
+        'openai': getattr(settings, 'OPENAI_TIMEOUT', 30),
+        'ollama': getattr(settings, 'OLLAMA_TIMEOUT', 60),
+    }
+    return connect, float(defaults.get(name, 30))
+
+
+class _ConnectionMetrics:
+    """Request and new-connection counters for one endpoint."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = Counter()
+
+    def add(self, key: str, amount: int = 1) -> None:
+        with self._lock:
+            self._counts[key] += amount
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            requests_made = self._counts['requests']
+            connections = self._counts['connections']
+        return {
+            'requests': requests_made,
+            'connections_opened': connections,
+            'connections_reused': max(requests_made - connections, 0),
+            'reuse_ratio': round(1 - connections / requests_made, 4) if requests_made else 0.0,
+        }
+
+
+class ClientRegistry:
+    """
+    Pooled, lazily built HTTP clients for LLM and embedding endpoints.
+    """
+
+    def __init__(self, pool_size: int = None, max_retries: int = None):
+        self.pool_size = pool_size or getattr(settings, 'LLM_HTTP_POOL_SIZE', 20)
+        self.max_retries = (
+            max_retries if max_retries is not None
+            else getattr(settings, 'LLM_HTTP_MAX_RETRIES', 2)
+        )
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        self._clients: Dict[Tuple[str, str], Any] = {}
+        self._sessions: Dict[str, Any] = {}
+        self._metrics: Dict[str, _ConnectionMetrics] = {}
+
+    def _check_fork(self) -> None:
+        # Pooled sockets belong to the parent; build fresh clients in a child
+        pid = os.getpid()
+        if pid == self._pid:
+            return
+        with self._lock:
+            if pid == self._pid:
+                return
+            self._pid = pid
+            self._clients = {}
+            self._sessions = {}
+            self._metrics = {}
+
+    def _endpoint_metrics(self, name: str) -> _ConnectionMetrics:
+        metrics = self._metrics.get(name)
+        if metrics is None:
+            metrics = self._metrics.setdefault(name, _ConnectionMetrics())
+        return metrics
+
+    def openai(self, api_key: str = None):
+        """
+        Shared OpenAI client for an API key.
+
+        Args:
+            api_key (str, optional): API key. Defaults to settings.OPENAI_API_KEY.
+
+        Returns:
+            OpenAI: Client backed by a keep-alive connection pool
+        """
+        self._check_fork()
+        api_key = api_key or settings.OPENAI_API_KEY
+        key = ('openai', api_key or '')
+
+        client = self._clients.get(key)
+        if client is not None:
+            return client
+
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                client = self._build_openai(api_key)
+                self._clients[key] = client
+        return client
+
+    def _build_openai(self, api_key: str):
+        import httpx
+        from openai import OpenAI
+
+        metrics = self._endpoint_metrics('openai')
+
+        def trace(event_name, info):
+            if event_name in _CONNECT_EVENTS:
+                metrics.add('connections')
+
+        def on_request(request):
+            metrics.add('requests')
+            request.extensions['trace'] = trace
+
+        connect, read = endpoint_timeout('openai')
+        http_client = httpx.Client(
+            limits=httpx.Limits(
+                max_connections=self.pool_size,
+                max_keepalive_connections=self.pool_size,
+            ),
+            timeout=httpx.Timeout(read, connect=connect),
+            event_hooks={'request': [on_request]},
+        )
+        logger.info(f"Created pooled OpenAI client (pool size {self.pool_size})")
+        return OpenAI(
+            api_key=api_key,
+            http_client=http_client,
+            timeout=httpx.Timeout(read, connect=connect),
+            max_retries=self.max_retries,
+        )
+
+    def session(self, name: str):
+        """
+        Shared requests session for a named endpoint.
+
+        Args:
+            name (str): Endpoint name, e.g. 'ollama'
+
+        Returns:
+            requests.Session: Session with a keep-alive connection pool
+        """
+        self._check_fork()
+        session = self._sessions.get(name)
+        if session is not None:
+            return session
+
+        with self._lock:
+            session = self._sessions.get(name)
+            if session is None:
+                session = self._build_session(name)
+                self._sessions[name] = session
+        return session
+
+    def _build_session(self, name: str):
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        metrics = self._endpoint_metrics(name)
+
+        def on_response(response, *args, **kwargs):
+            metrics.add('requests')
+
+        session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=4,
+            pool_maxsize=self.pool_size,
+            pool_block=False,
+        )
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        session.hooks['response'].append(on_response)
+        logger.info(f"Created pooled HTTP session for '{name}' (pool size {self.pool_size})")
+        return session
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Connection reuse per endpoint for this process.
+
+        Returns:
+            dict: Requests, opened and reused connections and reuse ratio per endpoint
+        """
+        self._check_fork()
+        with self._lock:
+            metrics = dict(self._metrics)
+            sessions = dict(self._sessions)
+
+        stats = {name: endpoint.snapshot() for name, endpoint in metrics.items()}
+        for name, session in sessions.items():
+            # urllib3 pools count the connections they open
+            opened = 0
+            for adapter in set(session.adapters.values()):
+                pools = adapter.poolmanager.pools
+                for key in pools.keys():
+                    pool = pools.get(key)
+                    if pool is not None:
+                        opened += pool.num_connections
+            endpoint = stats.setdefault(name, _ConnectionMetrics().snapshot())
+            endpoint['connections_opened'] = opened
+            endpoint['connections_reused'] = max(endpoint['requests'] - opened, 0)
+            endpoint['reuse_ratio'] = (
+                round(1 - opened / endpoint['requests'], 4) if endpoint['requests'] else 0.0
+            )
+        return stats
+
+    def close(self) -> None:
+        """Close all pooled connections held by this process."""
+        with self._lock:
+            clients, self._clients = self._clients, {}
+            sessions, self._sessions = self._sessions, {}
+        for client in clients.values():
+            try:
+                client.close()
+            except Exception as e:
+                logger.debug(f"Error closing LLM client: {e}")
+        for session in sessions.values():
+            session.close()
+
+
+_client_registry = None
+_client_registry_lock = threading.Lock()
+
+
+def get_client_registry() -> ClientRegistry:
+    """
+    Get the process-wide LLM client registry.
+
+    Returns:
+        ClientRegistry: Shared registry instance
+    """
+    global _client_registry
+
+    if _client_registry is None:
+        with _client_registry_lock:
+            if _client_registry is None:
+                _client_registry = ClientRegistry()
+
+    return _client_registry
+
+
+def get_openai_client(api_key: str = None):
+    """
+    Get the shared, pooled OpenAI client.
+
+    Args:
+        api_key (str, optional): API key. Defaults to settings.OPENAI_API_KEY.
+
+    Returns:
+        OpenAI: Pooled client
+    """
+    return get_client_registry().openai(api_key)
@@ -17,13 +17,34 @@ class LocalEmbeddingModel:
     Provides an interface compatible with OpenAI's embedding API.
     """
     
-    def __init__(self):
-        """Initialize local embedding model."""
+    def __init__(self, batch_size=None, intra_op_threads=None, inter_op_threads=None):
+        """
+        Initialize local embedding model.
+        
+        Args:
+            batch_size (int, optional): Texts per inference call. Defaults to
+                settings.LOCAL_EMBEDDING_BATCH_SIZE.
+            intra_op_threads (int, optional): ONNX Runtime threads within an
+                operator (0 lets ONNX Runtime decide)
+            inter_op_threads (int, optional): ONNX Runtime threads across
+                operators (0 lets ONNX Runtime decide)
+        """
         self.model_path = getattr(settings, 'LOCAL_EMBEDDING_MODEL_PATH', None)
         self.tokenizer_path = getattr(settings, 'LOCAL_EMBEDDING_TOKENIZER_PATH', None)
         self.embedding_dim = getattr(settings, 'LOCAL_EMBEDDING_DIMENSION', 768)
+        self.max_length = getattr(settings, 'LOCAL_EMBEDDING_MAX_LENGTH', 512)
+        self.batch_size = batch_size or getattr(settings, 'LOCAL_EMBEDDING_BATCH_SIZE', 32)
+        self.intra_op_threads = (
+            intra_op_threads if intra_op_threads is not None
+            else getattr(settings, 'LOCAL_EMBEDDING_INTRA_OP_THREADS', 0)
+        )
+        self.inter_op_threads = (
+            inter_op_threads if inter_op_threads is not None
+            else getattr(settings, 'LOCAL_EMBEDDING_INTER_OP_THREADS', 0)
+        )
         self.model = None
         self.tokenizer = None
+        self.input_names = set()
         self._initialize_model()
     
     def _initialize_model(self):
@@ -49,14 +70,105 @@ class LocalEmbeddingModel:
             
             # Create ONNX Runtime session
             logger.info(f"Loading embedding model from {self.model_path}")
-            self.model = ort.InferenceSession(self.model_path)
+            options = ort.SessionOptions()
+            options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+            if self.intra_op_threads:
+                options.intra_op_num_threads = self.intra_op_threads
+            if self.inter_op_threads:
+                options.inter_op_num_threads = self.inter_op_threads
+            self.model = ort.InferenceSession(self.model_path, sess_options=options)
+            # Only feed the inputs the exported graph declares (e.g. no token_type_ids)
+            self.input_names = {model_input.name for model_input in self.model.get_inputs()}
             
             logger.info("Local embedding model initialized successfully")
         except Exception as e:
             logger.error(f"Error initializing local embedding model: {str(e)}")
             raise
     
-    def create(self, input=None, model=None, encoding_format=None):
+    def _pad_batch(self, encodings, indices):
+        """
+        Pad the encodings at `indices` to the longest sequence among them.
+        
+        Returns:
+            tuple: (dict of the int64 model inputs the graph declares, attention
+                mask of shape (batch, longest) for pooling)
+        """
+        longest = max(len(encodings['input_ids'][i]) for i in indices)
+        pad_id = self.tokenizer.pad_token_id or 0
+        
+        input_ids = np.full((len(indices), longest), pad_id, dtype=np.int64)
+        attention_mask = np.zeros((len(indices), longest), dtype=np.int64)
+        token_type_ids = np.zeros((len(indices), longest), dtype=np.int64)
+        
+        for row, i in enumerate(indices):
+            ids = encodings['input_ids'][i]
+            input_ids[row, :len(ids)] = ids
+            attention_mask[row, :len(ids)] = 1
+            if 'token_type_ids' in encodings:
+                token_type_ids[row, :len(ids)] = encodings['token_type_ids'][i]
+        
+        model_inputs = {
+            'input_ids': input_ids,
+            'attention_mask': attention_mask,
+            'token_type_ids': token_type_ids,
+        }
+        inputs = {name: value for name, value in model_inputs.items() if name in self.input_names}
+        return inputs, attention_mask
+    
+    def encode(self, texts, batch_size=None):
+        """
+        Embed texts in length-sorted, dynamically padded micro-batches.
+        
+        Texts are tokenized once, sorted by token count and run in batches
+        padded only to each batch's longest sequence. Mean pooling and L2
+        normalization are applied to the whole batch at once.
+        
+        Args:
+            texts (list): Texts to embed
+            batch_size (int, optional): Texts per inference call. Defaults to self.batch_size.
+        
+        Returns:
+            tuple: (float32 array of shape (len(texts), dim) in input order, total token count)
+        """
+        if self.model is None or self.tokenizer is None:
+            logger.error("Embedding model not initialized")
+            raise RuntimeError("Embedding model not initialized")
+        
+        if not texts:
+            return np.zeros((0, self.embedding_dim), dtype=np.float32), 0
+        
+        batch_size = batch_size or self.batch_size
+        encodings = self.tokenizer(
+            list(texts),
+            padding=False,
+            truncation=True,
+            max_length=self.max_length
+        )
+        lengths = [len(ids) for ids in encodings['input_ids']]
+        order = sorted(range(len(texts)), key=lengths.__getitem__)
+        
+        embeddings = None
+        for start in range(0, len(order), batch_size):
+            indices = order[start:start + batch_size]
+            model_inputs, attention_mask = self._pad_batch(encodings, indices)
+            
+            hidden_states = self.model.run(None, model_inputs)[0]
+            
+            # Mean pooling over real tokens, then L2 normalization, for the whole batch
+            # Pool with the locally built mask; the graph may not take one as input
+            mask = attention_mask.astype(np.float32)
+            summed = np.einsum('bld,bl->bd', hidden_states, mask)
+            counts = np.clip(mask.sum(axis=1, keepdims=True), 1e-9, None)
+            pooled = summed / counts
+            norms = np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+            
+            if embeddings is None:
+                embeddings = np.empty((len(texts), pooled.shape[1]), dtype=np.float32)
+            embeddings[indices] = pooled / norms
+        
+        return embeddings, sum(lengths)
+    
+    def create(self, input=None, model=None, encoding_format=None, as_numpy=False):
         """
         Create embeddings for the given input.
         
@@ -64,70 +176,20 @@ class LocalEmbeddingModel:
             input (str or list): Text to embed
             model (str, optional): Model name (ignored, uses local model)
             encoding_format (str, optional): Output format (ignored)
+            as_numpy (bool, optional): Return each embedding as a float32 numpy
+                row instead of a list of floats
         
         Returns:
             dict: Embeddings response with OpenAI-compatible structure
         """
-        if self.model is None or self.tokenizer is None:
-            logger.error("Embedding model not initialized")
-            raise RuntimeError("Embedding model not initialized")
-        
         # Handle both string and list inputs
         if isinstance(input, str):
             inputs = [input]
         else:
             inputs = input
         
-        embeddings = []
-        total_tokens = 0
-        
         try:
-            for text in inputs:
-                # Tokenize the input
-                encoded_input = self.tokenizer(
-                    text,
-                    padding=True,
-                    truncation=True,
-                    max_length=512,
-                    return_tensors="np"
-                )
-                
-                # Count tokens
-                token_count = len(encoded_input['input_ids'][0])
-                total_tokens += token_count
-                
-                # Get model inputs
-                model_inputs = {
-                    'input_ids': encoded_input['input_ids'].astype(np.int64),
-                    'attention_mask': encoded_input['attention_mask'].astype(np.int64),
-                    'token_type_ids': encoded_input.get('token_type_ids', np.zeros_like(encoded_input['input_ids'])).astype(np.int64)
-                }
-                
-                # Run inference
-                outputs = self.model.run(None, model_inputs)
-                
-                # Get embeddings (using mean pooling)
-                attention_mask = encoded_input['attention_mask']
-                mask = attention_mask.astype(np.float32)
-                mask_expanded = np.expand_dims(mask, axis=-1)
-                
-                # Get the hidden states from the model output
-                hidden_states = outputs[0]
-                
-                # Apply mask and calculate mean
-                masked_embeddings = hidden_states * mask_expanded
-                sum_embeddings = np.sum(masked_embeddings, axis=1)
-                sum_mask = np.sum(mask, axis=1, keepdims=True)
-                sum_mask = np.clip(sum_mask, a_min=1e-9, a_max=None)  # Avoid division by zero
-                
-                # Calculate mean embeddings
-                mean_embeddings = sum_embeddings / sum_mask
-                
-                # Normalize the embeddings
-                norm = np.linalg.norm(mean_embeddings, axis=1, keepdims=True)
-                normalized_embeddings = mean_embeddings / norm
-                
-                embeddings.append(normalized_embeddings[0].tolist())
+            embeddings, total_tokens = self.encode(inputs)
             
             # Format response to match OpenAI's structure
             response = {
@@ -137,7 +199,7 @@ class LocalEmbeddingModel:
                         'object': 'embedding',
                         'embedding': embedding,
                         'index': i
-                    } for i, embedding in enumerate(embeddings)
+                    } for i, embedding in enumerate(embeddings if as_numpy else embeddings.tolist())
                 ],
                 'model': os.path.basename(self.model_path),
                 'usage': {
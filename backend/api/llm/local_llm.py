@@ -6,9 +6,12 @@ Provides access to on-premises language models through Ollama or other providers
 import os
 import json
 import logging
+import threading
 import requests
 from django.conf import settings
 
+from .clients import endpoint_timeout, get_client_registry
+
 # Set up logging
 logger = logging.getLogger(__name__)
 
@@ -27,9 +30,14 @@ class OllamaClient:
         """
         self.base_url = base_url or settings.OLLAMA_API_URL
         self.default_model = settings.OLLAMA_DEFAULT_MODEL
-        self.timeout = getattr(settings, 'OLLAMA_TIMEOUT', 60)
+        self.timeout = endpoint_timeout('ollama')
         logger.info(f"Initialized Ollama client with base_url={self.base_url}")
     
+    @property
+    def session(self):
+        """Pooled keep-alive session shared by all Ollama clients in this process."""
+        return get_client_registry().session('ollama')
+    
     def _request(self, endpoint, method="POST", data=None, params=None):
         """
         Make a request to the Ollama API.
@@ -47,9 +55,9 @@ class OllamaClient:
         
         try:
             if method.upper() == "GET":
-                response = requests.get(url, params=params, timeout=self.timeout)
+                response = self.session.get(url, params=params, timeout=self.timeout)
             else:
-                response = requests.post(url, json=data, params=params, timeout=self.timeout)
+                response = self.session.post(url, json=data, params=params, timeout=self.timeout)
             
             response.raise_for_status()
             return response.json()
@@ -207,7 +215,7 @@ class OllamaStreamingResponse:
         
         # Prepare the streaming request
         url = f"{client.base_url.rstrip('/')}/api/chat"
-        self.response = requests.post(url, json=data, stream=True)
+        self.response = client.session.post(url, json=data, stream=True, timeout=client.timeout)
         self.response.raise_for_status()
         self.iterator = self.response.iter_lines()
     
@@ -245,11 +253,22 @@ class OllamaStreamingResponse:
             raise
 
 
+_ollama_client = None
+_ollama_client_lock = threading.Lock()
+
+
 def get_ollama_client():
     """
-    Get an Ollama client instance.
+    Get the shared Ollama client instance.
     
     Returns:
         OllamaClient: Configured client instance
     """
-    return OllamaClient()
\ No newline at end of file
+    global _ollama_client
+    
+    if _ollama_client is None:
+        with _ollama_client_lock:
+            if _ollama_client is None:
+                _ollama_client = OllamaClient()
+    
+    return _ollama_client
\ No newline at end of file
@@ -5,7 +5,8 @@ Provides vector embeddings using OpenAI's API.
 
 import logging
 from django.conf import settings
-from openai import OpenAI
+
+from .clients import get_openai_client
 
 # Set up logging
 logger = logging.getLogger(__name__)
@@ -26,7 +27,7 @@ class OpenAIEmbeddingModel:
         """
         self.api_key = api_key or settings.OPENAI_API_KEY
         self.model = model or getattr(settings, 'OPENAI_EMBEDDING_MODEL', 'text-embedding-ada-002')
-        self.client = OpenAI(api_key=self.api_key)
+        self.client = get_openai_client(self.api_key)
         logger.info(f"Initialized OpenAI embedding model: {self.model}")
     
     def create(self, input=None, model=None, encoding_format=None):
@@ -0,0 +1,57 @@
+"""
+Django management command to backfill daily metric aggregates.
+Rebuilds DailyMetricAggregate rows for a whole date range in one pass.
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from api.analytics.aggregator import MetricsAggregator
+import datetime
+import time
+
+
+class Command(BaseCommand):
+    help = "Rebuild daily metric aggregates for a date range"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--start',
+            type=str,
+            help='First day to rebuild (YYYY-MM-DD, default: 30 days ago)'
+        )
+        parser.add_argument(
+            '--end',
+            type=str,
+            help='Last day to rebuild, inclusive (YYYY-MM-DD, default: yesterday)'
+        )
+        parser.add_argument(
+            '--query-types',
+            action='store_true',
+            help='Also rebuild the per-day query type aggregates'
+        )
+
+    def handle(self, *args, **options):
+        yesterday = timezone.now().date() - datetime.timedelta(days=1)
+        try:
+            start_date = (datetime.datetime.strptime(options['start'], '%Y-%m-%d').date()
+                          if options['start'] else yesterday - datetime.timedelta(days=29))
+            end_date = (datetime.datetime.strptime(options['end'], '%Y-%m-%d').date()
+                        if options['end'] else yesterday)
+        except ValueError as e:
+            raise CommandError(f"Invalid date: {e}")
+
+        if end_date < start_date:
+            raise CommandError("--end must not be before --start")
+
+        self.stdout.write(f"Aggregating daily metrics from {start_date} to {end_date}...")
+        started = time.time()
+        aggregates = MetricsAggregator.aggregate_metrics_range(start_date, end_date)
+
+        if options['query_types']:
+            for aggregate in aggregates:
+                MetricsAggregator.aggregate_query_types(aggregate.date)
+
+        total_queries = sum(aggregate.total_queries for aggregate in aggregates)
+        self.stdout.write(self.style.SUCCESS(
+            f"Aggregated {len(aggregates)} days ({total_queries} queries) in {time.time() - started:.1f}s"
+        ))
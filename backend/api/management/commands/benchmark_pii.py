@@ -0,0 +1,154 @@
+"""
+Django management command to benchmark PII scanning throughput.
+Compares the single-pass scanner against running each entity pattern on its
+own with slice-based redaction, on text and as a streamed file, and checks
+that the streamed scan finds PII that straddles chunk boundaries.
+"""
+
+from django.core.management.base import BaseCommand
+from api.security.pii_detector import PII_PATTERNS, STREAM_WINDOW_CHARS, PIIDetector
+import random
+import re
+import time
+
+
+PROSE = (
+    "the RNA extraction protocol uses TRIzol reagent at 4 degrees for 10 minutes "
+    "then centrifuge at 12000 g and check the A260/280 ratio of 2.0 primers were "
+    "designed with a Tm of 60 see figure 3.2 and table 4 for small RNA yields"
+).split()
+
+PII_SAMPLES = [
+    "jane.doe@lab.example.org",
+    "(555) 123-4567",
+    "+44 555 123 4567",
+    "192.168.10.24",
+]
+
+# Email whose trailing digits also match as a phone number when cut off
+BOUNDARY_SAMPLE = "john.smith.5551234567@lab.org"
+
+
+def _make_text(rng, size_bytes, pii_rate):
+    """Synthetic lab prose of about `size_bytes` with PII sprinkled in."""
+    words = []
+    length = 0
+    while length < size_bytes:
+        word = rng.choice(PII_SAMPLES) if rng.random() < pii_rate else rng.choice(PROSE)
+        words.append(word)
+        length += len(word) + 1
+    return ' '.join(words)
+
+
+def _legacy_redact(text):
+    """Reference: one finditer per entity type, then one slice rebuild per entity."""
+    entities = []
+    for entity_type, pattern in PII_PATTERNS.items():
+        for match in re.finditer(pattern, text):
+            entities.append((match.start(), match.end(), entity_type))
+    redacted = text
+    for start, end, entity_type in sorted(entities, reverse=True):
+        redacted = redacted[:start] + f"[{entity_type}]" + redacted[end:]
+    return redacted, entities
+
+
+def _boundary_text(chunk_size, chunks, shift):
+    """BOUNDARY_SAMPLE placed to end `shift` characters past each chunk boundary."""
+    parts = []
+    length = 0
+    for boundary in range(chunk_size, chunk_size * chunks, chunk_size):
+        start = max(length + 1, boundary + shift - len(BOUNDARY_SAMPLE))
+        parts.append(' ' * (start - length) + BOUNDARY_SAMPLE)
+        length = start + len(BOUNDARY_SAMPLE)
+    return ''.join(parts) + ' ' * 16
+
+
+def _entity_keys(entities):
+    return [(entity['start'], entity['end'], entity['type']) for entity in entities]
+
+
+class Command(BaseCommand):
+    help = "Benchmark PII scanning and redaction throughput (MB/s)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--size-mb',
+            type=float,
+            default=5.0,
+            help='Size of the synthetic document in MB (default: 5)'
+        )
+        parser.add_argument(
+            '--pii-rate',
+            type=str,
+            default='0,0.001,0.01',
+            help='Comma-separated fractions of words that are PII'
+        )
+        parser.add_argument(
+            '--chunk-kb',
+            type=int,
+            default=64,
+            help='Chunk size for the streamed scan in KB (default: 64)'
+        )
+
+    def _throughput(self, size_bytes, func):
+        started = time.perf_counter()
+        result = func()
+        return result, size_bytes / (1024 * 1024) / (time.perf_counter() - started)
+
+    def handle(self, *args, **options):
+        rng = random.Random(42)
+        detector = PIIDetector()
+        size_bytes = int(options['size_mb'] * 1024 * 1024)
+        chunk_size = options['chunk_kb'] * 1024
+
+        for rate in options['pii_rate'].split(','):
+            rate = float(rate)
+            text = _make_text(rng, size_bytes, rate)
+            data = text.encode('utf-8')
+
+            (_, legacy_entities), legacy_mb_s = self._throughput(len(data), lambda: _legacy_redact(text))
+            (_, entities), redact_mb_s = self._throughput(len(data), lambda: detector.redact_pii(text))
+            streamed, stream_mb_s = self._throughput(len(data), lambda: detector.scan_stream(
+                data[offset:offset + chunk_size] for offset in range(0, len(data), chunk_size)
+            ))
+
+            self.stdout.write(f"\nPII rate {rate:g}: {len(data) / (1024 * 1024):.1f} MB, {len(entities)} entities")
+            self.stdout.write(f"  per-entity scan + slicing: {legacy_mb_s:8.1f} MB/s")
+            self.stdout.write(f"  single-pass redact:        {redact_mb_s:8.1f} MB/s ({redact_mb_s / legacy_mb_s:.1f}x)")
+            self.stdout.write(f"  streamed file scan:        {stream_mb_s:8.1f} MB/s "
+                              f"(reported {streamed['throughput_mb_s']:.1f} MB/s)")
+
+            if _entity_keys(streamed['entities']) != _entity_keys(entities):
+                self.stdout.write(self.style.WARNING("  streamed scan found different entities"))
+            elif len(legacy_entities) != len(entities):
+                # Per-entity scans can report the same text under two types
+                self.stdout.write(self.style.WARNING(
+                    f"  per-entity scan reported {len(legacy_entities)} entities (overlapping types)"
+                ))
+            else:
+                self.stdout.write(self.style.SUCCESS("  streamed and single-pass results identical"))
+
+        self._check_boundaries(detector, chunk_size)
+
+    def _check_boundaries(self, detector, chunk_size):
+        """Streamed and whole-text scans must agree on PII cut by a chunk boundary."""
+        # Enough chunks for several windows, so boundaries land at window ends too
+        chunks = 3 * STREAM_WINDOW_CHARS // chunk_size + 4
+        mismatched = []
+        for shift in range(len(BOUNDARY_SAMPLE) + 1):
+            text = _boundary_text(chunk_size, chunks, shift)
+            data = text.encode('utf-8')
+            streamed = detector.scan_stream(
+                data[offset:offset + chunk_size] for offset in range(0, len(data), chunk_size)
+            )
+            if _entity_keys(streamed['entities']) != _entity_keys(detector.redact_pii(text)[1]):
+                mismatched.append(shift)
+
+        if mismatched:
+            self.stdout.write(self.style.ERROR(
+                f"\nStreamed scan misreads PII across chunk boundaries (shifts {mismatched})"
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f"\nStreamed scan matches single-pass scan for PII across {chunks - 1} chunk boundaries"
+            ))
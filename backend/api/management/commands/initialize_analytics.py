@@ -218,12 +218,12 @@ class Command(BaseCommand):
         """Generate aggregated data based on raw metrics"""
         self.stdout.write("Generating aggregated metrics...")
         
+        from api.analytics.aggregator import MetricsAggregator
+        
         end_date = timezone.now().date()
+        MetricsAggregator.aggregate_metrics_range(end_date - datetime.timedelta(days=days - 1), end_date)
         for day in range(days):
             date = end_date - datetime.timedelta(days=day)
-            
-            from api.analytics.aggregator import MetricsAggregator
-            MetricsAggregator.aggregate_daily_metrics(date)
             MetricsAggregator.aggregate_query_types(date)
             
             self.stdout.write(f"Aggregated data for {date.strftime('%Y-%m-%d')}")
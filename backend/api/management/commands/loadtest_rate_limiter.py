@@ -0,0 +1,220 @@
+"""
+Django management command to load-test the rate limiter.
+Drives the limiter from several processes and threads with a mix of hot and
+cold clients, then reports throughput, decision latency and whether any
+client was admitted more often than its limit allows.
+"""
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from api.security.rate_limit_engine import create_rate_limiter
+from collections import Counter
+import multiprocessing
+import random
+import threading
+import time
+import uuid
+
+# Every Nth decision latency is kept for percentiles
+LATENCY_SAMPLE_EVERY = 10
+
+
+def _run_worker(options):
+    """Hammer the limiter from one process; returns per-client admissions and stats."""
+    limiter = create_rate_limiter(options['backend'], local_precheck=options['precheck'])
+    deadline = time.perf_counter() + options['duration']
+    hot = [f"loadtest:{options['run_id']}:hot:{i}" for i in range(options['hot_clients'])]
+    cold = [f"loadtest:{options['run_id']}:cold:{i}" for i in range(options['clients'])]
+
+    allowed = Counter()
+    decisions = Counter()
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+
+    def run_thread(seed):
+        rng = random.Random(seed)
+        local_allowed = Counter()
+        local_latencies = []
+        made = 0
+        try:
+            while time.perf_counter() < deadline:
+                client_id = rng.choice(hot) if hot and rng.random() < options['hot_share'] else rng.choice(cold)
+                started = time.perf_counter()
+                result = limiter.hit(client_id, 'loadtest', options['limit'], options['window'])
+                if made % LATENCY_SAMPLE_EVERY == 0:
+                    local_latencies.append(time.perf_counter() - started)
+                made += 1
+                if result.allowed:
+                    local_allowed[client_id] += 1
+        except Exception as e:
+            errors.append(str(e))
+        with lock:
+            allowed.update(local_allowed)
+            decisions['total'] += made
+            latencies.extend(local_latencies)
+
+    started = time.perf_counter()
+    threads = [
+        threading.Thread(target=run_thread, args=(hash((options['run_id'], options['index'], i)),))
+        for i in range(options['threads'])
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    decisions['local'] = limiter.local_decisions
+    decisions['backend'] = limiter.backend_decisions
+    return dict(allowed), dict(decisions), latencies, errors, time.perf_counter() - started
+
+
+def _percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class Command(BaseCommand):
+    help = "Load-test rate limiter accuracy and throughput"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--backend',
+            type=str,
+            default=None,
+            help="Limiter backend: 'redis' or 'local' (default: settings.RATE_LIMIT_BACKEND)"
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=4,
+            help='Processes, standing in for gunicorn workers (default: 4)'
+        )
+        parser.add_argument(
+            '--threads',
+            type=int,
+            default=8,
+            help='Threads per process (default: 8)'
+        )
+        parser.add_argument(
+            '--duration',
+            type=float,
+            default=5.0,
+            help='Seconds to run (default: 5)'
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=50,
+            help='Requests allowed per window (default: 50)'
+        )
+        parser.add_argument(
+            '--window',
+            type=float,
+            default=1.0,
+            help='Window length in seconds (default: 1)'
+        )
+        parser.add_argument(
+            '--clients',
+            type=int,
+            default=1000,
+            help='Number of cold clients (default: 1000)'
+        )
+        parser.add_argument(
+            '--hot-clients',
+            type=int,
+            default=5,
+            help='Number of hot clients (default: 5)'
+        )
+        parser.add_argument(
+            '--hot-share',
+            type=float,
+            default=0.8,
+            help='Fraction of requests sent by hot clients (default: 0.8)'
+        )
+        parser.add_argument(
+            '--no-precheck',
+            action='store_true',
+            help='Disable the in-process token-bucket pre-check'
+        )
+
+    def handle(self, *args, **options):
+        backend = options['backend'] or getattr(settings, 'RATE_LIMIT_BACKEND', 'redis')
+        workers = options['workers']
+        if backend == 'local' and workers > 1:
+            # Local buckets are per process, so several processes would each get the full limit
+            self.stdout.write(self.style.WARNING("The local backend is per process; running 1 worker"))
+            workers = 1
+        if options['clients'] < 1:
+            raise CommandError("--clients must be at least 1")
+
+        run_id = uuid.uuid4().hex[:8]
+        worker_options = [
+            {
+                'backend': backend,
+                'precheck': not options['no_precheck'],
+                'run_id': run_id,
+                'index': index,
+                'threads': options['threads'],
+                'duration': options['duration'],
+                'limit': options['limit'],
+                'window': options['window'],
+                'clients': options['clients'],
+                'hot_clients': options['hot_clients'],
+                'hot_share': options['hot_share'],
+            }
+            for index in range(workers)
+        ]
+
+        self.stdout.write(
+            f"Load-testing '{backend}' limiter: {workers} workers x {options['threads']} threads, "
+            f"{options['limit']}/{options['window']:g}s, {options['duration']:g}s, "
+            f"pre-check {'off' if options['no_precheck'] else 'on'}"
+        )
+
+        if workers == 1:
+            results = [_run_worker(worker_options[0])]
+        else:
+            with multiprocessing.get_context('fork').Pool(workers) as pool:
+                results = pool.map(_run_worker, worker_options)
+
+        allowed = Counter()
+        decisions = Counter()
+        latencies = []
+        errors = []
+        elapsed = 0.0
+        for worker_allowed, worker_decisions, worker_latencies, worker_errors, worker_elapsed in results:
+            allowed.update(worker_allowed)
+            decisions.update(worker_decisions)
+            latencies.extend(worker_latencies)
+            errors.extend(worker_errors)
+            elapsed = max(elapsed, worker_elapsed)
+
+        if errors:
+            raise CommandError(f"{len(errors)} worker threads failed, first error: {errors[0]}")
+
+        # GCRA admits at most a full bucket plus the refill over the run
+        bound = options['limit'] + options['limit'] * elapsed / options['window']
+        over_admitted = {client: count - bound for client, count in allowed.items() if count > bound}
+        hot_counts = [count for client, count in allowed.items() if ':hot:' in client]
+
+        total = decisions['total']
+        self.stdout.write(f"  decisions:          {total} in {elapsed:.2f}s ({total / elapsed:,.0f} req/s)")
+        self.stdout.write(f"  latency:            p50 {_percentile(latencies, 0.5) * 1000:.3f} ms, "
+                          f"p99 {_percentile(latencies, 0.99) * 1000:.3f} ms")
+        self.stdout.write(f"  answered locally:   {decisions['local']} "
+                          f"({decisions['local'] / max(total, 1):.0%}), backend calls: {decisions['backend']}")
+        self.stdout.write(f"  admitted:           {sum(allowed.values())} requests, bound per client {bound:.0f}")
+        if hot_counts:
+            self.stdout.write(f"  hot clients:        {min(hot_counts)}-{max(hot_counts)} admitted "
+                              f"({min(hot_counts) / bound:.1%}-{max(hot_counts) / bound:.1%} of bound)")
+
+        if over_admitted:
+            worst = max(over_admitted.values())
+            self.stdout.write(self.style.ERROR(
+                f"  {len(over_admitted)} clients admitted above their limit (worst by {worst:.0f})"
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS("  no client admitted above its limit"))
@@ -0,0 +1,43 @@
+"""
+Django management command to run the shared cross-encoder rerank server.
+Loads one model copy and micro-batches requests from all web workers
+arriving over a Unix socket.
+"""
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from api.search.rerank_batcher import RerankSocketServer, get_batcher
+
+
+class Command(BaseCommand):
+    help = "Run the shared micro-batching cross-encoder server on a Unix socket"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--socket',
+            type=str,
+            default=None,
+            help='Unix socket path (default: settings.RERANK_SERVER_SOCKET)'
+        )
+
+    def handle(self, *args, **options):
+        socket_path = options['socket'] or getattr(settings, 'RERANK_SERVER_SOCKET', '')
+        if not socket_path:
+            raise CommandError("No socket path given and RERANK_SERVER_SOCKET is not set")
+
+        batcher = get_batcher()
+        if batcher is None:
+            raise CommandError("Could not load the cross-encoder model")
+
+        server = RerankSocketServer(socket_path, batcher)
+        self.stdout.write(self.style.SUCCESS(f"Rerank server listening on {socket_path}"))
+
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            self.stdout.write("Shutting down rerank server")
+        finally:
+            server.server_close()
+            self.stdout.write(
+                f"Served {batcher.requests_served} requests in {batcher.batches_run} batches"
+            )
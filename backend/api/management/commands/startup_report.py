@@ -0,0 +1,132 @@
+"""
+Django management command to report process startup costs.
+Measures per-module import time in a fresh interpreter (python -X importtime)
+for Django setup plus the app modules a worker imports, and optionally the
+load time of each model in the lazy model registry.
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+from api.model_registry import get_model_registry
+import subprocess
+import sys
+import time
+
+
+# Modules a web or Celery worker imports while serving requests
+APP_MODULES = (
+    'api.views',
+    'api.search.services',
+    'api.search.reranking',
+    'api.offline',
+    'api.offline.local_llm',
+    'api.llm',
+    'api.llm.local_embeddings',
+    'rna_backend.celery',
+)
+
+# Heavy third-party packages worth calling out when they appear
+HEAVY_MODULES = ('torch', 'sentence_transformers', 'transformers', 'llama_cpp',
+                 'onnxruntime', 'numpy', 'openai', 'weaviate')
+
+
+def _parse_importtime(stderr):
+    """
+    Parse `-X importtime` output into {module: (self_us, cumulative_us)}.
+    Lines look like "import time:       412 |       1020 |   api.views".
+    """
+    timings = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        parts = line[len('import time:'):].split('|')
+        if len(parts) != 3:
+            continue
+        try:
+            self_us, cumulative_us = int(parts[0]), int(parts[1])
+        except ValueError:
+            continue  # Header line
+        timings[parts[2].strip()] = (self_us, cumulative_us)
+    return timings
+
+
+class Command(BaseCommand):
+    help = "Report import cost per module and model load cost at process startup"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--top',
+            type=int,
+            default=20,
+            help='Number of most expensive modules to list (default: 20)'
+        )
+        parser.add_argument(
+            '--modules',
+            type=str,
+            default=None,
+            help='Comma-separated modules to import after django.setup() (default: app modules)'
+        )
+        parser.add_argument(
+            '--load-models',
+            action='store_true',
+            help='Also load every registered model and report its load time'
+        )
+
+    def handle(self, *args, **options):
+        modules = (
+            [name.strip() for name in options['modules'].split(',') if name.strip()]
+            if options['modules'] else list(APP_MODULES)
+        )
+        imports = '; '.join(f'import {name}' for name in modules)
+        code = f"import django; django.setup(); {imports}"
+
+        started = time.perf_counter()
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', code],
+            capture_output=True, text=True
+        )
+        wall = time.perf_counter() - started
+        if result.returncode != 0:
+            errors = [line for line in result.stderr.splitlines() if not line.startswith('import time:')]
+            raise CommandError("Startup import failed:\n" + '\n'.join(errors[-20:]))
+
+        timings = _parse_importtime(result.stderr)
+        total_us = sum(self_us for self_us, _ in timings.values())
+
+        self.stdout.write(
+            f"Imported {len(timings)} modules in {total_us / 1e6:.2f}s "
+            f"({wall:.2f}s wall including interpreter start)"
+        )
+
+        self.stdout.write("\nApp modules (cumulative import time):")
+        for name in modules:
+            if name in timings:
+                self.stdout.write(f"  {name:40s} {timings[name][1] / 1e3:9.1f} ms")
+            else:
+                self.stdout.write(f"  {name:40s}  (imported earlier)")
+
+        heavy = [name for name in HEAVY_MODULES if name in timings]
+        if heavy:
+            self.stdout.write(self.style.WARNING("\nHeavy packages imported at startup:"))
+            for name in heavy:
+                self.stdout.write(f"  {name:40s} {timings[name][1] / 1e3:9.1f} ms")
+
+        self.stdout.write(f"\nTop {options['top']} modules by cumulative import time:")
+        ranked = sorted(timings.items(), key=lambda item: item[1][1], reverse=True)
+        for name, (self_us, cumulative_us) in ranked[:options['top']]:
+            self.stdout.write(
+                f"  {name:50s} {cumulative_us / 1e3:9.1f} ms (self {self_us / 1e3:.1f} ms)"
+            )
+
+        if options['load_models']:
+            registry = get_model_registry()
+            self.stdout.write("\nModel load times:")
+            registry.warm_up(registry.names())
+            for entry in registry.report():
+                if entry['error']:
+                    self.stdout.write(self.style.ERROR(
+                        f"  {entry['name']:25s} failed after {entry['load_seconds']:.2f}s: {entry['error']}"
+                    ))
+                else:
+                    self.stdout.write(
+                        f"  {entry['name']:25s} {entry['load_seconds']:7.2f}s  {entry['description']}"
+                    )
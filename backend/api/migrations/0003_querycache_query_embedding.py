@@ -0,0 +1,22 @@
+# Generated by Django 4.2.10 on 2026-10-18 10:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("api", "0002_queryhistory_doc_type_queryhistory_processing_time"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="querycache",
+            name="query_embedding",
+            field=models.BinaryField(
+                blank=True,
+                editable=False,
+                help_text="Packed float32 embedding used for semantic cache lookups",
+                null=True,
+            ),
+        ),
+    ]
@@ -0,0 +1,250 @@
+"""
+Lazy registry of heavy ML models (cross-encoders, local LLM, embedders).
+
+Importing sentence-transformers, torch or llama.cpp and loading weights
+takes seconds, so nothing is imported or loaded at module import time.
+Models are registered by name with a loader, loaded once per process on
+first `get()`, and timed, so Django and Celery start fast and workers
+that never rerank never pay for the cross-encoder. A failed load is
+retried on a later `get()` once MODEL_LOAD_RETRY_SECONDS have passed.
+
+Workers can opt into loading models up front with `warm_up()`, run
+post-fork from the gunicorn `post_worker_init` hook (gunicorn.conf.py)
+and Celery's `worker_process_init` signal, for the models listed in
+settings.MODEL_WARMUP.
+"""
+
+import time
+import logging
+import threading
+from typing import Any, Callable, Dict, Iterable, List
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class _ModelEntry:
+    __slots__ = ('name', 'loader', 'description', 'lock', 'model', 'loaded',
+                 'load_seconds', 'error', 'failed_at', 'failures')
+
+    def __init__(self, name: str, loader: Callable[[], Any], description: str):
+        self.name = name
+        self.loader = loader
+        self.description = description
+        self.lock = threading.Lock()
+        self.model = None
+        self.loaded = False
+        self.load_seconds = None
+        self.error = None
+        self.failed_at = None
+        self.failures = 0
+
+
+class ModelRegistry:
+    """
+    Named, lazily loaded, process-wide model instances.
+    """
+
+    def __init__(self, retry_seconds: float = None):
+        self.retry_seconds = (
+            retry_seconds if retry_seconds is not None
+            else getattr(settings, 'MODEL_LOAD_RETRY_SECONDS', 60)
+        )
+        self._entries: Dict[str, _ModelEntry] = {}
+        self._lock = threading.Lock()
+
+    def register(self, name: str, loader: Callable[[], Any], description: str = "") -> None:
+        """
+        Register a model loader. Re-registering a name replaces an unloaded entry.
+
+        Args:
+            name (str): Model name, e.g. 'cross_encoder'
+            loader: Zero-argument callable that imports and builds the model
+            description (str): Human-readable description for reports
+        """
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is None or not entry.loaded:
+                self._entries[name] = _ModelEntry(name, loader, description)
+
+    def get(self, name: str) -> Any:
+        """
+        Get a model, loading it on first use.
+        If the loader fails, None is returned and the load is retried by
+        the first call after `retry_seconds`.
+
+        Args:
+            name (str): Registered model name
+
+        Returns:
+            The model instance, or None if loading failed
+        """
+        entry = self._entries.get(name)
+        if entry is None:
+            raise KeyError(f"Unknown model '{name}'")
+        if entry.loaded:
+            return entry.model
+        if self._backing_off(entry):
+            return None
+
+        with entry.lock:
+            if entry.loaded or self._backing_off(entry):
+                return entry.model
+
+            started = time.perf_counter()
+            try:
+                model = entry.loader()
+            except Exception as e:
+                entry.load_seconds = time.perf_counter() - started
+                entry.error = str(e)
+                entry.failed_at = time.monotonic()
+                entry.failures += 1
+                logger.error(f"Error loading model '{name}' (attempt {entry.failures}), "
+                             f"retrying in {self.retry_seconds}s: {e}")
+                return None
+
+            entry.model = model
+            entry.load_seconds = time.perf_counter() - started
+            entry.error = None
+            entry.loaded = True
+            logger.info(f"Loaded model '{name}' in {entry.load_seconds:.2f}s")
+        return entry.model
+
+    def _backing_off(self, entry: _ModelEntry) -> bool:
+        return (entry.failed_at is not None
+                and time.monotonic() - entry.failed_at < self.retry_seconds)
+
+    def is_loaded(self, name: str) -> bool:
+        entry = self._entries.get(name)
+        return entry is not None and entry.loaded
+
+    def names(self) -> List[str]:
+        return list(self._entries)
+
+    def warm_up(self, names: Iterable[str] = None) -> Dict[str, float]:
+        """
+        Load models ahead of the first request.
+
+        Args:
+            names: Models to load. Defaults to settings.MODEL_WARMUP.
+
+        Returns:
+            dict: Load time in seconds per model loaded by this call
+        """
+        if names is None:
+            names = getattr(settings, 'MODEL_WARMUP', [])
+
+        timings = {}
+        for name in names:
+            if name not in self._entries:
+                logger.warning(f"Cannot warm up unknown model '{name}'")
+                continue
+            if not self.is_loaded(name):
+                self.get(name)
+                if self.is_loaded(name):
+                    timings[name] = self._entries[name].load_seconds
+        return timings
+
+    def report(self) -> List[Dict[str, Any]]:
+        """
+        Load state of every registered model.
+
+        Returns:
+            list: name, description, loaded, load_seconds, error and failures per model
+        """
+        return [
+            {
+                'name': entry.name,
+                'description': entry.description,
+                'loaded': entry.loaded,
+                'load_seconds': entry.load_seconds,
+                'error': entry.error,
+                'failures': entry.failures,
+            }
+            for entry in self._entries.values()
+        ]
+
+
+_model_registry = None
+_model_registry_lock = threading.Lock()
+
+
+def _load_cross_encoder():
+    from .search.reranking import get_cross_encoder
+    # get_cross_encoder logs load errors and returns None; raise so the load is retried
+    model = get_cross_encoder()
+    if model is None:
+        raise RuntimeError("cross-encoder could not be loaded")
+    return model
+
+
+def _load_offline_cross_encoder():
+    from .offline import load_cross_encoder
+    return load_cross_encoder()
+
+
+def _load_local_llm():
+    from .offline.local_llm import LocalLLM
+    return LocalLLM()
+
+
+def _load_local_embedding_model():
+    from .llm.local_embeddings import LocalEmbeddingModel
+    return LocalEmbeddingModel()
+
+
+def get_model_registry() -> ModelRegistry:
+    """
+    Get the process-wide model registry with the built-in models registered.
+
+    Returns:
+        ModelRegistry: Shared registry instance
+    """
+    global _model_registry
+
+    if _model_registry is None:
+        with _model_registry_lock:
+            if _model_registry is None:
+                registry = ModelRegistry()
+                registry.register('cross_encoder', _load_cross_encoder,
+                                  "Search reranking cross-encoder (sentence-transformers)")
+                registry.register('offline_cross_encoder', _load_offline_cross_encoder,
+                                  "Fallback cross-encoder, local path in offline mode")
+                registry.register('local_llm', _load_local_llm,
+                                  "Offline llama.cpp LLM and sentence-transformers embedder")
+                registry.register('local_embedding', _load_local_embedding_model,
+                                  "Network-isolated ONNX embedding model")
+                _model_registry = registry
+
+    return _model_registry
+
+
+def get_model(name: str) -> Any:
+    """
+    Get a registered model, loading it on first use.
+
+    Args:
+        name (str): Registered model name
+
+    Returns:
+        The model instance, or None if loading failed
+    """
+    return get_model_registry().get(name)
+
+
+def warm_up_models(names: Iterable[str] = None) -> Dict[str, float]:
+    """
+    Load the configured models now; used by the post-fork worker hooks.
+
+    Args:
+        names: Models to load. Defaults to settings.MODEL_WARMUP.
+
+    Returns:
+        dict: Load time in seconds per model loaded
+    """
+    started = time.perf_counter()
+    timings = get_model_registry().warm_up(names)
+    if timings:
+        logger.info(f"Warmed up {', '.join(timings)} in {time.perf_counter() - started:.2f}s")
+    return timings
@@ -105,6 +105,8 @@ class QueryCache(models.Model):
     hit_count = models.PositiveIntegerField(default=1)
     created_at = models.DateTimeField(auto_now_add=True)
     last_accessed = models.DateTimeField(auto_now=True)
+    query_embedding = models.BinaryField(null=True, blank=True, editable=False,
+                                         help_text="Packed float32 embedding used for semantic cache lookups")
     
     def __str__(self):
         return f"Cache: {self.query_text[:40]}... (Hits: {self.hit_count})"
@@ -40,9 +40,9 @@ def get_llm_client():
             from api.llm import get_llm_client as get_isolated_client
             return get_isolated_client(isolation_level="isolated")
         else:
-            # Use OpenAI client
-            from openai import OpenAI
-            return OpenAI(api_key=settings.OPENAI_API_KEY)
+            # Use the shared, pooled OpenAI client
+            from api.llm.clients import get_openai_client
+            return get_openai_client()
 
 def get_vector_db_client():
     """
@@ -108,7 +108,15 @@ def get_vector_db_client():
 
 def get_cross_encoder():
     """
-    Get the appropriate cross-encoder based on offline mode.
+    Get the appropriate cross-encoder based on offline mode, loaded once per
+    process through the model registry.
+    """
+    from api.model_registry import get_model
+    return get_model('offline_cross_encoder')
+
+def load_cross_encoder():
+    """
+    Load the appropriate cross-encoder based on offline mode.
     Returns online cross-encoder in online mode or local cross-encoder in offline mode.
     """
     from sentence_transformers import CrossEncoder
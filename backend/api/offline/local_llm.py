@@ -4,21 +4,16 @@ Uses llama.cpp and sentence-transformers for embedding generation in offline mod
 """
 
 import os
+import time
 import logging
-from typing import List, Dict, Any, Optional, Union
+import threading
+from typing import List, Dict, Any, Optional, Tuple, Union
 from dataclasses import dataclass
 import json
 
 from django.conf import settings
-from sentence_transformers import SentenceTransformer
 
-# Try to import llama_cpp, with graceful fallback
-try:
-    from llama_cpp import Llama
-    LLAMA_CPP_AVAILABLE = True
-except ImportError:
-    LLAMA_CPP_AVAILABLE = False
-    logging.warning("llama_cpp not available. Install with: pip install llama-cpp-python")
+from .prompt_cache import PromptStateCache, PREFIX_MISS
 
 logger = logging.getLogger(__name__)
 
@@ -48,6 +43,29 @@ class LLMResponse:
     usage: Dict[str, int] = None
 
 
+@dataclass
+class Delta:
+    """Streamed content delta to mimic OpenAI API structure"""
+    content: str
+    role: str = "assistant"
+
+
+@dataclass
+class StreamChoice:
+    """Streamed choice to mimic OpenAI API structure"""
+    delta: Delta
+    index: int = 0
+    finish_reason: Optional[str] = None
+
+
+@dataclass
+class StreamChunk:
+    """Stream chunk to mimic OpenAI API structure"""
+    choices: List[StreamChoice]
+    id: str = "local-llm"
+    model: str = "local-model"
+
+
 class LocalLLM:
     """
     Local LLM wrapper for offline operation.
@@ -63,18 +81,32 @@ class LocalLLM:
         self.n_gpu_layers = self.config.get('n_gpu_layers', -1)
         self.model = None
         self.embedding_model = None
+        # llama.cpp contexts are not thread-safe; one generation at a time
+        self.generate_lock = threading.Lock()
+        prompt_cache_mb = self.config.get('prompt_cache_mb', 512)
+        self.prompt_cache = PromptStateCache(prompt_cache_mb * 1024 * 1024) if prompt_cache_mb else None
         
-        # Load embedding model
-        self._load_embedding_model()
+        self._embedding_loaded = False
+        self._embedding_lock = threading.Lock()
         
     def _load_embedding_model(self):
-        """Load the local embedding model"""
+        """Load the local embedding model on first use"""
+        if self._embedding_loaded:
+            return
+        with self._embedding_lock:
+            if not self._embedding_loaded:
+                self._load_embedding_model_locked()
+                self._embedding_loaded = True
+    
+    def _load_embedding_model_locked(self):
         embedding_path = self.config.get('embedding_model_path', '')
         if not embedding_path or not os.path.exists(embedding_path):
             logger.error(f"Embedding model path not found: {embedding_path}")
             return
         
         try:
+            # Imported here: sentence-transformers pulls in torch, which slows startup
+            from sentence_transformers import SentenceTransformer
             self.embedding_model = SentenceTransformer(embedding_path)
             logger.info(f"Loaded embedding model from {embedding_path}")
         except Exception as e:
@@ -85,8 +117,11 @@ class LocalLLM:
         if self.model is not None:
             return
             
-        if not LLAMA_CPP_AVAILABLE:
-            logger.error("Cannot load LLM: llama_cpp not available")
+        # Imported on first use, loading llama.cpp's shared library is not free
+        try:
+            from llama_cpp import Llama
+        except ImportError:
+            logger.error("Cannot load LLM: llama_cpp not available. Install with: pip install llama-cpp-python")
             return
             
         full_path = os.path.join(self.model_path, self.model_name)
@@ -123,8 +158,52 @@ class LocalLLM:
         prompt += "<|assistant|>\n"
         return prompt
     
+    def _split_prompt(self, messages: List[Dict[str, str]]) -> Tuple[str, str]:
+        """
+        Split the formatted prompt into the prefix shared between requests and
+        the per-request rest. The shared prefix is the system messages plus
+        the first paragraph of the first user message (the answer preamble),
+        when a paragraph break follows it.
+        """
+        prompt = self._format_prompt(messages)
+        prefix = ""
+        for msg in messages:
+            role = msg.get("role", "user")
+            content = msg.get("content", "")
+            if role == "system":
+                prefix += f"<|system|>\n{content}\n"
+                continue
+            if role == "user" and "\n\n" in content:
+                prefix += "<|user|>\n" + content[:content.index("\n\n") + 2]
+            break
+        return prefix, prompt[len(prefix):]
+    
+    def _prompt_input(self, prefix: str, suffix: str) -> Tuple[Union[str, List[int]], str]:
+        """
+        Prompt to pass to llama.cpp, restoring the cached state of the shared
+        prefix first. The caller must hold `generate_lock`.
+        
+        Returns:
+            tuple: (prompt string or token list, prefix cache outcome)
+        """
+        if self.prompt_cache is None or not prefix:
+            return prefix + suffix, PREFIX_MISS
+        
+        # special=True as llama.cpp uses for string prompts, so chat-template
+        # markers like <|system|> map to the model's special tokens
+        prefix_tokens = self.model.tokenize(prefix.encode("utf-8"), add_bos=True, special=True)
+        suffix_tokens = self.model.tokenize(suffix.encode("utf-8"), add_bos=False, special=True)
+        try:
+            outcome = self.prompt_cache.prepare(self.model, prefix_tokens)
+        except Exception as e:
+            logger.warning(f"Prompt prefix cache failed, evaluating the full prompt: {e}")
+            self.model.reset()
+            outcome = PREFIX_MISS
+        return prefix_tokens + suffix_tokens, outcome
+    
     def embeddings(self):
         """Return an embeddings interface compatible with OpenAI embeddings API"""
+        self._load_embedding_model()
         return LocalEmbeddingEngine(self.embedding_model)
 
     def chat(self):
@@ -151,30 +230,33 @@ class LocalChatEngine:
             self.llm._load_llm()
             if self.llm.model is None:
                 logger.error("Failed to load LLM model")
-                return self._create_error_response()
+                return self._create_error_response(stream)
         
-        # Format the prompt
-        prompt = self.llm._format_prompt(messages)
+        # Format the prompt, keeping the shared prefix separate for the KV cache
+        prompt_parts = self.llm._split_prompt(messages)
         
         # Generate from the model
         try:
             if stream:
-                return self._generate_stream(prompt, temperature, max_tokens)
+                return self._generate_stream(prompt_parts, temperature, max_tokens)
             else:
-                return self._generate(prompt, temperature, max_tokens)
+                return self._generate(prompt_parts, temperature, max_tokens)
         except Exception as e:
             logger.error(f"Error generating from local model: {e}")
-            return self._create_error_response()
+            return self._create_error_response(stream)
     
-    def _generate(self, prompt: str, temperature: float, max_tokens: int) -> LLMResponse:
+    def _generate(self, prompt_parts: Tuple[str, str], temperature: float, max_tokens: int) -> LLMResponse:
         """Generate a response from the model"""
-        result = self.llm.model(
-            prompt, 
-            max_tokens=max_tokens,
-            temperature=temperature,
-            stop=["<|user|>", "<|system|>"],
-            echo=False
-        )
+        prompt = "".join(prompt_parts)
+        with self.llm.generate_lock:
+            prompt_input, _ = self.llm._prompt_input(*prompt_parts)
+            result = self.llm.model(
+                prompt_input, 
+                max_tokens=max_tokens,
+                temperature=temperature,
+                stop=["<|user|>", "<|system|>"],
+                echo=False
+            )
         
         # Format response to match OpenAI
         text = result.get("choices", [{}])[0].get("text", "").strip()
@@ -188,66 +270,152 @@ class LocalChatEngine:
         )
         return response
     
-    def _generate_stream(self, prompt: str, temperature: float, max_tokens: int) -> Any:
-        """Generate a streaming response"""
-        # This simulates the OpenAI streaming interface
-        class StreamWrapper:
-            def __init__(self, llm_model, prompt, temp, max_t):
-                self.model = llm_model
-                self.prompt = prompt
-                self.temp = temp
-                self.max_tokens = max_t
-                self.finished = False
-                
-            def __iter__(self):
-                return self
-                
-            def __next__(self):
-                if self.finished:
-                    raise StopIteration
-                
-                # Generate the full response first (not truly streaming, but simulates it)
-                result = self.model(
-                    self.prompt,
-                    max_tokens=self.max_tokens,
-                    temperature=self.temp,
-                    stop=["<|user|>", "<|system|>"],
-                    echo=False
-                )
-                
-                text = result.get("choices", [{}])[0].get("text", "").strip()
-                self.finished = True
-                
-                # Return a dictionary similar to what OpenAI streaming returns
-                return type('obj', (object,), {
-                    'choices': [
-                        type('obj', (object,), {
-                            'delta': type('obj', (object,), {
-                                'content': text
-                            }),
-                            'finish_reason': 'stop',
-                            'index': 0
-                        })
-                    ]
-                })
-        
-        return StreamWrapper(self.llm.model, prompt, temperature, max_tokens)
+    def _generate_stream(self, prompt_parts: Tuple[str, str], temperature: float,
+                         max_tokens: int) -> "LocalCompletionStream":
+        """Stream a response token by token from the model"""
+        return LocalCompletionStream(self.llm, prompt_parts, temperature, max_tokens)
     
-    def _create_error_response(self) -> LLMResponse:
+    def _create_error_response(self, stream: bool = False) -> Union[LLMResponse, Any]:
         """Create an error response when model generation fails"""
+        content = "I'm sorry, I encountered an error processing your request in offline mode."
+        if stream:
+            return iter([StreamChunk(choices=[StreamChoice(delta=Delta(content=content), finish_reason="stop")])])
         return LLMResponse(
             choices=[Choice(message=Message(
                 role="assistant", 
-                content="I'm sorry, I encountered an error processing your request in offline mode."
+                content=content
             ))],
             usage={"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
         )
 
 
+class LocalCompletionStream:
+    """
+    Iterator over OpenAI-style stream chunks backed by llama.cpp's
+    `stream=True` generator, so tokens reach the client as they are sampled.
+
+    Holds the model's generation lock until the stream is exhausted or
+    closed; call `close()` (e.g. when the client disconnects) to stop
+    generating early. Timing is available from `metrics` afterwards.
+    """
+    
+    def __init__(self, llm: "LocalLLM", prompt_parts: Tuple[str, str], temperature: float, max_tokens: int):
+        self.llm = llm
+        self.prompt_parts = prompt_parts
+        self.prefix_cache = None
+        self.temperature = temperature
+        self.max_tokens = max_tokens
+        self.started_at = None
+        self.first_token_at = None
+        self.finished_at = None
+        self.completion_tokens = 0
+        self.finish_reason = None
+        self.cancelled = False
+        self._generator = None
+        self._locked = False
+        self._leading = True
+    
+    def __iter__(self):
+        return self
+    
+    def __next__(self) -> StreamChunk:
+        if self.finished_at is not None:
+            raise StopIteration
+        
+        if self._generator is None:
+            self.llm.generate_lock.acquire()
+            self._locked = True
+            self.started_at = time.perf_counter()
+            prompt_input, self.prefix_cache = self.llm._prompt_input(*self.prompt_parts)
+            self._generator = self.llm.model(
+                prompt_input,
+                max_tokens=self.max_tokens,
+                temperature=self.temperature,
+                stop=["<|user|>", "<|system|>"],
+                echo=False,
+                stream=True
+            )
+        
+        while True:
+            try:
+                chunk = next(self._generator)
+            except StopIteration:
+                self._finish()
+                raise
+            except Exception as e:
+                logger.error(f"Error streaming from local model: {e}")
+                self.finish_reason = "error"
+                self._finish()
+                raise StopIteration
+            
+            choice = chunk.get("choices", [{}])[0]
+            text = choice.get("text", "")
+            self.finish_reason = choice.get("finish_reason") or self.finish_reason
+            if text:
+                self.completion_tokens += 1
+                if self.first_token_at is None:
+                    self.first_token_at = time.perf_counter()
+            if self._leading:
+                # Match the non-streaming path, which strips the answer
+                text = text.lstrip()
+                self._leading = not text
+            if text or self.finish_reason:
+                return StreamChunk(choices=[StreamChoice(
+                    delta=Delta(content=text),
+                    finish_reason=self.finish_reason
+                )])
+    
+    def close(self) -> None:
+        """Stop generation early and release the model."""
+        if self.finished_at is None and self._generator is not None:
+            self.cancelled = True
+        self._finish()
+    
+    def _finish(self) -> None:
+        if self.finished_at is None:
+            self.finished_at = time.perf_counter()
+        try:
+            close_generator = getattr(self._generator, 'close', None)
+            if close_generator is not None:
+                close_generator()
+        finally:
+            if self._locked:
+                self._locked = False
+                self.llm.generate_lock.release()
+    
+    def __del__(self):
+        # Never leave the model locked if the consumer drops the stream
+        if self._locked:
+            self._finish()
+    
+    @property
+    def metrics(self) -> Dict[str, Any]:
+        """
+        Streaming timings: time to first token, tokens/sec after the first
+        token, tokens generated, whether the stream was cancelled and how
+        the shared prompt prefix was served.
+        """
+        end = self.finished_at or time.perf_counter()
+        ttft_ms = None
+        tokens_per_second = None
+        if self.started_at is not None and self.first_token_at is not None:
+            ttft_ms = (self.first_token_at - self.started_at) * 1000
+            decode_seconds = end - self.first_token_at
+            if self.completion_tokens > 1 and decode_seconds > 0:
+                tokens_per_second = (self.completion_tokens - 1) / decode_seconds
+        return {
+            'time_to_first_token_ms': ttft_ms,
+            'tokens_per_second': tokens_per_second,
+            'completion_tokens': self.completion_tokens,
+            'cancelled': self.cancelled,
+            'prefix_cache': self.prefix_cache,
+        }
+
+
 class LocalEmbeddingEngine:
     """Provides a compatible interface with OpenAI embeddings API"""
     
-    def __init__(self, model: SentenceTransformer):
+    def __init__(self, model: "SentenceTransformer"):
         self.model = model
         
     def create(self, model: str = None, input: Union[str, List[str]] = None, **kwargs) -> Dict[str, Any]:
@@ -289,5 +457,16 @@ class LocalEmbeddingEngine:
 
 
 def get_local_llm() -> LocalLLM:
-    """Factory function to get a local LLM instance"""
-    return LocalLLM()
\ No newline at end of file
+    """
+    Get the process-wide local LLM. Weights load on first use, and one
+    shared instance keeps the generation lock and prompt cache effective.
+    
+    Raises:
+        RuntimeError: If the local LLM could not be built; the model registry
+            retries after MODEL_LOAD_RETRY_SECONDS
+    """
+    from api.model_registry import get_model
+    local_llm = get_model('local_llm')
+    if local_llm is None:
+        raise RuntimeError("Local LLM could not be loaded")
+    return local_llm
\ No newline at end of file
@@ -7,11 +7,20 @@ import os
 import logging
 import json
 import uuid
+import struct
+import sqlite3
+import threading
+from contextlib import contextmanager
 from typing import List, Dict, Any, Optional, Union, Tuple
 import numpy as np
 
 from django.conf import settings
 
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process locking for FAISS writers
+    fcntl = None
+
 logger = logging.getLogger(__name__)
 
 # Try to import vector DB dependencies with graceful fallback
@@ -108,7 +117,13 @@ class LocalVectorDB:
     def _initialize_faiss(self):
         """Initialize FAISS client"""
         # FAISS needs custom wrapper implementation
-        self.client = FAISSWrapper(self.db_path)
+        self.client = FAISSWrapper(
+            self.db_path,
+            compact_threshold=self.config.get('faiss_compact_threshold', 50000),
+            use_mmap=self.config.get('faiss_mmap', True)
+        )
+        # Collections already on disk are searchable before the first write
+        self.collections_initialized.update(self.client.collections)
         logger.info(f"Initialized FAISS wrapper at {self.db_path}")
     
     def ensure_collection(self, collection_name: str, vector_size: int = 1536):
@@ -181,6 +196,49 @@ class LocalVectorDB:
             logger.error(f"Failed to add item to {collection_name}: {e}")
             return None
     
+    def add_many(self, collection_name: str, data_objects: List[Dict[str, Any]],
+                 vectors: List[List[float]], document_ids: List[str] = None) -> List[str]:
+        """Add a batch of items to the vector DB in one write"""
+        if self.client is None:
+            logger.error("Vector DB client not initialized")
+            return []
+        if not vectors:
+            return []
+            
+        # Ensure collection exists
+        self.ensure_collection(collection_name, len(vectors[0]))
+        
+        if document_ids is None:
+            document_ids = [str(uuid.uuid4()) for _ in vectors]
+            
+        try:
+            if self.engine_type == 'qdrant':
+                self.client.upsert(
+                    collection_name=collection_name,
+                    points=[
+                        qdrant_models.PointStruct(id=document_id, vector=vector, payload=data_object)
+                        for document_id, vector, data_object in zip(document_ids, vectors, data_objects)
+                    ]
+                )
+                return document_ids
+            elif self.engine_type == 'chroma':
+                collection = self.client.get_collection(collection_name)
+                collection.upsert(
+                    ids=document_ids,
+                    embeddings=vectors,
+                    metadatas=[
+                        {k: json.dumps(v) if isinstance(v, (dict, list)) else str(v)
+                         for k, v in data_object.items()}
+                        for data_object in data_objects
+                    ]
+                )
+                return document_ids
+            elif self.engine_type == 'faiss':
+                return self.client.add_many(collection_name, data_objects, vectors, document_ids)
+        except Exception as e:
+            logger.error(f"Failed to add {len(vectors)} items to {collection_name}: {e}")
+        return []
+    
     def _add_qdrant(self, collection_name: str, data_object: Dict[str, Any], 
                    vector: List[float], document_id: str) -> str:
         """Add item to Qdrant"""
@@ -341,139 +399,623 @@ class LocalVectorDB:
         return self.client.search(collection_name, query_vector, limit, filters)
 
 
+def _json_equals(text: str, value: Any) -> bool:
+    try:
+        return json.loads(text) == value
+    except ValueError:
+        return False
+
+
+class FAISSCollection:
+    """
+    A single FAISS collection persisted incrementally on disk.
+    
+    Files under the database path:
+        <name>.index   Compacted FAISS snapshot, memory-mapped when loaded so
+                       worker processes start instantly and share pages
+        <name>.wal     Append-only log of normalised vectors added since the
+                       snapshot; replayed into a small in-memory delta index
+        <name>.sqlite  Document ids and metadata keyed by internal FAISS id
+    
+    Once the delta grows past `compact_threshold` vectors, the snapshot and
+    the log are merged into a new snapshot.
+    """
+    
+    # WAL header: internal id of the first logged vector, vector dimension
+    WAL_HEADER = struct.Struct("<qi")
+    
+    def __init__(self, db_path: str, name: str, vector_size: int = None,
+                 compact_threshold: int = 50000, use_mmap: bool = True):
+        self.name = name
+        self.index_path = os.path.join(db_path, f"{name}.index")
+        self.wal_path = os.path.join(db_path, f"{name}.wal")
+        self.sqlite_path = os.path.join(db_path, f"{name}.sqlite")
+        self.lock_path = os.path.join(db_path, f"{name}.lock")
+        self.compact_threshold = compact_threshold
+        self.use_mmap = use_mmap
+        
+        self._lock = threading.RLock()
+        self._write_depth = 0
+        self._db = self._connect()
+        
+        self.dimension = vector_size or self._get_setting("dimension", int)
+        self.base = None
+        self.delta = None
+        self._index_stat = None
+        self._wal_size = 0
+        self._attributes = {}
+        
+        self._load()
+        self._import_legacy_json(db_path)
+    
+    @property
+    def base_count(self) -> int:
+        return self.base.ntotal if self.base is not None else 0
+    
+    @property
+    def ntotal(self) -> int:
+        return self.base_count + (self.delta.ntotal if self.delta is not None else 0)
+    
+    def _connect(self) -> sqlite3.Connection:
+        db = sqlite3.connect(self.sqlite_path, check_same_thread=False)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS items ("
+            "internal_id INTEGER PRIMARY KEY, doc_id TEXT NOT NULL, metadata TEXT NOT NULL)"
+        )
+        db.execute("CREATE INDEX IF NOT EXISTS items_doc_id ON items(doc_id)")
+        db.execute("CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value TEXT)")
+        db.commit()
+        return db
+    
+    def _get_setting(self, key: str, cast=str):
+        row = self._db.execute("SELECT value FROM settings WHERE key = ?", (key,)).fetchone()
+        return cast(row[0]) if row else None
+    
+    def _set_setting(self, key: str, value) -> None:
+        self._db.execute("INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)", (key, str(value)))
+        self._db.commit()
+    
+    @contextmanager
+    def _write_lock(self):
+        """Serialise writers within this process and across processes."""
+        with self._lock:
+            # Re-entrant: compact() runs inside add_many()
+            if fcntl is None or self._write_depth:
+                self._write_depth += 1
+                try:
+                    yield
+                finally:
+                    self._write_depth -= 1
+                return
+            with open(self.lock_path, 'a') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                self._write_depth += 1
+                try:
+                    yield
+                finally:
+                    self._write_depth -= 1
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+    
+    def _stat(self, path: str):
+        try:
+            st = os.stat(path)
+            return (st.st_ino, st.st_mtime_ns, st.st_size)
+        except FileNotFoundError:
+            return None
+    
+    def _read_snapshot(self):
+        if not os.path.exists(self.index_path):
+            return None
+        if self.use_mmap:
+            try:
+                return faiss.read_index(self.index_path, faiss.IO_FLAG_MMAP)
+            except Exception as e:
+                logger.warning(f"Could not memory-map FAISS index {self.name}, loading into memory: {e}")
+        return faiss.read_index(self.index_path)
+    
+    def _load(self) -> None:
+        """(Re)load the snapshot and replay the write-ahead log."""
+        # Under the write lock no writer is mid-append, so a partial row at
+        # the end of the log is left by a crash and can be truncated
+        with self._write_lock():
+            self._attributes = {}
+            self._index_stat = self._stat(self.index_path)
+            self.base = self._read_snapshot()
+            if self.base is not None:
+                self.dimension = self.base.d
+            if self.dimension is None:
+                # Empty collection whose dimension is not known yet
+                self.delta = None
+                self._wal_size = 0
+                return
+            
+            self._set_setting("dimension", self.dimension)
+            self.delta = faiss.IndexFlatIP(self.dimension)
+            self._wal_size = 0
+            
+            vectors = self._read_wal()
+            
+            # Reconcile the log with committed metadata: drop vectors whose
+            # metadata never committed, and metadata whose vectors were lost
+            row = self._db.execute("SELECT MAX(internal_id) FROM items").fetchone()
+            committed = (row[0] + 1) if row and row[0] is not None else 0
+            expected = max(0, committed - self.base_count)
+            if len(vectors) > expected:
+                vectors = vectors[:expected]
+            if self.base_count + len(vectors) < committed:
+                self._db.execute("DELETE FROM items WHERE internal_id >= ?",
+                                 (self.base_count + len(vectors),))
+                self._db.commit()
+            
+            if len(vectors):
+                self.delta.add(vectors)
+            self._rewrite_wal_if_needed(vectors)
+    
+    def _read_wal(self, offset: int = 0) -> np.ndarray:
+        """
+        Read logged vectors that are not yet part of the snapshot.
+        
+        Args:
+            offset (int): Byte offset to start from (0 reads the whole log)
+            
+        Returns:
+            np.ndarray: (n, dimension) float32 array
+        """
+        empty = np.zeros((0, self.dimension), dtype=np.float32)
+        if not os.path.exists(self.wal_path):
+            return empty
+        
+        with open(self.wal_path, 'rb') as f:
+            header = f.read(self.WAL_HEADER.size)
+            if len(header) < self.WAL_HEADER.size:
+                return empty
+            first_id, dimension = self.WAL_HEADER.unpack(header)
+            if dimension != self.dimension:
+                logger.error(f"FAISS WAL for {self.name} has dimension {dimension}, expected {self.dimension}")
+                return empty
+            
+            # Read whole rows only: the log can end in a partial row after a
+            # crash mid-append, or while another process is appending
+            start = max(offset, self.WAL_HEADER.size)
+            row_bytes = 4 * self.dimension
+            rows = max(0, os.fstat(f.fileno()).st_size - start) // row_bytes
+            f.seek(start)
+            data = np.frombuffer(f.read(rows * row_bytes), dtype=np.float32)
+        
+        rows = len(data) // self.dimension
+        vectors = data[:rows * self.dimension].reshape(rows, self.dimension)
+        self._wal_size = start + rows * 4 * self.dimension
+        
+        if offset == 0:
+            # Skip vectors already folded into the snapshot by a compaction
+            skip = self.base_count - first_id
+            if skip < 0:
+                logger.error(f"FAISS WAL for {self.name} starts after the snapshot end; ignoring it")
+                return empty
+            vectors = vectors[skip:]
+        
+        return np.ascontiguousarray(vectors)
+    
+    def _rewrite_wal_if_needed(self, vectors: np.ndarray) -> None:
+        expected_size = self.WAL_HEADER.size + vectors.nbytes
+        header = None
+        if os.path.exists(self.wal_path):
+            with open(self.wal_path, 'rb') as f:
+                header = f.read(self.WAL_HEADER.size)
+        if (header == self.WAL_HEADER.pack(self.base_count, self.dimension)
+                and os.path.getsize(self.wal_path) == expected_size):
+            self._wal_size = expected_size
+            return
+        self._write_wal(vectors)
+    
+    def _write_wal(self, vectors: np.ndarray) -> None:
+        tmp_path = f"{self.wal_path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(self.WAL_HEADER.pack(self.base_count, self.dimension))
+            f.write(np.ascontiguousarray(vectors, dtype=np.float32).tobytes())
+        os.replace(tmp_path, self.wal_path)
+        self._wal_size = os.path.getsize(self.wal_path)
+    
+    def _import_legacy_json(self, db_path: str) -> None:
+        """One-off import of metadata saved by the old whole-file JSON format."""
+        metadata_path = os.path.join(db_path, f"{self.name}.meta.json")
+        id_map_path = os.path.join(db_path, f"{self.name}.ids.json")
+        if not (os.path.exists(metadata_path) and os.path.exists(id_map_path)):
+            return
+        if self._db.execute("SELECT 1 FROM items LIMIT 1").fetchone():
+            return
+        
+        with open(metadata_path, 'r') as f:
+            metadata = json.load(f)
+        with open(id_map_path, 'r') as f:
+            id_map = json.load(f)
+        
+        rows = [
+            (int(internal_id), doc_id, json.dumps(metadata.get(doc_id, {})))
+            for internal_id, doc_id in id_map.items()
+            if int(internal_id) < self.base_count
+        ]
+        self._db.executemany("INSERT OR REPLACE INTO items VALUES (?, ?, ?)", rows)
+        self._db.commit()
+        logger.info(f"Imported {len(rows)} legacy JSON metadata rows for FAISS collection {self.name}")
+    
+    def sync(self) -> None:
+        """Pick up vectors written by other processes since the last load."""
+        if self._stat(self.index_path) != self._index_stat:
+            # Another process compacted the collection
+            self._load()
+            return
+        
+        if self.dimension is None:
+            self.dimension = self._get_setting("dimension", int)
+            if self.dimension is not None:
+                self._load()
+            return
+        
+        wal_stat = self._stat(self.wal_path)
+        wal_size = wal_stat[2] if wal_stat else 0
+        if wal_size < self._wal_size:
+            self._load()
+        elif wal_size > self._wal_size:
+            with self._lock:
+                vectors = self._read_wal(self._wal_size)
+                if len(vectors):
+                    self.delta.add(vectors)
+    
+    def add_many(self, document_ids: List[str], data_objects: List[Dict[str, Any]],
+                 vectors) -> List[str]:
+        """
+        Append vectors and metadata in one write.
+        
+        Args:
+            document_ids: External ids, aligned with vectors
+            data_objects: Metadata dicts, aligned with vectors
+            vectors: (n, dimension) array-like of embeddings
+            
+        Returns:
+            List[str]: The document ids written
+        """
+        vectors_np = np.array(vectors, dtype=np.float32)
+        if vectors_np.ndim != 2 or not len(vectors_np):
+            return []
+        
+        with self._write_lock():
+            if self.dimension is None:
+                self.dimension = vectors_np.shape[1]
+                self._load()
+            self.sync()
+            
+            if vectors_np.shape[1] != self.dimension:
+                raise ValueError(
+                    f"Vector dimension {vectors_np.shape[1]} does not match "
+                    f"collection {self.name} dimension {self.dimension}"
+                )
+            
+            # Normalize vectors for cosine similarity
+            faiss.normalize_L2(vectors_np)
+            
+            start_id = self.ntotal
+            with open(self.wal_path, 'ab') as f:
+                if f.tell() == 0:
+                    f.write(self.WAL_HEADER.pack(self.base_count, self.dimension))
+                f.write(vectors_np.tobytes())
+            
+            self._db.executemany(
+                "INSERT OR REPLACE INTO items VALUES (?, ?, ?)",
+                [
+                    (start_id + offset, doc_id, json.dumps(data_object))
+                    for offset, (doc_id, data_object) in enumerate(zip(document_ids, data_objects))
+                ]
+            )
+            self._db.commit()
+            
+            self.delta.add(vectors_np)
+            self._wal_size = os.path.getsize(self.wal_path)
+            
+            if self.delta.ntotal >= self.compact_threshold:
+                self.compact()
+        
+        return list(document_ids)
+    
+    def compact(self) -> None:
+        """Merge the write-ahead log into a new snapshot."""
+        with self._write_lock():
+            if self.delta is None or self.delta.ntotal == 0:
+                return
+            
+            merged = faiss.IndexFlatIP(self.dimension)
+            if self.base_count:
+                merged.add(self.base.reconstruct_n(0, self.base_count))
+            merged.add(self.delta.reconstruct_n(0, self.delta.ntotal))
+            
+            tmp_path = f"{self.index_path}.tmp"
+            faiss.write_index(merged, tmp_path)
+            os.replace(tmp_path, self.index_path)
+            del merged
+            
+            # The WAL header records where the log starts, so a crash between
+            # these two steps is detected and repaired on the next load
+            self._index_stat = self._stat(self.index_path)
+            self.base = self._read_snapshot()
+            self.delta = faiss.IndexFlatIP(self.dimension)
+            self._write_wal(np.zeros((0, self.dimension), dtype=np.float32))
+            
+            logger.info(f"Compacted FAISS collection {self.name} ({self.base_count} vectors)")
+    
+    def _attribute_column(self, key: str) -> Dict[str, Any]:
+        """
+        Dictionary-encoded column of one metadata attribute over internal ids.
+        
+        `codes[i]` is the value code of internal id i (-1 when missing or not
+        indexable); equality bitmaps are derived from it with one vectorised
+        comparison. The column is built lazily and extended with rows added
+        since the last use, including rows written by other processes.
+        
+        `size` only advances past rows whose metadata has committed. Vectors
+        from another process's log can be synced before their metadata, and
+        those rows are read again on the next use.
+        """
+        column = self._attributes.get(key)
+        if column is None:
+            column = {"codes": np.empty(0, dtype=np.int32), "size": 0, "values": {}}
+            self._attributes[key] = column
+        
+        total = self.ntotal
+        if len(column["codes"]) > total:
+            # Rows were dropped on reload; rebuild from scratch
+            column.update(codes=np.empty(0, dtype=np.int32), size=0, values={})
+        if column["size"] == total:
+            return column
+        
+        start = column["size"]
+        codes = np.full(total - start, -1, dtype=np.int32)
+        rows = self._db.execute(
+            "SELECT internal_id, json_extract(metadata, ?) FROM items "
+            "WHERE internal_id >= ? AND internal_id < ?",
+            (f'$."{key}"', start, total)
+        )
+        values = column["values"]
+        committed = start
+        for internal_id, value in rows:
+            # Metadata commits in one transaction per write, so committed ids are contiguous
+            committed = max(committed, internal_id + 1)
+            if value is None:
+                continue
+            code = values.setdefault(value, len(values))
+            codes[internal_id - start] = code
+        
+        column["codes"] = np.concatenate([column["codes"][:start], codes])
+        column["size"] = committed
+        return column
+    
+    def filter_mask(self, filters: Dict[str, Any]) -> np.ndarray:
+        """
+        Boolean mask over internal ids of the items matching equality filters.
+        
+        Args:
+            filters (dict): Attribute -> required value
+            
+        Returns:
+            np.ndarray: Mask of length ntotal
+        """
+        mask = np.ones(self.ntotal, dtype=bool)
+        with self._lock:
+            for key, value in filters.items():
+                column = self._attribute_column(key)
+                if isinstance(value, (dict, list)):
+                    # json_extract returns objects and arrays as JSON text
+                    codes = [
+                        code for stored, code in column["values"].items()
+                        if isinstance(stored, str) and stored[:1] in "[{" and _json_equals(stored, value)
+                    ]
+                    mask &= np.isin(column["codes"], codes)
+                    continue
+                if isinstance(value, bool):
+                    # json_extract returns JSON booleans as 0/1
+                    value = int(value)
+                code = column["values"].get(value)
+                if code is None:
+                    return np.zeros(self.ntotal, dtype=bool)
+                mask &= column["codes"] == code
+        return mask
+    
+    def search(self, query_vector: List[float], limit: int,
+               filters: Dict[str, Any] = None) -> List[Tuple[int, float]]:
+        """
+        Nearest-neighbour search across the snapshot and the delta.
+        
+        With filters, candidates are restricted to matching ids inside FAISS
+        via an IDSelector, so `limit` results are returned whenever that many
+        items match. FAISS builds without search parameters fall back to
+        adaptive over-fetching.
+        
+        Args:
+            query_vector: Query embedding
+            limit (int): Number of neighbours to return
+            filters (dict, optional): Attribute -> required value
+            
+        Returns:
+            List of (internal_id, score) tuples, best first
+        """
+        self.sync()
+        if self.dimension is None or limit <= 0:
+            return []
+        
+        query_np = np.array([query_vector], dtype=np.float32)
+        faiss.normalize_L2(query_np)
+        
+        with self._lock:
+            if not filters:
+                return self._search_all(query_np, limit)
+            
+            mask = self.filter_mask(filters)
+            matches = int(mask.sum())
+            if matches == 0:
+                return []
+            if matches == len(mask):
+                return self._search_all(query_np, limit)
+            
+            try:
+                return self._search_selected(query_np, limit, mask)
+            except (AttributeError, TypeError, RuntimeError) as e:
+                # Older FAISS builds without IDSelector search parameters
+                logger.warning(f"FAISS IDSelector search unavailable, over-fetching instead: {e}")
+                return self._search_overfetch(query_np, limit, mask)
+    
+    def _search_all(self, query_np: np.ndarray, limit: int, params_for=None) -> List[Tuple[int, float]]:
+        hits = []
+        offset = self.base_count
+        for index, start in ((self.base, 0), (self.delta, offset)):
+            if index is None or not index.ntotal:
+                continue
+            k = min(limit, index.ntotal)
+            params = params_for(start, index.ntotal) if params_for else None
+            if params is False:
+                continue
+            if params is not None:
+                distances, internal_ids = index.search(query_np, k, params=params)
+            else:
+                distances, internal_ids = index.search(query_np, k)
+            hits.extend(
+                (internal_id + start, distance)
+                for internal_id, distance in zip(internal_ids[0].tolist(), distances[0].tolist())
+                if internal_id != -1  # FAISS returns -1 for empty slots
+            )
+        
+        hits.sort(key=lambda hit: hit[1], reverse=True)
+        return hits[:limit]
+    
+    def _search_selected(self, query_np: np.ndarray, limit: int, mask: np.ndarray) -> List[Tuple[int, float]]:
+        # Keep packed bitmaps referenced until the searches have finished
+        bitmaps = []
+        
+        def params_for(start, count):
+            part = mask[start:start + count]
+            if not part.any():
+                return False
+            bits = np.packbits(part, bitorder='little')
+            bitmaps.append(bits)
+            selector = faiss.IDSelectorBitmap(count, faiss.swig_ptr(bits))
+            bitmaps.append(selector)
+            return faiss.SearchParameters(sel=selector)
+        
+        return self._search_all(query_np, limit, params_for)
+    
+    def _search_overfetch(self, query_np: np.ndarray, limit: int, mask: np.ndarray) -> List[Tuple[int, float]]:
+        total = self.ntotal
+        # Start from the over-fetch the filter's selectivity implies, then double
+        fetch = limit * max(2, int(np.ceil(total / max(1, int(mask.sum())))))
+        
+        while True:
+            fetch = min(fetch, total)
+            hits = [hit for hit in self._search_all(query_np, fetch) if mask[hit[0]]]
+            if len(hits) >= limit or fetch >= total:
+                return hits[:limit]
+            fetch *= 2
+    
+    def fetch(self, internal_ids: List[int]) -> Dict[int, Tuple[str, Dict[str, Any]]]:
+        """
+        Load document ids and metadata for internal ids.
+        
+        Returns:
+            dict: internal_id -> (doc_id, metadata)
+        """
+        if not internal_ids:
+            return {}
+        placeholders = ",".join("?" * len(internal_ids))
+        rows = self._db.execute(
+            f"SELECT internal_id, doc_id, metadata FROM items WHERE internal_id IN ({placeholders})",
+            list(internal_ids)
+        ).fetchall()
+        return {internal_id: (doc_id, json.loads(metadata)) for internal_id, doc_id, metadata in rows}
+
+
 class FAISSWrapper:
     """Custom wrapper for FAISS since it doesn't have a client like Qdrant or ChromaDB"""
     
-    def __init__(self, db_path: str):
+    def __init__(self, db_path: str, compact_threshold: int = 50000, use_mmap: bool = True):
         """Initialize FAISS wrapper"""
         self.db_path = db_path
-        self.indexes = {}  # FAISS indexes
-        self.metadata = {}  # Metadata store
-        self.id_maps = {}  # Maps internal FAISS ids to external ids
+        self.compact_threshold = compact_threshold
+        self.use_mmap = use_mmap
+        self.collections: Dict[str, FAISSCollection] = {}
         
         # Load existing collections
         self._load_collections()
         
     def _load_collections(self):
         """Load existing FAISS collections from disk"""
+        names = set()
         for filename in os.listdir(self.db_path):
             if filename.endswith('.index'):
-                collection_name = filename[:-6]  # Remove .index suffix
-                try:
-                    # Load FAISS index
-                    index_path = os.path.join(self.db_path, filename)
-                    self.indexes[collection_name] = faiss.read_index(index_path)
-                    
-                    # Load metadata
-                    metadata_path = os.path.join(self.db_path, f"{collection_name}.meta.json")
-                    id_map_path = os.path.join(self.db_path, f"{collection_name}.ids.json")
-                    
-                    if os.path.exists(metadata_path) and os.path.exists(id_map_path):
-                        with open(metadata_path, 'r') as f:
-                            self.metadata[collection_name] = json.load(f)
-                        with open(id_map_path, 'r') as f:
-                            self.id_maps[collection_name] = json.load(f)
-                            
-                        logger.info(f"Loaded FAISS collection {collection_name}")
-                except Exception as e:
-                    logger.error(f"Failed to load FAISS collection {collection_name}: {e}")
+                names.add(filename[:-6])  # Remove .index suffix
+            elif filename.endswith('.sqlite'):
+                names.add(filename[:-7])  # Remove .sqlite suffix
+        
+        for collection_name in names:
+            try:
+                self.collections[collection_name] = self._open_collection(collection_name)
+                logger.info(f"Loaded FAISS collection {collection_name}")
+            except Exception as e:
+                logger.error(f"Failed to load FAISS collection {collection_name}: {e}")
+    
+    def _open_collection(self, collection_name: str, vector_size: int = None) -> FAISSCollection:
+        return FAISSCollection(
+            self.db_path, collection_name, vector_size,
+            compact_threshold=self.compact_threshold, use_mmap=self.use_mmap
+        )
     
     def ensure_collection(self, collection_name: str, vector_size: int):
         """Ensure FAISS collection exists"""
-        if collection_name in self.indexes:
+        if collection_name in self.collections:
             return
-            
-        # Create new FAISS index
-        index = faiss.IndexFlatIP(vector_size)  # Inner product (can be converted to cosine)
-        self.indexes[collection_name] = index
-        self.metadata[collection_name] = {}
-        self.id_maps[collection_name] = {}
         
+        self.collections[collection_name] = self._open_collection(collection_name, vector_size)
         logger.info(f"Created FAISS collection {collection_name}")
-        
-        # Save to disk
-        self._save_collection(collection_name)
-        
-    def _save_collection(self, collection_name: str):
-        """Save FAISS collection to disk"""
-        if collection_name not in self.indexes:
-            return
-            
-        try:
-            # Save FAISS index
-            index_path = os.path.join(self.db_path, f"{collection_name}.index")
-            faiss.write_index(self.indexes[collection_name], index_path)
-            
-            # Save metadata
-            metadata_path = os.path.join(self.db_path, f"{collection_name}.meta.json")
-            id_map_path = os.path.join(self.db_path, f"{collection_name}.ids.json")
-            
-            with open(metadata_path, 'w') as f:
-                json.dump(self.metadata[collection_name], f)
-            with open(id_map_path, 'w') as f:
-                json.dump(self.id_maps[collection_name], f)
-                
-            logger.info(f"Saved FAISS collection {collection_name}")
-        except Exception as e:
-            logger.error(f"Failed to save FAISS collection {collection_name}: {e}")
     
     def add(self, collection_name: str, data_object: Dict[str, Any], 
            vector: List[float], document_id: str) -> str:
         """Add item to FAISS"""
-        if collection_name not in self.indexes:
+        document_ids = self.add_many(collection_name, [data_object], [vector], [document_id])
+        return document_ids[0] if document_ids else None
+    
+    def add_many(self, collection_name: str, data_objects: List[Dict[str, Any]],
+                 vectors: List[List[float]], document_ids: List[str]) -> List[str]:
+        """Add a batch of items with one log append and one metadata commit"""
+        if collection_name not in self.collections:
             logger.error(f"Collection {collection_name} not initialized")
-            return None
-            
-        # Convert vector to numpy array
-        vector_np = np.array([vector], dtype=np.float32)
-        
-        # Normalize vector for cosine similarity
-        faiss.normalize_L2(vector_np)
-        
-        # Add to FAISS index
-        index = self.indexes[collection_name]
-        internal_id = index.ntotal  # Get the next available ID
-        index.add(vector_np)
-        
-        # Store metadata and ID mapping
-        self.metadata[collection_name][document_id] = data_object
-        self.id_maps[collection_name][str(internal_id)] = document_id
-        
-        # Save updated collection
-        self._save_collection(collection_name)
+            return []
         
-        return document_id
+        return self.collections[collection_name].add_many(document_ids, data_objects, vectors)
+    
+    def compact(self, collection_name: str = None):
+        """Fold the write-ahead log into the snapshot for one or all collections"""
+        names = [collection_name] if collection_name else list(self.collections)
+        for name in names:
+            if name in self.collections:
+                self.collections[name].compact()
     
     def search(self, collection_name: str, query_vector: List[float], 
               limit: int, filters: Dict[str, Any]) -> List[Dict[str, Any]]:
         """Search FAISS"""
-        if collection_name not in self.indexes:
+        if collection_name not in self.collections:
             logger.error(f"Collection {collection_name} not initialized")
             return []
-            
-        # Convert vector to numpy array
-        query_vector_np = np.array([query_vector], dtype=np.float32)
         
-        # Normalize vector for cosine similarity
-        faiss.normalize_L2(query_vector_np)
-        
-        # Search FAISS index
-        index = self.indexes[collection_name]
-        distances, internal_ids = index.search(query_vector_np, limit)
+        collection = self.collections[collection_name]
+        hits = collection.search(query_vector, limit, filters)
+        records = collection.fetch([internal_id for internal_id, _ in hits])
         
         # Format results
         results = []
-        for i, (distance, internal_id) in enumerate(zip(distances[0], internal_ids[0])):
-            if internal_id == -1:  # FAISS returns -1 for empty slots
-                continue
-                
-            doc_id = self.id_maps[collection_name].get(str(internal_id))
-            if not doc_id:
+        for internal_id, distance in hits:
+            if internal_id not in records:
                 continue
-                
-            metadata = self.metadata[collection_name].get(doc_id, {})
+            doc_id, metadata = records[internal_id]
             
-            # Apply filters if provided
+            # Guard against values that compare equal only after JSON decoding
             if filters and not self._matches_filters(metadata, filters):
                 continue
                 
@@ -481,6 +1023,8 @@ class FAISSWrapper:
             item['_id'] = doc_id
             item['_score'] = float(distance)  # Convert to float for JSON serialization
             results.append(item)
+            if len(results) >= limit:
+                break
             
         return results
     
@@ -0,0 +1,178 @@
+"""
+KV-state cache for shared prompt prefixes in offline generation.
+
+Every offline answer starts with the same system prompt and answer
+preamble, and llama.cpp would evaluate those tokens again for each request.
+The cache keeps llama.cpp state snapshots (`Llama.save_state()`) taken
+right after a shared prefix was evaluated, keyed by a hash of the prefix
+tokens. Restoring a snapshot leaves only the per-query suffix (sources and
+question) to evaluate.
+
+Snapshots are evicted least-recently-used once their total size exceeds
+the memory cap. A prefix is only snapshotted the second time it is seen,
+so one-off prompts do not churn the cache.
+"""
+
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Sequence
+
+logger = logging.getLogger(__name__)
+
+# Outcomes of PromptStateCache.prepare
+PREFIX_RESIDENT = 'resident'  # Prefix already in the model's context
+PREFIX_RESTORED = 'restored'  # Prefix state loaded from the cache
+PREFIX_STORED = 'stored'  # Prefix evaluated and snapshotted
+PREFIX_MISS = 'miss'  # Prefix evaluated as part of the prompt
+
+
+def prefix_key(tokens: Sequence[int]) -> str:
+    """Stable hash of a token sequence."""
+    digest = hashlib.sha1()
+    for token in tokens:
+        digest.update(int(token).to_bytes(4, 'little', signed=True))
+    return digest.hexdigest()
+
+
+def _state_size(state: Any) -> int:
+    size = getattr(state, 'llama_state_size', None)
+    if size is None:
+        size = len(getattr(state, 'llama_state', b'') or b'')
+    return int(size)
+
+
+class PromptStateCache:
+    """
+    LRU cache of llama.cpp states for shared prompt prefixes, capped in bytes.
+    """
+
+    def __init__(self, max_bytes: int, min_prefix_tokens: int = 16, admit_after: int = 2):
+        """
+        Initialize the cache.
+
+        Args:
+            max_bytes (int): Total snapshot size before the least recently used are evicted
+            min_prefix_tokens (int): Shorter prefixes are not worth a snapshot
+            admit_after (int): Sightings of a prefix before it is snapshotted
+        """
+        self.max_bytes = max_bytes
+        self.min_prefix_tokens = min_prefix_tokens
+        self.admit_after = admit_after
+        self._states: "OrderedDict[str, Any]" = OrderedDict()
+        self._sizes: Dict[str, int] = {}
+        self._sightings: "OrderedDict[str, int]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.total_bytes = 0
+
+        self.hits = 0
+        self.resident = 0
+        self.misses = 0
+        self.stored = 0
+        self.evictions = 0
+        self.tokens_reused = 0
+
+    def __len__(self):
+        return len(self._states)
+
+    def get(self, key: str) -> Any:
+        with self._lock:
+            state = self._states.get(key)
+            if state is not None:
+                self._states.move_to_end(key)
+            return state
+
+    def put(self, key: str, state: Any) -> bool:
+        """
+        Store a state snapshot, evicting older ones to stay under the cap.
+
+        Returns:
+            bool: Whether the snapshot was stored
+        """
+        size = _state_size(state)
+        if size > self.max_bytes:
+            return False
+
+        with self._lock:
+            if key in self._states:
+                self.total_bytes -= self._sizes.pop(key)
+                del self._states[key]
+            while self._states and self.total_bytes + size > self.max_bytes:
+                evicted, _ = self._states.popitem(last=False)
+                self.total_bytes -= self._sizes.pop(evicted)
+                self.evictions += 1
+            self._states[key] = state
+            self._sizes[key] = size
+            self.total_bytes += size
+            self.stored += 1
+        return True
+
+    def _seen(self, key: str) -> int:
+        with self._lock:
+            count = self._sightings.pop(key, 0) + 1
+            self._sightings[key] = count
+            while len(self._sightings) > 1024:
+                self._sightings.popitem(last=False)
+            return count
+
+    def prepare(self, model, prefix_tokens: List[int]) -> str:
+        """
+        Put the model's context at the end of a shared prefix, so the next
+        call with `prefix_tokens + suffix` only evaluates the suffix.
+        The caller must hold the model's generation lock.
+
+        Args:
+            model: llama_cpp.Llama instance
+            prefix_tokens: Tokens of the shared prompt prefix
+
+        Returns:
+            str: PREFIX_RESIDENT, PREFIX_RESTORED, PREFIX_STORED or PREFIX_MISS
+        """
+        n_prefix = len(prefix_tokens)
+        if n_prefix < self.min_prefix_tokens or self.max_bytes <= 0:
+            return PREFIX_MISS
+
+        # llama.cpp itself reuses the longest common prefix of its context
+        if model.n_tokens >= n_prefix and list(model.input_ids[:n_prefix]) == list(prefix_tokens):
+            self.resident += 1
+            self.tokens_reused += n_prefix
+            return PREFIX_RESIDENT
+
+        key = prefix_key(prefix_tokens)
+        state = self.get(key)
+        if state is not None:
+            model.load_state(state)
+            self.hits += 1
+            self.tokens_reused += n_prefix
+            return PREFIX_RESTORED
+
+        self.misses += 1
+        if self._seen(key) < self.admit_after:
+            return PREFIX_MISS
+
+        model.reset()
+        model.eval(prefix_tokens)
+        if self.put(key, model.save_state()):
+            logger.info(f"Cached prompt prefix state ({n_prefix} tokens, {len(self)} cached)")
+        return PREFIX_STORED
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Get cache counters.
+
+        Returns:
+            dict: Entries, bytes and hit/miss/store/eviction counts
+        """
+        with self._lock:
+            return {
+                'entries': len(self._states),
+                'bytes': self.total_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'resident': self.resident,
+                'misses': self.misses,
+                'stored': self.stored,
+                'evictions': self.evictions,
+                'tokens_reused': self.tokens_reused,
+            }
@@ -0,0 +1,416 @@
+"""
+Two-tier answer cache for the RAG query endpoint.
+
+Tier 1 is an in-process LRU keyed on the normalised query text, in front of
+the exact-match QueryCache table. Tier 2 is a nearest-neighbour lookup over
+the embeddings of cached queries, so paraphrased questions reuse an existing
+answer without retrieval or LLM calls. Hit counts and last-access times are
+accumulated in memory and written back in batches by a background thread.
+"""
+
+import re
+import time
+import atexit
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+
+from ..analytics.buffer import BackgroundFlusher
+from ..models import QueryCache
+from ..search.suggestion_index import pack_embedding, unpack_embedding
+
+logger = logging.getLogger(__name__)
+
+# Confidence threshold below which cached answers are flagged (golden rule #3)
+LOW_CONFIDENCE_THRESHOLD = 0.45
+
+
+def query_cache_hash(query: str, doc_type: str = "") -> str:
+    """
+    Hash used as the exact-match QueryCache key.
+
+    Args:
+        query (str): The user's query
+        doc_type (str): Document type filter
+
+    Returns:
+        str: SHA-256 hex digest
+    """
+    query_key = f"{query.lower().strip()}_{doc_type}"
+    return hashlib.sha256(query_key.encode()).hexdigest()
+
+
+def normalize_query(query: str) -> str:
+    """Lowercase, collapse whitespace and drop trailing punctuation."""
+    query = re.sub(r"\s+", " ", query.lower()).strip()
+    return query.rstrip("?!. ")
+
+
+class LRUCache:
+    """
+    Thread-safe LRU cache with a per-entry time-to-live.
+    """
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value) -> None:
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class _CachedQueryIndex:
+    """
+    Normalised float32 matrices of cached query embeddings, one per doc_type.
+    Entries are immutable, so new rows are picked up incrementally by
+    `created_at`; a row-count mismatch (evictions, manual clears) rebuilds.
+    """
+
+    def __init__(self, refresh_interval: float):
+        self.refresh_interval = refresh_interval
+        self._lock = threading.Lock()
+        self._matrices: Dict[str, np.ndarray] = {}
+        self._ids: Dict[str, List[int]] = {}
+        self._size = 0
+        self._last_sync = None
+        self._last_refresh_check = 0.0
+
+    def refresh(self, force: bool = False) -> None:
+        now = time.monotonic()
+        if not force and self._last_sync is not None and now - self._last_refresh_check < self.refresh_interval:
+            return
+        self._last_refresh_check = now
+
+        sync_time = timezone.now()
+        entries = QueryCache.objects.filter(query_embedding__isnull=False)
+        expected = entries.count()
+
+        if self._last_sync is None or expected < self._size:
+            self._load(entries.values_list('id', 'doc_type', 'query_embedding'), reset=True)
+        elif expected > self._size:
+            new_rows = entries.filter(created_at__gte=self._last_sync)
+            self._load(new_rows.values_list('id', 'doc_type', 'query_embedding'), reset=False)
+            if self._size != expected:
+                self._load(entries.values_list('id', 'doc_type', 'query_embedding'), reset=True)
+
+        self._last_sync = sync_time
+
+    def _load(self, rows, reset: bool) -> None:
+        grouped: Dict[str, Tuple[List[int], List[np.ndarray]]] = {}
+        for entry_id, doc_type, data in rows:
+            vector = unpack_embedding(data)
+            if vector is None:
+                continue
+            norm = np.linalg.norm(vector)
+            if norm == 0:
+                continue
+            ids, vectors = grouped.setdefault(doc_type or "", ([], []))
+            ids.append(entry_id)
+            vectors.append(vector / norm)
+
+        with self._lock:
+            if reset:
+                self._matrices = {}
+                self._ids = {}
+                self._size = 0
+
+            for doc_type, (ids, vectors) in grouped.items():
+                known = set(self._ids.get(doc_type, []))
+                fresh = [(i, v) for i, v in zip(ids, vectors) if i not in known]
+                if not fresh:
+                    continue
+
+                new_matrix = np.vstack([v for _, v in fresh]).astype(np.float32)
+                existing = self._matrices.get(doc_type)
+                if existing is not None:
+                    if existing.shape[1] != new_matrix.shape[1]:
+                        # Embedding model changed; only keep the newest vectors
+                        existing = None
+                        self._size -= len(self._ids[doc_type])
+                        self._ids[doc_type] = []
+                    else:
+                        new_matrix = np.vstack([existing, new_matrix])
+
+                self._matrices[doc_type] = np.ascontiguousarray(new_matrix)
+                self._ids[doc_type] = self._ids.get(doc_type, []) + [i for i, _ in fresh]
+                self._size += len(fresh)
+
+    def add(self, entry_id: int, doc_type: str, embedding) -> None:
+        self._load([(entry_id, doc_type, pack_embedding(embedding))], reset=False)
+
+    def nearest(self, embedding, doc_type: str) -> Tuple[Optional[int], float]:
+        """
+        Find the most similar cached query with the same doc_type.
+
+        Returns:
+            Tuple of (QueryCache id or None, cosine similarity)
+        """
+        query = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm == 0:
+            return None, 0.0
+        query = query / norm
+
+        with self._lock:
+            matrix = self._matrices.get(doc_type or "")
+            ids = self._ids.get(doc_type or "")
+            if matrix is None or not ids or matrix.shape[1] != query.shape[0]:
+                return None, 0.0
+
+            scores = matrix @ query
+            best = int(np.argmax(scores))
+            return ids[best], float(scores[best])
+
+    def clear(self) -> None:
+        with self._lock:
+            self._matrices = {}
+            self._ids = {}
+            self._size = 0
+            self._last_sync = None
+
+
+class AnswerCache:
+    """
+    Answer cache combining an in-process LRU, the exact QueryCache table and
+    a semantic nearest-neighbour tier over cached query embeddings.
+    """
+
+    def __init__(self):
+        self.similarity_threshold = getattr(settings, 'SEMANTIC_CACHE_SIMILARITY_THRESHOLD', 0.93)
+        self.semantic_enabled = getattr(settings, 'SEMANTIC_CACHE_ENABLED', True)
+        self.flush_interval = getattr(settings, 'QUERY_CACHE_HIT_FLUSH_SECONDS', 5)
+
+        self.memory = LRUCache(
+            max_size=getattr(settings, 'QUERY_CACHE_LRU_SIZE', 1024),
+            ttl=getattr(settings, 'QUERY_CACHE_LRU_TTL', 300)
+        )
+        self.index = _CachedQueryIndex(
+            refresh_interval=getattr(settings, 'SEMANTIC_CACHE_REFRESH_SECONDS', 30)
+        )
+
+        self._pending_hits: Dict[int, Tuple[int, object]] = {}
+        self._pending_lock = threading.Lock()
+        self._flusher = BackgroundFlusher(self.flush_hits, self.flush_interval, "query-cache-hit-flusher")
+
+    def lookup(self, query: str, doc_type: str = "") -> Tuple[Optional[Dict], Optional[List[float]]]:
+        """
+        Look up a cached answer for a query.
+
+        Args:
+            query (str): The user's query
+            doc_type (str): Document type filter
+
+        Returns:
+            Tuple of (cached response or None, query embedding if one was computed).
+            The embedding can be passed to `store` to avoid embedding twice.
+        """
+        memory_key = (normalize_query(query), doc_type or "")
+
+        # Tier 1a: in-process LRU
+        cached = self.memory.get(memory_key)
+        if cached is not None:
+            self.record_hit(cached["entry_id"])
+            return self._response(cached, tier="memory"), None
+
+        # Tier 1b: exact match in the database
+        entry = (
+            QueryCache.objects.filter(query_hash=query_cache_hash(query, doc_type))
+            .values('id', 'answer', 'sources', 'confidence_score')
+            .first()
+        )
+        if entry is not None:
+            cached = self._remember(memory_key, entry)
+            self.record_hit(entry["id"])
+            return self._response(cached, tier="exact"), None
+
+        if not self.semantic_enabled:
+            return None, None
+
+        # Tier 2: nearest cached query by embedding
+        from ..ingestion.embeddings_utils import get_embedding_with_cache
+        try:
+            embedding = get_embedding_with_cache(query)
+        except Exception as e:
+            logger.warning(f"Could not embed query for semantic cache lookup: {e}")
+            return None, None
+        if not embedding:
+            return None, None
+
+        self.index.refresh()
+        entry_id, similarity = self.index.nearest(embedding, doc_type)
+        if entry_id is None or similarity < self.similarity_threshold:
+            return None, embedding
+
+        entry = (
+            QueryCache.objects.filter(id=entry_id)
+            .values('id', 'answer', 'sources', 'confidence_score')
+            .first()
+        )
+        if entry is None:
+            # Evicted since the index was loaded
+            self.index.refresh(force=True)
+            return None, embedding
+
+        cached = self._remember(memory_key, entry)
+        self.record_hit(entry["id"])
+        response = self._response(cached, tier="semantic")
+        response["similarity"] = similarity
+        return response, embedding
+
+    def store(self, query: str, doc_type: str, answer: str, sources: list,
+              confidence_score: float, embedding: Optional[List[float]] = None) -> bool:
+        """
+        Save an answer to every cache tier.
+
+        Args:
+            query (str): The user's query
+            doc_type (str): Document type filter
+            answer (str): Generated answer
+            sources (list): Source information
+            confidence_score (float): Confidence score
+            embedding (list, optional): Query embedding from `lookup`
+
+        Returns:
+            bool: True if successfully cached, False otherwise
+        """
+        if embedding is None and self.semantic_enabled:
+            from ..ingestion.embeddings_utils import get_embedding_with_cache
+            try:
+                embedding = get_embedding_with_cache(query)
+            except Exception as e:
+                logger.warning(f"Could not embed query for semantic cache: {e}")
+
+        try:
+            entry = QueryCache.objects.create(
+                query_hash=query_cache_hash(query, doc_type),
+                query_text=query,
+                doc_type=doc_type,
+                answer=answer,
+                sources=sources,
+                confidence_score=confidence_score,
+                query_embedding=pack_embedding(embedding)
+            )
+        except Exception as e:
+            logger.error(f"Error saving to query cache: {e}")
+            return False
+
+        self._remember((normalize_query(query), doc_type or ""), {
+            "id": entry.id,
+            "answer": answer,
+            "sources": sources,
+            "confidence_score": confidence_score,
+        })
+        if embedding:
+            self.index.add(entry.id, doc_type, embedding)
+        return True
+
+    def clear(self) -> None:
+        """Drop this process's in-memory tiers (the database is untouched)."""
+        self.memory.clear()
+        self.index.clear()
+
+    def record_hit(self, entry_id: int) -> None:
+        """
+        Queue a hit-count / last-access update for asynchronous write-back.
+        """
+        now = timezone.now()
+        with self._pending_lock:
+            count, _ = self._pending_hits.get(entry_id, (0, None))
+            self._pending_hits[entry_id] = (count + 1, now)
+        self._flusher.ensure_running()
+
+    def flush_hits(self) -> int:
+        """
+        Write queued hit counts to the database.
+
+        Returns:
+            int: Number of cache entries updated
+        """
+        with self._pending_lock:
+            pending, self._pending_hits = self._pending_hits, {}
+
+        for entry_id, (count, last_accessed) in pending.items():
+            try:
+                QueryCache.objects.filter(id=entry_id).update(
+                    hit_count=F('hit_count') + count,
+                    last_accessed=last_accessed
+                )
+            except Exception as e:
+                logger.error(f"Error flushing query cache hits: {e}")
+
+        return len(pending)
+
+    def _remember(self, memory_key, entry: Dict) -> Dict:
+        cached = {
+            "entry_id": entry["id"],
+            "answer": entry["answer"],
+            "sources": entry["sources"],
+            "confidence_score": entry["confidence_score"],
+        }
+        self.memory.set(memory_key, cached)
+        return cached
+
+    @staticmethod
+    def _response(cached: Dict, tier: str) -> Dict:
+        return {
+            "answer": cached["answer"],
+            "sources": cached["sources"],
+            "confidence_score": cached["confidence_score"],
+            "status": "success" if cached["confidence_score"] >= LOW_CONFIDENCE_THRESHOLD else "low_confidence",
+            "cache_hit": True,
+            "cache_tier": tier,
+        }
+
+
+_answer_cache = None
+_answer_cache_lock = threading.Lock()
+
+
+def get_answer_cache() -> AnswerCache:
+    """
+    Get the process-wide answer cache.
+
+    Returns:
+        AnswerCache: Shared cache instance
+    """
+    global _answer_cache
+
+    if _answer_cache is None:
+        with _answer_cache_lock:
+            if _answer_cache is None:
+                _answer_cache = AnswerCache()
+                atexit.register(_answer_cache.flush_hits)
+
+    return _answer_cache
@@ -11,7 +11,8 @@ from ..search.reranking import rerank_chunks_for_rag
 
 logger = logging.getLogger(__name__)
 
-def enhance_rag_context(query: str, chunks: List[Dict], max_context_chunks: int = 5) -> List[Dict]:
+def enhance_rag_context(query: str, chunks: List[Dict], max_context_chunks: int = 5,
+                        already_reranked: bool = False) -> List[Dict]:
     """
     Enhance the RAG context by applying cross-encoder reranking and other optimizations.
     
@@ -19,6 +20,8 @@ def enhance_rag_context(query: str, chunks: List[Dict], max_context_chunks: int
         query (str): The user query
         chunks (List[Dict]): The initial chunks retrieved from the vector search
         max_context_chunks (int): Maximum number of chunks to include in the context
+        already_reranked (bool): Chunks already carry a `rerank_score` for this
+            query, so they are ordered by it instead of being scored again
     
     Returns:
         List[Dict]: The optimized chunks for RAG
@@ -31,7 +34,8 @@ def enhance_rag_context(query: str, chunks: List[Dict], max_context_chunks: int
     reranked_chunks, reranking_time_ms = rerank_chunks_for_rag(
         query_text=query,
         chunks=chunks,
-        top_k=max_context_chunks
+        top_k=max_context_chunks,
+        use_existing_scores=already_reranked
     )
     
     logger.info(f"Reranked {len(chunks)} chunks to {len(reranked_chunks)} in {reranking_time_ms:.2f}ms")
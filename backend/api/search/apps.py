@@ -12,5 +12,5 @@ class SearchConfig(AppConfig):
     verbose_name = 'Enhanced Search'
     
     def ready(self):
-        # Import signal handlers if any
-        pass
\ No newline at end of file
+        # Import signal handlers
+        import api.search.signals
\ No newline at end of file
@@ -0,0 +1,510 @@
+"""
+In-memory autocomplete index over QueryCompletion.
+
+Completion rows are loaded into a character trie keyed by the row prefix.
+Every trie node keeps its best completions by frequency, both for rows whose
+prefix is exactly the node and for the whole subtree, so a lookup is a walk
+of the typed prefix plus reading a short list. Frequencies only grow between
+rebuilds, so the lists are kept exact by raising a completion's score along
+the path of every updated row.
+
+Recording a query updates the local index immediately and counts the n-gram
+increments in a write-behind counter. A background thread writes them with
+one INSERT ... ON CONFLICT DO UPDATE per batch; other processes pick the
+changes up through `updated_at` on their next refresh.
+"""
+
+import time
+import uuid
+import atexit
+import bisect
+import logging
+import threading
+from collections import Counter
+from typing import Dict, Iterable, List, Tuple
+
+from django.conf import settings
+from django.utils import timezone
+
+from ..analytics.buffer import BackgroundFlusher
+
+logger = logging.getLogger(__name__)
+
+
+def completion_prefixes(query_text: str) -> List[str]:
+    """
+    Word n-gram prefixes a query is completed from (1- to 3-grams of
+    multi-word queries, at least three characters long).
+
+    Args:
+        query_text (str): The query text
+
+    Returns:
+        list: Lowercase prefixes; a repeated n-gram is listed once per occurrence
+    """
+    words = query_text.lower().split()
+    prefixes = []
+    for n in range(1, min(4, len(words))):
+        for i in range(len(words) - n + 1):
+            prefix = " ".join(words[i:i + n])
+            if len(prefix) >= 3:
+                prefixes.append(prefix)
+    return prefixes
+
+
+def _offer(entries: List[Tuple[int, int]], completion_id: int, frequency: int, k: int) -> None:
+    """Raise a completion's frequency in a best-first top-k list."""
+    for i, (current, existing_id) in enumerate(entries):
+        if existing_id == completion_id:
+            if frequency <= current:
+                return
+            del entries[i]
+            break
+    else:
+        if len(entries) >= k and frequency <= entries[-1][0]:
+            return
+
+    position = len(entries)
+    while position > 0 and entries[position - 1][0] < frequency:
+        position -= 1
+    entries.insert(position, (frequency, completion_id))
+    del entries[k:]
+
+
+def _top_k(scores: Dict[int, int], k: int) -> List[Tuple[int, int]]:
+    return sorted(((frequency, cid) for cid, frequency in scores.items()), key=lambda e: -e[0])[:k]
+
+
+class _TrieNode:
+    __slots__ = ('children', 'exact', 'top')
+
+    def __init__(self):
+        self.children: Dict[str, '_TrieNode'] = {}
+        self.exact: List[Tuple[int, int]] = []  # Rows whose prefix is this node
+        self.top: List[Tuple[int, int]] = []  # Rows whose prefix starts with this node
+
+
+class CompletionIndex:
+    """
+    Frequency-weighted prefix trie of query completions.
+    """
+
+    def __init__(self, top_k: int = None, refresh_interval: float = None):
+        self.top_k = top_k or getattr(settings, 'AUTOCOMPLETE_TOP_K', 20)
+        self.refresh_interval = (
+            refresh_interval if refresh_interval is not None
+            else getattr(settings, 'AUTOCOMPLETE_INDEX_REFRESH_SECONDS', 30)
+        )
+        self._lock = threading.RLock()
+        self._reset()
+        self._loaded = False
+        self._last_sync = None
+        self._last_refresh_check = 0.0
+
+    def _reset(self) -> None:
+        self._root = _TrieNode()
+        self._rows: Dict[Tuple[str, int], int] = {}
+        self._completion_ids: Dict[str, int] = {}
+        self._completions: List[str] = []
+        self._weights: List[int] = []
+        # Lowercased completions by weight, joined for substring search
+        self._substring_blob = None
+        self._substring_starts: List[int] = []
+        self._substring_order: List[int] = []
+        self._substring_built_at = 0.0
+
+    def __len__(self):
+        return len(self._rows)
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._loaded
+
+    def _completion_id(self, completion: str) -> int:
+        completion_id = self._completion_ids.get(completion)
+        if completion_id is None:
+            completion_id = len(self._completions)
+            self._completion_ids[completion] = completion_id
+            self._completions.append(completion)
+            self._weights.append(0)
+            self._substring_blob = None
+        return completion_id
+
+    def rebuild(self) -> int:
+        """
+        Reload the whole index from the database.
+
+        Returns:
+            int: Number of indexed completion rows
+        """
+        from .models import QueryCompletion
+
+        sync_time = timezone.now()
+        rows = list(QueryCompletion.objects.values_list('prefix', 'completion', 'frequency'))
+
+        with self._lock:
+            self._reset()
+            exact_scores: Dict[str, Dict[int, int]] = {}
+            for prefix, completion, frequency in rows:
+                completion_id = self._completion_id(completion)
+                self._rows[(prefix, completion_id)] = frequency
+                self._weights[completion_id] = max(self._weights[completion_id], frequency)
+                scores = exact_scores.setdefault(prefix, {})
+                scores[completion_id] = max(scores.get(completion_id, 0), frequency)
+
+            for prefix, scores in pending_writes().items():
+                # Increments not yet written by this process
+                for completion, count in scores.items():
+                    completion_id = self._completion_id(completion)
+                    frequency = self._rows.get((prefix, completion_id), 0) + count
+                    self._rows[(prefix, completion_id)] = frequency
+                    self._weights[completion_id] = max(self._weights[completion_id], frequency)
+                    exact_scores.setdefault(prefix, {})[completion_id] = frequency
+
+            self._build_trie(exact_scores)
+            self._loaded = True
+            self._last_sync = sync_time
+            self._last_refresh_check = time.monotonic()
+
+        logger.info(f"Loaded {len(self._rows)} query completions into autocomplete index")
+        return len(self._rows)
+
+    def _build_trie(self, exact_scores: Dict[str, Dict[int, int]]) -> None:
+        exact_nodes = []
+        for prefix, scores in exact_scores.items():
+            node = self._root
+            for char in prefix:
+                child = node.children.get(char)
+                if child is None:
+                    child = node.children[char] = _TrieNode()
+                node = child
+            node.exact = _top_k(scores, self.top_k)
+            exact_nodes.append((node, scores))
+
+        # Subtree lists bottom-up: own rows merged with the children's lists
+        exact_by_node = {id(node): scores for node, scores in exact_nodes}
+        order = []
+        stack = [self._root]
+        while stack:
+            node = stack.pop()
+            order.append(node)
+            stack.extend(node.children.values())
+        for node in reversed(order):
+            scores = dict(exact_by_node.get(id(node), {}))
+            for child in node.children.values():
+                for frequency, completion_id in child.top:
+                    if frequency > scores.get(completion_id, 0):
+                        scores[completion_id] = frequency
+            node.top = _top_k(scores, self.top_k)
+
+    def refresh(self, force: bool = False) -> None:
+        """
+        Apply completion rows changed since the last sync.
+
+        Other processes' writes arrive through `updated_at`; a row-count
+        mismatch (e.g. deletions) triggers a full rebuild.
+
+        Args:
+            force (bool): Refresh even if the refresh interval has not elapsed
+        """
+        from .models import QueryCompletion
+
+        if not self._loaded:
+            self.rebuild()
+            return
+
+        now = time.monotonic()
+        if not force and now - self._last_refresh_check < self.refresh_interval:
+            return
+
+        with self._lock:
+            self._last_refresh_check = now
+            since = self._last_sync
+
+        sync_time = timezone.now()
+        changed = list(
+            QueryCompletion.objects.filter(updated_at__gte=since)
+            .values_list('prefix', 'completion', 'frequency')
+        )
+        pending = pending_writes()
+        with self._lock:
+            for prefix, completion, frequency in changed:
+                local = pending.get(prefix, {}).get(completion, 0)
+                self._apply(prefix, self._completion_id(completion), frequency + local)
+            self._last_sync = sync_time
+
+        if QueryCompletion.objects.count() < len(self._rows) - sum(len(p) for p in pending.values()):
+            self.rebuild()
+
+    def _apply(self, prefix: str, completion_id: int, frequency: int) -> None:
+        """Set a row's frequency; caller holds the lock. Frequencies only grow."""
+        key = (prefix, completion_id)
+        if frequency <= self._rows.get(key, 0):
+            return
+        self._rows[key] = frequency
+        if frequency > self._weights[completion_id]:
+            self._weights[completion_id] = frequency
+
+        node = self._root
+        for char in prefix:
+            child = node.children.get(char)
+            if child is None:
+                child = node.children[char] = _TrieNode()
+            node = child
+            _offer(node.top, completion_id, frequency, self.top_k)
+        _offer(node.exact, completion_id, frequency, self.top_k)
+
+    def record(self, query_text: str, prefixes: Iterable[str]) -> None:
+        """
+        Count one use of a query under each of its prefixes.
+
+        Args:
+            query_text (str): Completion text
+            prefixes: Prefixes the query is completed from
+        """
+        if not self._loaded:
+            return
+        with self._lock:
+            completion_id = self._completion_id(query_text)
+            for prefix in prefixes:
+                self._apply(prefix, completion_id, self._rows.get((prefix, completion_id), 0) + 1)
+
+    def suggest(self, prefix: str, limit: int = 5) -> List[str]:
+        """
+        Best completions for a lowercase prefix: rows with exactly this
+        prefix, else rows whose prefix starts with it, else completions
+        containing it anywhere.
+
+        Args:
+            prefix (str): Lowercase query prefix
+            limit (int): Number of completions (capped at the index's top_k)
+
+        Returns:
+            List of completion strings, most frequent first
+        """
+        self.refresh()
+        limit = min(limit, self.top_k)
+        if limit <= 0:
+            return []
+
+        with self._lock:
+            node = self._root
+            for char in prefix:
+                node = node.children.get(char)
+                if node is None:
+                    break
+            if node is not None:
+                entries = node.exact or node.top
+                if entries:
+                    return [self._completions[completion_id] for _, completion_id in entries[:limit]]
+
+        return self._substring_matches(prefix, limit)
+
+    def _substring_matches(self, needle: str, limit: int) -> List[str]:
+        if not needle or "\n" in needle:
+            return []
+        with self._lock:
+            now = time.monotonic()
+            if self._substring_blob is None or now - self._substring_built_at >= self.refresh_interval:
+                order = sorted(range(len(self._completions)), key=lambda cid: -self._weights[cid])
+                texts = [self._completions[cid].lower() for cid in order]
+                starts = []
+                position = 0
+                for text in texts:
+                    starts.append(position)
+                    position += len(text) + 1
+                self._substring_blob = "\n".join(texts)
+                self._substring_starts = starts
+                self._substring_order = order
+                self._substring_built_at = now
+            blob, starts, order = self._substring_blob, self._substring_starts, self._substring_order
+
+        # The blob is in weight order, so the first hits are the best ones
+        results = []
+        position = blob.find(needle)
+        while position != -1 and len(results) < limit:
+            index = bisect.bisect_right(starts, position) - 1
+            results.append(self._completions[order[index]])
+            next_start = starts[index + 1] if index + 1 < len(starts) else len(blob)
+            position = blob.find(needle, next_start)
+        return results
+
+
+class CompletionWriteBehind:
+    """
+    Counts completion increments in memory and writes them periodically
+    with a bulk upsert, instead of a get_or_create and save per n-gram.
+    """
+
+    def __init__(self, flush_interval: float = None, batch_size: int = 500):
+        self.flush_interval = (
+            flush_interval if flush_interval is not None
+            else getattr(settings, 'AUTOCOMPLETE_FLUSH_SECONDS', 5)
+        )
+        self.batch_size = batch_size
+        self._pending: Dict[str, Counter] = {}
+        self._doc_types: Dict[Tuple[str, str], str] = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._flusher = BackgroundFlusher(self.flush, self.flush_interval, "completion-write-behind")
+
+        self.written = 0
+        self.failed = 0
+
+    def add(self, query_text: str, prefixes: Iterable[str], doc_type: str = None) -> None:
+        with self._lock:
+            for prefix in prefixes:
+                self._pending.setdefault(prefix, Counter())[query_text] += 1
+                self._doc_types.setdefault((prefix, query_text), doc_type or "")
+        self._flusher.ensure_running()
+
+    def pending(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            return {prefix: dict(counts) for prefix, counts in self._pending.items()}
+
+    def flush(self) -> int:
+        """
+        Write all pending increments.
+
+        Returns:
+            int: Number of completion rows upserted
+        """
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+                doc_types, self._doc_types = self._doc_types, {}
+            rows = sorted(
+                (prefix, completion, doc_types.get((prefix, completion), ""), count)
+                for prefix, counts in pending.items()
+                for completion, count in counts.items()
+            )
+            if not rows:
+                return 0
+
+            try:
+                bulk_upsert_completions(rows, batch_size=self.batch_size)
+            except Exception as e:
+                self.failed += len(rows)
+                logger.error(f"Error writing {len(rows)} query completion increments: {e}")
+                return 0
+
+            self.written += len(rows)
+            return len(rows)
+
+
+def bulk_upsert_completions(rows: List[Tuple[str, str, str, int]], batch_size: int = 500) -> None:
+    """
+    Add frequency increments to QueryCompletion rows, inserting missing rows,
+    with one INSERT ... ON CONFLICT (prefix, completion) DO UPDATE per batch.
+    Works on PostgreSQL and SQLite 3.24+.
+
+    Args:
+        rows: (prefix, completion, doc_type, increment) tuples, unique per
+            (prefix, completion)
+        batch_size (int): Rows per statement
+    """
+    from django.db import connection
+    from .models import QueryCompletion
+
+    meta = QueryCompletion._meta
+    fields = [meta.get_field(name) for name in
+              ('id', 'prefix', 'completion', 'frequency', 'doc_type', 'created_at', 'updated_at')]
+    prefix_field, completion_field, frequency_field = fields[1], fields[2], fields[3]
+    quote = connection.ops.quote_name
+
+    table = quote(meta.db_table)
+    columns = ", ".join(quote(field.column) for field in fields)
+    frequency = quote(frequency_field.column)
+    updated_at = quote(fields[6].column)
+    row_placeholder = "(" + ", ".join(["%s"] * len(fields)) + ")"
+    now = timezone.now()
+
+    # Rows the columns cannot hold would fail the whole batch
+    rows = [
+        row for row in rows
+        if len(row[0]) <= prefix_field.max_length and len(row[1]) <= completion_field.max_length
+    ]
+
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            params = []
+            for prefix, completion, doc_type, increment in batch:
+                values = (uuid.uuid4(), prefix, completion, increment, doc_type, now, now)
+                params.extend(field.get_db_prep_save(value, connection) for field, value in zip(fields, values))
+            cursor.execute(
+                f"INSERT INTO {table} ({columns}) VALUES {', '.join([row_placeholder] * len(batch))} "
+                f"ON CONFLICT ({quote(prefix_field.column)}, {quote(completion_field.column)}) DO UPDATE SET "
+                f"{frequency} = {table}.{frequency} + EXCLUDED.{frequency}, "
+                f"{updated_at} = EXCLUDED.{updated_at}",
+                params,
+            )
+
+
+_completion_index = None
+_completion_writes = None
+_completion_lock = threading.Lock()
+
+
+def get_completion_index() -> CompletionIndex:
+    """
+    Get the process-wide autocomplete index.
+
+    Returns:
+        CompletionIndex: Shared index instance
+    """
+    global _completion_index
+
+    if _completion_index is None:
+        with _completion_lock:
+            if _completion_index is None:
+                _completion_index = CompletionIndex()
+
+    return _completion_index
+
+
+def get_completion_writes() -> CompletionWriteBehind:
+    """
+    Get the process-wide completion write-behind counter.
+
+    Returns:
+        CompletionWriteBehind: Shared counter instance
+    """
+    global _completion_writes
+
+    if _completion_writes is None:
+        with _completion_lock:
+            if _completion_writes is None:
+                _completion_writes = CompletionWriteBehind()
+                atexit.register(_completion_writes.flush)
+
+    return _completion_writes
+
+
+def pending_writes() -> Dict[str, Dict[str, int]]:
+    """Increments recorded by this process and not yet written, by prefix."""
+    return _completion_writes.pending() if _completion_writes is not None else {}
+
+
+def record_completions(query_text: str, doc_type: str = None) -> None:
+    """
+    Count a query towards autocomplete: update the local index now and
+    queue the database write (or write it immediately when
+    AUTOCOMPLETE_WRITE_BEHIND is off).
+
+    Args:
+        query_text (str): The query text
+        doc_type (str, optional): Document type, stored on new rows
+    """
+    prefixes = completion_prefixes(query_text)
+    if not prefixes:
+        return
+
+    get_completion_index().record(query_text, prefixes)
+
+    if getattr(settings, 'AUTOCOMPLETE_WRITE_BEHIND', True):
+        get_completion_writes().add(query_text, prefixes, doc_type)
+    else:
+        bulk_upsert_completions([
+            (prefix, query_text, doc_type or "", count) for prefix, count in sorted(Counter(prefixes).items())
+        ])
@@ -0,0 +1,22 @@
+# Generated by Django 4.2.10 on 2026-10-18 10:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("api_search", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="querysuggestion",
+            name="embedding",
+            field=models.BinaryField(
+                blank=True,
+                editable=False,
+                help_text="Packed float32 embedding of the query text",
+                null=True,
+            ),
+        ),
+    ]
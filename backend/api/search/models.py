@@ -46,6 +46,10 @@ class QuerySuggestion(models.Model):
     trending_score = models.FloatField(default=0.0,
                                       help_text="Score indicating how trending this query is")
     
+    # Semantic search
+    embedding = models.BinaryField(null=True, blank=True, editable=False,
+                                   help_text="Packed float32 embedding of the query text")
+    
     class Meta:
         verbose_name = "Query Suggestion"
         verbose_name_plural = "Query Suggestions"
@@ -60,6 +64,13 @@ class QuerySuggestion(models.Model):
     def __str__(self):
         return self.query_text
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the loaded text so a rename can invalidate the embedding
+        instance._loaded_query_text = instance.query_text
+        return instance
+    
     def increment_usage(self, success=False):
         """
         Increment usage count and success count if the query was successful.
@@ -0,0 +1,324 @@
+"""
+Dynamic micro-batching for cross-encoder inference.
+
+Concurrent reranking requests that arrive within a few milliseconds of each
+other are merged into a single `CrossEncoder.predict` call. A request that
+finds nothing else queued is scored at once, so a process that only ever
+serves one request at a time (gunicorn sync workers) pays no batching
+delay. Batching runs in one of two modes:
+
+- in-process: a background worker thread per process (default);
+- shared: a standalone `run_rerank_server` process serving all gunicorn
+  workers over a Unix socket, so only one model copy stays resident.
+  Workers use it when RERANK_SERVER_SOCKET is set and fall back to
+  in-process batching if the server is unreachable.
+"""
+
+import os
+import time
+import json
+import queue
+import socket
+import struct
+import logging
+import threading
+import socketserver
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Optional
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# 4-byte big-endian length prefix for socket messages
+_HEADER = struct.Struct(">I")
+
+
+class MicroBatcher:
+    """
+    Gathers prediction requests on a queue and runs them as merged batches
+    on a single worker thread.
+    """
+
+    def __init__(self, predict_fn: Callable[[List[List[str]]], List[float]],
+                 max_batch_pairs: int = 128, max_wait_ms: float = 5.0):
+        """
+        Initialize the batcher.
+
+        Args:
+            predict_fn: Callable scoring a list of [query, text] pairs
+            max_batch_pairs (int): Upper bound on pairs merged into one call
+            max_wait_ms (float): How long to wait for more requests after the first,
+                when other requests are already queued
+        """
+        self.predict_fn = predict_fn
+        self.max_batch_pairs = max_batch_pairs
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = queue.Queue()
+        self._worker = None
+        self._worker_pid = None
+        self._lock = threading.Lock()
+        self.batches_run = 0
+        self.requests_served = 0
+
+    def submit(self, pairs: List[List[str]]) -> Future:
+        """
+        Queue pairs for scoring.
+
+        Args:
+            pairs: List of [query, text] pairs
+
+        Returns:
+            Future: Resolves to a list of float scores aligned with `pairs`
+        """
+        future = Future()
+        if not pairs:
+            future.set_result([])
+            return future
+
+        self._ensure_worker()
+        self._queue.put((pairs, future))
+        return future
+
+    def predict(self, pairs: List[List[str]], timeout: float = None) -> List[float]:
+        """Blocking convenience wrapper around submit()."""
+        return self.submit(pairs).result(timeout=timeout)
+
+    def _ensure_worker(self) -> None:
+        # Threads do not survive fork, so start a fresh worker in each child
+        pid = os.getpid()
+        if self._worker is not None and self._worker_pid == pid and self._worker.is_alive():
+            return
+
+        with self._lock:
+            if self._worker is not None and self._worker_pid == pid and self._worker.is_alive():
+                return
+            if self._worker_pid != pid:
+                self._queue = queue.Queue()
+            self._worker_pid = pid
+            self._worker = threading.Thread(target=self._run, name="rerank-batcher", daemon=True)
+            self._worker.start()
+
+    def _collect(self) -> list:
+        first = self._queue.get()
+        batch = [first]
+        total = len(first[0])
+
+        # Only wait for more when requests are arriving concurrently;
+        # a lone request is dispatched immediately
+        concurrent = not self._queue.empty()
+        deadline = time.monotonic() + self.max_wait
+        while total < self.max_batch_pairs:
+            try:
+                if concurrent:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    item = self._queue.get(timeout=remaining)
+                else:
+                    item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            batch.append(item)
+            total += len(item[0])
+
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._collect()
+
+            # Merge all requests and sort by length to keep padding low
+            flat = []
+            for request_index, (pairs, _) in enumerate(batch):
+                for pair_index, pair in enumerate(pairs):
+                    flat.append((len(pair[1]), request_index, pair_index, pair))
+            flat.sort(key=lambda item: item[0])
+
+            results = [[0.0] * len(pairs) for pairs, _ in batch]
+            try:
+                scores = self.predict_fn([item[3] for item in flat])
+                for (_, request_index, pair_index, _), score in zip(flat, scores):
+                    results[request_index][pair_index] = float(score)
+            except Exception as e:
+                logger.error(f"Micro-batched reranking failed: {e}")
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            self.batches_run += 1
+            self.requests_served += len(batch)
+            for (_, future), scores_for_request in zip(batch, results):
+                future.set_result(scores_for_request)
+
+
+def _recv_exact(sock: socket.socket, size: int) -> bytes:
+    data = bytearray()
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError("Socket closed mid-message")
+        data.extend(chunk)
+    return bytes(data)
+
+
+def send_message(sock: socket.socket, payload: Dict) -> None:
+    body = json.dumps(payload).encode("utf-8")
+    sock.sendall(_HEADER.pack(len(body)) + body)
+
+
+def recv_message(sock: socket.socket) -> Dict:
+    (size,) = _HEADER.unpack(_recv_exact(sock, _HEADER.size))
+    return json.loads(_recv_exact(sock, size).decode("utf-8"))
+
+
+class _RerankRequestHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        while True:
+            try:
+                request = recv_message(self.request)
+            except (ConnectionError, struct.error):
+                return
+
+            try:
+                scores = self.server.batcher.predict(request.get("pairs", []))
+                send_message(self.request, {"scores": scores})
+            except Exception as e:
+                send_message(self.request, {"error": str(e)})
+
+
+class RerankSocketServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """
+    Unix-socket server that feeds all connections into one MicroBatcher.
+    """
+    daemon_threads = True
+
+    def __init__(self, socket_path: str, batcher: MicroBatcher):
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        self.batcher = batcher
+        super().__init__(socket_path, _RerankRequestHandler)
+        os.chmod(socket_path, 0o660)
+
+
+class RerankSocketClient:
+    """
+    Client for RerankSocketServer. Keeps one connection per thread.
+    """
+
+    def __init__(self, socket_path: str, timeout: float = 10.0):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connection(self) -> socket.socket:
+        sock = getattr(self._local, "sock", None)
+        if sock is None or getattr(self._local, "pid", None) != os.getpid():
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            sock.connect(self.socket_path)
+            self._local.sock = sock
+            self._local.pid = os.getpid()
+        return sock
+
+    def _reset(self) -> None:
+        sock = getattr(self._local, "sock", None)
+        if sock is not None:
+            try:
+                sock.close()
+            except OSError:
+                pass
+        self._local.sock = None
+
+    def predict(self, pairs: List[List[str]]) -> List[float]:
+        try:
+            sock = self._connection()
+            send_message(sock, {"pairs": pairs})
+            response = recv_message(sock)
+        except Exception:
+            self._reset()
+            raise
+
+        if "error" in response:
+            raise RuntimeError(f"Rerank server error: {response['error']}")
+        return response["scores"]
+
+
+_batchers: Dict[str, MicroBatcher] = {}
+_batchers_lock = threading.Lock()
+_socket_client: Optional[RerankSocketClient] = None
+
+
+def get_batcher(model_name: str = None) -> Optional[MicroBatcher]:
+    """
+    Get the in-process micro-batcher for a cross-encoder model.
+
+    Returns:
+        MicroBatcher: Shared batcher, or None if the model could not be loaded
+    """
+    key = model_name or "default"
+    batcher = _batchers.get(key)
+    if batcher is not None:
+        return batcher
+
+    from .reranking import get_cross_encoder
+
+    model = get_cross_encoder(model_name)
+    if model is None:
+        return None
+
+    batch_size = getattr(settings, 'RERANK_BATCH_SIZE', 32)
+
+    def predict_fn(pairs):
+        return model.predict(pairs, batch_size=batch_size, show_progress_bar=False)
+
+    with _batchers_lock:
+        if key not in _batchers:
+            _batchers[key] = MicroBatcher(
+                predict_fn,
+                max_batch_pairs=getattr(settings, 'RERANK_MAX_BATCH_PAIRS', 128),
+                max_wait_ms=getattr(settings, 'RERANK_BATCH_WAIT_MS', 5),
+            )
+        return _batchers[key]
+
+
+def _get_socket_client() -> Optional[RerankSocketClient]:
+    global _socket_client
+
+    socket_path = getattr(settings, 'RERANK_SERVER_SOCKET', '')
+    if not socket_path or not os.path.exists(socket_path):
+        return None
+    if _socket_client is None or _socket_client.socket_path != socket_path:
+        _socket_client = RerankSocketClient(
+            socket_path, timeout=getattr(settings, 'RERANK_SERVER_TIMEOUT', 10.0)
+        )
+    return _socket_client
+
+
+def predict_pairs(pairs: List[List[str]], model_name: str = None) -> Optional[List[float]]:
+    """
+    Score [query, text] pairs through the shared rerank server if configured,
+    otherwise through this process's micro-batcher.
+
+    Args:
+        pairs: List of [query, text] pairs
+        model_name (str, optional): Cross-encoder model (in-process mode only)
+
+    Returns:
+        List[float]: Scores aligned with pairs, or None if no model is available
+    """
+    if not pairs:
+        return []
+
+    client = _get_socket_client()
+    if client is not None and model_name is None:
+        try:
+            return client.predict(pairs)
+        except Exception as e:
+            logger.warning(f"Rerank server unavailable, scoring in-process: {e}")
+
+    batcher = get_batcher(model_name)
+    if batcher is None:
+        return None
+    return batcher.predict(pairs)
@@ -4,11 +4,16 @@ Cross-encoder reranking for improved search relevance.
 
 import logging
 import time
-from typing import List, Dict, Any, Optional, Tuple
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import TYPE_CHECKING, List, Dict, Any, Optional, Tuple
 
-from sentence_transformers import CrossEncoder
 from django.conf import settings
 
+if TYPE_CHECKING:
+    from sentence_transformers import CrossEncoder
+
 logger = logging.getLogger(__name__)
 
 # Default model to use for cross-encoder reranking
@@ -27,7 +32,7 @@ CROSS_ENCODER_MODELS = {
 _cross_encoder_instance = None
 
 
-def get_cross_encoder(model_name: str = None) -> CrossEncoder:
+def get_cross_encoder(model_name: str = None) -> "CrossEncoder":
     """
     Get or create a cross-encoder model instance.
     Uses a singleton pattern to avoid loading the model multiple times.
@@ -60,6 +65,9 @@ def get_cross_encoder(model_name: str = None) -> CrossEncoder:
         logger.info(f"Loading cross-encoder model: {model_path}")
         start_time = time.time()
         
+        # Imported here: sentence-transformers pulls in torch, which slows startup
+        from sentence_transformers import CrossEncoder
+        
         # Load the model
         _cross_encoder_instance = CrossEncoder(model_path, max_length=512)
         
@@ -71,6 +79,122 @@ def get_cross_encoder(model_name: str = None) -> CrossEncoder:
         return None
 
 
+class RerankScoreCache:
+    """
+    Thread-safe LRU cache of cross-encoder scores keyed by
+    (model, query hash, chunk hash).
+    """
+    
+    def __init__(self, max_size: int = 10000):
+        self.max_size = max_size
+        self._scores = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    def get_many(self, keys: List[Tuple]) -> List[Optional[float]]:
+        scores = []
+        with self._lock:
+            for key in keys:
+                score = self._scores.get(key)
+                if score is None:
+                    self.misses += 1
+                else:
+                    self._scores.move_to_end(key)
+                    self.hits += 1
+                scores.append(score)
+        return scores
+    
+    def set_many(self, items: Dict[Tuple, float]) -> None:
+        with self._lock:
+            for key, score in items.items():
+                self._scores[key] = score
+                self._scores.move_to_end(key)
+            while len(self._scores) > self.max_size:
+                self._scores.popitem(last=False)
+    
+    def clear(self) -> None:
+        with self._lock:
+            self._scores.clear()
+
+
+_score_cache = RerankScoreCache(getattr(settings, 'RERANK_SCORE_CACHE_SIZE', 10000))
+
+
+def _text_hash(text: str) -> str:
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def _result_text(result: Dict) -> str:
+    """Text used for scoring: content for documents, caption for figures."""
+    if "content" in result:
+        return result["content"] or ""
+    if "caption" in result:
+        return result["caption"] or ""
+    return ""
+
+
+def score_query_pairs(query_text: str, texts: List[str],
+                      model_name: Optional[str] = None) -> Optional[List[float]]:
+    """
+    Score (query, text) pairs with the cross-encoder.
+    
+    Each distinct pair is scored at most once: scores are looked up in an LRU
+    cache first, duplicate texts are collapsed, and the remaining pairs are
+    sorted by length before batching so each batch pads to similar lengths.
+    
+    Args:
+        query_text (str): The search query
+        texts (List[str]): Candidate texts
+        model_name (str, optional): Name of the cross-encoder model to use
+        
+    Returns:
+        List[float]: One score per text, or None if the model is unavailable
+    """
+    if not texts:
+        return []
+    
+    model_key = model_name or getattr(settings, 'CROSS_ENCODER_MODEL', None) or 'default'
+    query_hash = _text_hash(query_text)
+    keys = [(model_key, query_hash, _text_hash(text)) for text in texts]
+    
+    scores = _score_cache.get_many(keys)
+    
+    # Collapse duplicate texts among the misses
+    missing = {}
+    for key, text, score in zip(keys, texts, scores):
+        if score is None and key not in missing:
+            missing[key] = text
+    
+    if missing:
+        # Length-sorted order keeps padding waste low within each batch
+        ordered = sorted(missing.items(), key=lambda item: len(item[1]))
+        pairs = [[query_text, text] for _, text in ordered]
+
+        if getattr(settings, 'RERANK_MICRO_BATCHING', True):
+            # Merge with pairs from concurrent requests into one predict call
+            from .rerank_batcher import predict_pairs
+            predicted = predict_pairs(pairs, model_name)
+            if predicted is None:
+                return None
+        else:
+            model = get_cross_encoder(model_name)
+            if model is None:
+                return None
+            predicted = model.predict(
+                pairs,
+                batch_size=getattr(settings, 'RERANK_BATCH_SIZE', 32),
+                show_progress_bar=False
+            )
+
+        new_scores = {key: float(score) for (key, _), score in zip(ordered, predicted)}
+        _score_cache.set_many(new_scores)
+        scores = [score if score is not None else new_scores[key]
+                  for key, score in zip(keys, scores)]
+    
+    return scores
+
+
 def rerank_search_results(query_text: str, results: List[Dict], 
                          top_k: Optional[int] = None, 
                          model_name: Optional[str] = None) -> Tuple[List[Dict], float]:
@@ -91,34 +215,16 @@ def rerank_search_results(query_text: str, results: List[Dict],
     
     start_time = time.time()
     
-    # Get the cross-encoder model
-    model = get_cross_encoder(model_name)
-    if model is None:
+    # Score all query-document pairs (content for documents, caption for figures)
+    scores = score_query_pairs(query_text, [_result_text(r) for r in results], model_name)
+    if scores is None:
         # If model loading failed, return original results
         logger.warning("Cross-encoder model not available, skipping reranking")
         return results, 0
     
-    # Prepare query-document pairs for reranking
-    query_doc_pairs = []
-    for result in results:
-        # Use content field for documents and caption for figures
-        if "content" in result:
-            text = result["content"]
-        elif "caption" in result:
-            text = result["caption"]
-        else:
-            # If neither field is present, use an empty string
-            text = ""
-        
-        # Add to pairs for scoring
-        query_doc_pairs.append([query_text, text])
-    
-    # Score all query-document pairs
-    scores = model.predict(query_doc_pairs)
-    
     # Add scores to results
-    for i, score in enumerate(scores):
-        results[i]["rerank_score"] = float(score)
+    for result, score in zip(results, scores):
+        result["rerank_score"] = score
     
     # Sort by rerank score
     reranked_results = sorted(results, key=lambda x: x.get("rerank_score", 0), reverse=True)
@@ -133,7 +239,8 @@ def rerank_search_results(query_text: str, results: List[Dict],
 
 def rerank_chunks_for_rag(query_text: str, chunks: List[Dict], 
                          top_k: int = 5, 
-                         model_name: Optional[str] = None) -> Tuple[List[Dict], float]:
+                         model_name: Optional[str] = None,
+                         use_existing_scores: bool = False) -> Tuple[List[Dict], float]:
     """
     Rerank document chunks for retrieval augmented generation.
     Specifically optimized for selecting the best context chunks for RAG.
@@ -143,6 +250,8 @@ def rerank_chunks_for_rag(query_text: str, chunks: List[Dict],
         chunks (List[Dict]): Document chunks to rerank
         top_k (int): Number of chunks to return after reranking
         model_name (str, optional): Name of the cross-encoder model to use
+        use_existing_scores (bool): Reuse the `rerank_score` already attached to
+            the chunks for this query instead of scoring them again
         
     Returns:
         Tuple[List[Dict], float]: Reranked chunks and time taken in ms
@@ -152,28 +261,16 @@ def rerank_chunks_for_rag(query_text: str, chunks: List[Dict],
     
     start_time = time.time()
     
-    # Get the cross-encoder model
-    model = get_cross_encoder(model_name)
-    if model is None:
-        # If model loading failed, return original chunks
-        logger.warning("Cross-encoder model not available, skipping reranking for RAG")
-        return chunks[:top_k], 0
-    
-    # Prepare query-chunk pairs for reranking
-    query_chunk_pairs = []
-    for chunk in chunks:
-        # Use content field for chunk text
-        chunk_text = chunk.get("content", "")
+    if not (use_existing_scores and all("rerank_score" in chunk for chunk in chunks)):
+        scores = score_query_pairs(query_text, [_result_text(c) for c in chunks], model_name)
+        if scores is None:
+            # If model loading failed, return original chunks
+            logger.warning("Cross-encoder model not available, skipping reranking for RAG")
+            return chunks[:top_k], 0
         
-        # Add to pairs for scoring
-        query_chunk_pairs.append([query_text, chunk_text])
-    
-    # Score all query-chunk pairs
-    scores = model.predict(query_chunk_pairs)
-    
-    # Add scores to chunks
-    for i, score in enumerate(scores):
-        chunks[i]["rerank_score"] = float(score)
+        # Add scores to chunks
+        for chunk, score in zip(chunks, scores):
+            chunk["rerank_score"] = score
     
     # Sort by rerank score
     reranked_chunks = sorted(chunks, key=lambda x: x.get("rerank_score", 0), reverse=True)
@@ -182,4 +279,4 @@ def rerank_chunks_for_rag(query_text: str, chunks: List[Dict],
     reranked_chunks = reranked_chunks[:top_k]
     
     elapsed_ms = (time.time() - start_time) * 1000
-    return reranked_chunks, elapsed_ms
\ No newline at end of file
+    return reranked_chunks, elapsed_ms
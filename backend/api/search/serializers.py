@@ -15,7 +15,7 @@ class QuerySuggestionSerializer(serializers.ModelSerializer):
         model = QuerySuggestion
         fields = [
             'id', 'query_text', 'category', 'usage_count', 'success_rate',
-            'created_at', 'last_used', 'is_curated', 'embedding'
+            'created_at', 'last_used', 'is_curated'
         ]
         read_only_fields = ['usage_count', 'success_rate', 'last_used']
 
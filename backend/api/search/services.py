@@ -12,12 +12,19 @@ from django.db.models.functions import Length
 from datetime import timedelta
 
 from .reranking import rerank_search_results, rerank_chunks_for_rag
+from .suggestion_index import get_suggestion_index, pack_embedding
+from .completion_index import get_completion_index, record_completions
+from .usage_buffer import get_search_usage_buffer, record_saved_search_use, search_usage_deferred
 
 from ..models import QueryHistory, Feedback
-from ..ingestion.embeddings_utils import search_weaviate, generate_embedding
+from ..analytics.buffer import buffered_create, get_metric_buffer
+from ..ingestion.embeddings_utils import (
+    search_weaviate,
+    generate_embedding,
+    get_embeddings_with_cache
+)
 from .models import (
     QuerySuggestion, 
-    QueryCompletion, 
     SearchRankingProfile,
     SearchAnalytics,
     SearchFilter,
@@ -142,6 +149,9 @@ class QuerySuggestionService:
         """
         Get semantically similar query suggestions.
         
+        Suggestion embeddings are precomputed and held in an in-memory index,
+        so only the input query needs to be embedded.
+        
         Args:
             query_text (str): Input query text
             limit (int): Number of suggestions to return
@@ -149,10 +159,10 @@ class QuerySuggestionService:
         Returns:
             List of query suggestion objects
         """
-        # Get all query suggestions
-        all_suggestions = QuerySuggestion.objects.all()
+        index = get_suggestion_index()
+        index.refresh()
         
-        if not all_suggestions.exists():
+        if not len(index):
             return []
         
         # Generate embedding for input query
@@ -160,34 +170,50 @@ class QuerySuggestionService:
         if not query_embedding:
             return []
         
-        # Prepare to score each suggestion
-        suggestions_with_scores = []
+        return index.search(query_embedding, limit=limit)
+    
+    @staticmethod
+    def embed_suggestions(suggestion_ids: List[str] = None) -> int:
+        """
+        Compute and store embeddings for suggestions that do not have one.
         
-        for suggestion in all_suggestions:
-            # Get existing embedding or generate new one
-            # In a real implementation, you'd store embeddings with suggestions
-            suggestion_embedding = generate_embedding(suggestion.query_text)
+        Args:
+            suggestion_ids (List[str], optional): Restrict to these suggestions
             
-            if suggestion_embedding:
-                # Calculate cosine similarity
-                similarity = QuerySuggestionService._cosine_similarity(
-                    query_embedding, suggestion_embedding
-                )
+        Returns:
+            int: Number of suggestions embedded
+        """
+        query = QuerySuggestion.objects.filter(embedding__isnull=True)
+        if suggestion_ids:
+            query = query.filter(id__in=suggestion_ids)
+        
+        index = get_suggestion_index()
+        embedded_count = 0
+        
+        suggestions = list(query.values_list('id', 'query_text'))
+        batch_size = 256
+        
+        for start in range(0, len(suggestions), batch_size):
+            batch = suggestions[start:start + batch_size]
+            embeddings = get_embeddings_with_cache([text for _, text in batch])
+            
+            for (suggestion_id, _), embedding in zip(batch, embeddings):
+                packed = pack_embedding(embedding)
+                if not packed:
+                    continue
                 
-                suggestions_with_scores.append({
-                    "id": str(suggestion.id),
-                    "query": suggestion.query_text,
-                    "category": suggestion.category,
-                    "doc_type": suggestion.doc_type,
-                    "usage_count": suggestion.usage_count,
-                    "similarity": similarity,
-                    "is_featured": suggestion.is_featured
-                })
-        
-        # Sort by similarity score
-        suggestions_with_scores.sort(key=lambda x: x["similarity"], reverse=True)
-        
-        return suggestions_with_scores[:limit]
+                # Use update() so usage-count saves racing with us are not overwritten
+                QuerySuggestion.objects.filter(id=suggestion_id).update(
+                    embedding=packed,
+                    updated_at=timezone.now()
+                )
+                embedded_count += 1
+        
+        # Pick up the new rows in this process right away
+        if index.is_loaded:
+            index.refresh(force=True)
+        
+        return embedded_count
     
     @staticmethod
     def get_autocomplete_suggestions(prefix: str, limit: int = 5) -> List[str]:
@@ -204,26 +230,9 @@ class QuerySuggestionService:
         if not prefix or len(prefix) < 2:
             return []
         
-        prefix = prefix.lower()
-        
-        # First try exact prefix matches
-        completions = QueryCompletion.objects.filter(
-            prefix=prefix
-        ).order_by('-frequency')[:limit]
-        
-        if not completions.exists():
-            # Try as a LIKE query
-            completions = QueryCompletion.objects.filter(
-                prefix__startswith=prefix
-            ).order_by('-frequency')[:limit]
-        
-        # If still no results, try partial match on completion field
-        if not completions.exists():
-            completions = QueryCompletion.objects.filter(
-                completion__icontains=prefix
-            ).order_by('-frequency')[:limit]
-        
-        return [c.completion for c in completions]
+        # Served from the in-memory completion trie instead of up to three
+        # QueryCompletion scans (exact prefix, LIKE prefix, icontains)
+        return get_completion_index().suggest(prefix.lower(), limit)
     
     @staticmethod
     def record_query(query_text: str, confidence_score: float = None,
@@ -262,7 +271,55 @@ class QuerySuggestionService:
         
         # Update completions for autocomplete
         QuerySuggestionService._update_query_completions(query_text, doc_type)
-    
+
+    @staticmethod
+    def record_query_counts(query_counts: Dict[str, int], doc_types: Dict[str, str] = None) -> int:
+        """
+        Record several uses of many queries at once, as `record_query` does
+        without a confidence score: one UPDATE per distinct count, and a
+        get_or_create only for queries that have no suggestion yet.
+
+        Args:
+            query_counts: Number of uses per (stripped) query text
+            doc_types: Document type per query text, used for new suggestions
+
+        Returns:
+            int: Number of distinct queries recorded
+        """
+        doc_types = doc_types or {}
+        query_counts = {text: count for text, count in query_counts.items() if text and count > 0}
+        if not query_counts:
+            return 0
+
+        existing = set(QuerySuggestion.objects.filter(
+            query_text__in=list(query_counts)
+        ).values_list('query_text', flat=True))
+
+        # New suggestions go through save() so their embeddings get scheduled
+        for query_text in query_counts:
+            if query_text not in existing:
+                QuerySuggestion.objects.get_or_create(
+                    query_text=query_text,
+                    defaults={"doc_type": doc_types.get(query_text) or ""}
+                )
+
+        by_count: Dict[int, List[str]] = {}
+        for query_text, count in query_counts.items():
+            by_count.setdefault(count, []).append(query_text)
+        now = timezone.now()
+        for count, texts in by_count.items():
+            QuerySuggestion.objects.filter(query_text__in=texts).update(
+                usage_count=F('usage_count') + count,
+                recent_count=F('recent_count') + count,
+                updated_at=now
+            )
+
+        for query_text, count in query_counts.items():
+            for _ in range(count):
+                QuerySuggestionService._update_query_completions(query_text, doc_types.get(query_text))
+
+        return len(query_counts)
+
     @staticmethod
     def update_trending_scores() -> int:
         """
@@ -427,27 +484,7 @@ class QuerySuggestionService:
             query_text (str): The query text
             doc_type (str, optional): Document type
         """
-        words = query_text.lower().split()
-        
-        # Add completions for various n-grams
-        for n in range(1, min(4, len(words))):
-            for i in range(len(words) - n + 1):
-                prefix = " ".join(words[i:i+n])
-                
-                # Skip very short prefixes
-                if len(prefix) < 3:
-                    continue
-                
-                completion, created = QueryCompletion.objects.get_or_create(
-                    prefix=prefix,
-                    completion=query_text,
-                    defaults={"doc_type": doc_type or ""}
-                )
-                
-                if not created:
-                    # Increment frequency
-                    completion.frequency += 1
-                    completion.save()
+        record_completions(query_text, doc_type)
     
     @staticmethod
     def _cosine_similarity(vec1: List[float], vec2: List[float]) -> float:
@@ -576,9 +613,7 @@ class SearchService:
                     facets = saved_search.parameters.get('facets')
                     
                 # Update usage statistics
-                saved_search.usage_count += 1
-                saved_search.last_used = timezone.now()
-                saved_search.save(update_fields=['usage_count', 'last_used'])
+                record_saved_search_use(saved_search)
             except SavedSearch.DoesNotExist:
                 pass
         
@@ -586,7 +621,10 @@ class SearchService:
         profile = self.get_ranking_profile(profile_id)
         
         # Update usage count for profile
-        profile.increment_usage()
+        if search_usage_deferred():
+            get_search_usage_buffer().add_profile_use(profile.id)
+        else:
+            profile.increment_usage()
         
         # Override limit if specified
         if limit is None:
@@ -598,10 +636,13 @@ class SearchService:
         include_figures = profile.include_figures
         
         # Record query for suggestions
-        QuerySuggestionService.record_query(
-            query_text=query_text,
-            doc_type=doc_type
-        )
+        if search_usage_deferred():
+            get_search_usage_buffer().add_query(query_text, doc_type)
+        else:
+            QuerySuggestionService.record_query(
+                query_text=query_text,
+                doc_type=doc_type
+            )
         
         # Build advanced filter criteria for Weaviate
         weaviate_filters = self._build_weaviate_filters(filters, doc_type)
@@ -664,8 +705,9 @@ class SearchService:
             if doc_type and doc_type not in top_doc_types:
                 top_doc_types.append(doc_type)
         
-        # Log search analytics
-        analytics = SearchAnalytics.objects.create(
+        # Log search analytics (written in the background when buffering is on)
+        analytics = buffered_create(
+            SearchAnalytics,
             query_text=query_text,
             user=user,
             session_id=session_id or "",
@@ -763,6 +805,24 @@ class SearchService:
         
         return results
     
+    @staticmethod
+    def _get_analytics(analytics_id: str) -> SearchAnalytics:
+        """
+        Load a SearchAnalytics row, flushing the analytics buffer first if the
+        row has not been written yet.
+        
+        Args:
+            analytics_id (str): Analytics ID
+            
+        Returns:
+            SearchAnalytics: The analytics row
+        """
+        try:
+            return SearchAnalytics.objects.get(id=analytics_id)
+        except SearchAnalytics.DoesNotExist:
+            get_metric_buffer().flush()
+            return SearchAnalytics.objects.get(id=analytics_id)
+    
     def update_analytics_with_answer(self, analytics_id: str, 
                                    confidence_score: float,
                                    answer_time_ms: int,
@@ -777,7 +837,7 @@ class SearchService:
             query_history_id: ID of associated QueryHistory object
         """
         try:
-            analytics = SearchAnalytics.objects.get(id=analytics_id)
+            analytics = self._get_analytics(analytics_id)
             
             analytics.confidence_score = confidence_score
             analytics.answer_time_ms = answer_time_ms
@@ -813,7 +873,7 @@ class SearchService:
             time_to_first_click (int, optional): Time to first click in ms
         """
         try:
-            analytics = SearchAnalytics.objects.get(id=analytics_id)
+            analytics = self._get_analytics(analytics_id)
             
             if result_selected is not None:
                 analytics.result_selected = result_selected
@@ -0,0 +1,56 @@
+"""
+Signal handlers for search models.
+"""
+
+import logging
+
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from .models import QuerySuggestion
+from .suggestion_index import get_suggestion_index
+
+logger = logging.getLogger(__name__)
+
+
+@receiver(pre_save, sender=QuerySuggestion)
+def invalidate_suggestion_embedding(sender, instance, **kwargs):
+    """
+    Drops the stored embedding when a suggestion's text changes.
+    """
+    loaded_text = getattr(instance, '_loaded_query_text', None)
+    if loaded_text is not None and loaded_text != instance.query_text:
+        instance.embedding = None
+
+
+@receiver(post_save, sender=QuerySuggestion)
+def sync_suggestion_embedding(sender, instance, created, **kwargs):
+    """
+    Keeps the semantic suggestion index in step with saved suggestions.
+    Suggestions without an embedding get one computed after the commit.
+    """
+    instance._loaded_query_text = instance.query_text
+
+    if instance.embedding:
+        get_suggestion_index().upsert(instance)
+        return
+
+    def schedule_embedding():
+        from .tasks import embed_query_suggestions
+        try:
+            embed_query_suggestions.delay([str(instance.pk)])
+        except Exception as e:
+            # No broker available - embed inline so the suggestion is still indexed
+            logger.warning(f"Could not queue suggestion embedding, embedding inline: {str(e)}")
+            embed_query_suggestions([str(instance.pk)])
+
+    transaction.on_commit(schedule_embedding)
+
+
+@receiver(post_delete, sender=QuerySuggestion)
+def remove_suggestion_from_index(sender, instance, **kwargs):
+    """
+    Removes deleted suggestions from the semantic suggestion index.
+    """
+    get_suggestion_index().remove(instance.pk)
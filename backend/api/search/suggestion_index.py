@@ -0,0 +1,334 @@
+"""
+In-memory embedding index for semantic query suggestions.
+
+Suggestion embeddings are computed once (when a suggestion is created or its
+text changes) and stored on the QuerySuggestion row as packed float32 bytes.
+This module loads them into a single contiguous, L2-normalised float32 matrix
+so that a semantic lookup is one matrix-vector product plus a top-k
+selection instead of one embedding call per suggestion.
+"""
+
+import time
+import logging
+import threading
+from typing import List, Dict, Optional
+
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_DTYPE = np.float32
+
+
+def pack_embedding(embedding) -> Optional[bytes]:
+    """
+    Pack an embedding into float32 bytes for storage.
+
+    Args:
+        embedding: List or array of floats
+
+    Returns:
+        bytes: Packed embedding, or None if the embedding is empty
+    """
+    if embedding is None or len(embedding) == 0:
+        return None
+    return np.asarray(embedding, dtype=EMBEDDING_DTYPE).tobytes()
+
+
+def unpack_embedding(data) -> Optional[np.ndarray]:
+    """
+    Unpack float32 bytes produced by pack_embedding.
+
+    Args:
+        data: bytes/memoryview from a BinaryField
+
+    Returns:
+        np.ndarray: 1-D float32 vector, or None if there is no data
+    """
+    if not data:
+        return None
+    return np.frombuffer(bytes(data), dtype=EMBEDDING_DTYPE)
+
+
+def _normalize(vector: np.ndarray) -> Optional[np.ndarray]:
+    norm = np.linalg.norm(vector)
+    if norm == 0:
+        return None
+    return vector / norm
+
+
+class SuggestionEmbeddingIndex:
+    """
+    Contiguous float32 matrix of suggestion embeddings with row metadata.
+
+    Rows are kept L2-normalised, so cosine similarity is a plain dot product.
+    The matrix grows by doubling so incremental inserts are amortised O(d),
+    and deletions swap the last row into the freed slot.
+    """
+
+    # Fields copied from QuerySuggestion into each result row
+    METADATA_FIELDS = ("id", "query_text", "category", "doc_type",
+                       "usage_count", "is_featured", "embedding", "updated_at")
+
+    def __init__(self, refresh_interval: float = None):
+        self.refresh_interval = (
+            refresh_interval if refresh_interval is not None
+            else getattr(settings, 'SUGGESTION_INDEX_REFRESH_SECONDS', 30)
+        )
+        self._lock = threading.RLock()
+        self._matrix = None
+        self._size = 0
+        self._dimension = None
+        self._ids: List[str] = []
+        self._rows: List[Dict] = []
+        self._positions: Dict[str, int] = {}
+        self._loaded = False
+        self._last_sync = None
+        self._last_refresh_check = 0.0
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._loaded
+
+    def rebuild(self) -> int:
+        """
+        Reload the whole index from the database.
+
+        Returns:
+            int: Number of indexed suggestions
+        """
+        from .models import QuerySuggestion
+
+        sync_time = timezone.now()
+        records = list(
+            QuerySuggestion.objects.filter(embedding__isnull=False)
+            .values(*self.METADATA_FIELDS)
+        )
+
+        with self._lock:
+            self._matrix = None
+            self._size = 0
+            self._dimension = None
+            self._ids = []
+            self._rows = []
+            self._positions = {}
+
+            vectors = []
+            for record in records:
+                vector = self._prepare_vector(record.get("embedding"))
+                if vector is None:
+                    continue
+                self._append_metadata(record)
+                vectors.append(vector)
+
+            if vectors:
+                self._matrix = np.ascontiguousarray(np.vstack(vectors), dtype=EMBEDDING_DTYPE)
+                self._size = len(vectors)
+
+            self._loaded = True
+            self._last_sync = sync_time
+            self._last_refresh_check = time.monotonic()
+
+        logger.info(f"Loaded {self._size} suggestion embeddings into semantic index")
+        return self._size
+
+    def refresh(self, force: bool = False) -> None:
+        """
+        Incrementally apply suggestions changed since the last sync.
+
+        Other processes learn about inserts and updates through `updated_at`;
+        a row-count mismatch (e.g. deletions) triggers a full rebuild.
+
+        Args:
+            force (bool): Refresh even if the refresh interval has not elapsed
+        """
+        from .models import QuerySuggestion
+
+        if not self._loaded:
+            self.rebuild()
+            return
+
+        now = time.monotonic()
+        if not force and now - self._last_refresh_check < self.refresh_interval:
+            return
+
+        with self._lock:
+            self._last_refresh_check = now
+            since = self._last_sync
+
+        sync_time = timezone.now()
+        changed = list(
+            QuerySuggestion.objects.filter(updated_at__gte=since)
+            .values(*self.METADATA_FIELDS)
+        )
+        for record in changed:
+            self._upsert_record(record)
+
+        with self._lock:
+            self._last_sync = sync_time
+
+        expected = QuerySuggestion.objects.filter(embedding__isnull=False).count()
+        if expected != self._size:
+            self.rebuild()
+
+    def upsert(self, suggestion) -> None:
+        """
+        Insert or update a single suggestion in the index.
+
+        Args:
+            suggestion (QuerySuggestion): Suggestion model instance
+        """
+        if not self._loaded:
+            return
+        self._upsert_record({
+            field: getattr(suggestion, field) for field in self.METADATA_FIELDS
+        })
+
+    def remove(self, suggestion_id) -> None:
+        """
+        Remove a suggestion from the index.
+
+        Args:
+            suggestion_id: Suggestion primary key
+        """
+        key = str(suggestion_id)
+        with self._lock:
+            position = self._positions.pop(key, None)
+            if position is None:
+                return
+
+            last = self._size - 1
+            if position != last:
+                # Move the last row into the freed slot
+                self._matrix[position] = self._matrix[last]
+                self._ids[position] = self._ids[last]
+                self._rows[position] = self._rows[last]
+                self._positions[self._ids[position]] = position
+
+            self._ids.pop()
+            self._rows.pop()
+            self._size = last
+
+    def search(self, query_embedding, limit: int = 5) -> List[Dict]:
+        """
+        Find the suggestions most similar to a query embedding.
+
+        Args:
+            query_embedding: Query vector (list or array)
+            limit (int): Number of suggestions to return
+
+        Returns:
+            List of suggestion dicts with a `similarity` score, best first
+        """
+        self.refresh()
+
+        query = np.asarray(query_embedding, dtype=EMBEDDING_DTYPE)
+        query = _normalize(query)
+        if query is None or limit <= 0:
+            return []
+
+        with self._lock:
+            if self._size == 0:
+                return []
+            if query.shape[0] != self._dimension:
+                logger.warning(
+                    f"Query embedding dimension {query.shape[0]} does not match "
+                    f"suggestion index dimension {self._dimension}"
+                )
+                return []
+
+            scores = self._matrix[:self._size] @ query
+            k = min(limit, self._size)
+            if k < self._size:
+                top = np.argpartition(-scores, k - 1)[:k]
+            else:
+                top = np.arange(self._size)
+            top = top[np.argsort(-scores[top])]
+
+            return [
+                {**self._rows[i], "similarity": float(scores[i])}
+                for i in top
+            ]
+
+    def _prepare_vector(self, data) -> Optional[np.ndarray]:
+        vector = unpack_embedding(data)
+        if vector is None:
+            return None
+        if self._dimension is None:
+            self._dimension = vector.shape[0]
+        elif vector.shape[0] != self._dimension:
+            # Embedding model changed; skip until the row is re-embedded
+            return None
+        return _normalize(vector)
+
+    def _append_metadata(self, record: Dict) -> None:
+        key = str(record["id"])
+        self._positions[key] = len(self._ids)
+        self._ids.append(key)
+        self._rows.append(self._row_from_record(record))
+
+    @staticmethod
+    def _row_from_record(record: Dict) -> Dict:
+        return {
+            "id": str(record["id"]),
+            "query": record["query_text"],
+            "category": record["category"],
+            "doc_type": record["doc_type"],
+            "usage_count": record["usage_count"],
+            "is_featured": record["is_featured"],
+        }
+
+    def _upsert_record(self, record: Dict) -> None:
+        key = str(record["id"])
+        with self._lock:
+            vector = self._prepare_vector(record.get("embedding"))
+            if vector is None:
+                self.remove(key)
+                return
+
+            position = self._positions.get(key)
+            if position is None:
+                self._ensure_capacity(self._size + 1)
+                position = self._size
+                self._append_metadata(record)
+                self._size += 1
+            else:
+                self._rows[position] = self._row_from_record(record)
+
+            self._matrix[position] = vector
+
+    def _ensure_capacity(self, required: int) -> None:
+        if self._matrix is not None and self._matrix.shape[0] >= required:
+            return
+
+        capacity = max(required, 2 * (self._matrix.shape[0] if self._matrix is not None else 0), 64)
+        matrix = np.zeros((capacity, self._dimension), dtype=EMBEDDING_DTYPE)
+        if self._matrix is not None and self._size:
+            matrix[:self._size] = self._matrix[:self._size]
+        self._matrix = matrix
+
+
+_suggestion_index = None
+_suggestion_index_lock = threading.Lock()
+
+
+def get_suggestion_index() -> SuggestionEmbeddingIndex:
+    """
+    Get the process-wide suggestion embedding index.
+
+    Returns:
+        SuggestionEmbeddingIndex: Shared index instance
+    """
+    global _suggestion_index
+
+    if _suggestion_index is None:
+        with _suggestion_index_lock:
+            if _suggestion_index is None:
+                _suggestion_index = SuggestionEmbeddingIndex()
+
+    return _suggestion_index
@@ -47,6 +47,23 @@ def generate_trending_suggestions(days=7, min_count=3):
         raise
 
 
+@shared_task
+def embed_query_suggestions(suggestion_ids=None):
+    """
+    Compute embeddings for query suggestions that do not have one yet.
+    
+    Args:
+        suggestion_ids: Optional list of suggestion IDs to embed (all missing if omitted)
+    """
+    try:
+        embedded = QuerySuggestionService.embed_suggestions(suggestion_ids)
+        logger.info(f"Embedded {embedded} query suggestions")
+        return embedded
+    except Exception as e:
+        logger.error(f"Error embedding query suggestions: {str(e)}")
+        raise
+
+
 @shared_task
 def cleanup_old_suggestions(days=90):
     """
@@ -0,0 +1,193 @@
+"""
+Deferred usage counters for the search query path.
+
+`SearchService.enhanced_search` used to bump the ranking profile and saved
+search usage counts and record the query as a suggestion before running the
+search. Those increments are now coalesced in memory and written by a
+background thread: one UPDATE per distinct increment for profiles and
+queries, one per saved search, and a get_or_create only for suggestions
+seen for the first time. The SearchAnalytics row itself goes through the
+analytics write buffer.
+"""
+
+import atexit
+import logging
+import threading
+from collections import Counter
+from typing import Dict
+
+from django.conf import settings
+from django.utils import timezone
+
+from ..analytics.buffer import BackgroundFlusher
+
+logger = logging.getLogger(__name__)
+
+
+def _group_by_count(counts: Counter) -> Dict[int, list]:
+    """Keys grouped by their increment, so each group is one UPDATE."""
+    groups: Dict[int, list] = {}
+    for key, count in counts.items():
+        groups.setdefault(count, []).append(key)
+    return groups
+
+
+class SearchUsageBuffer:
+    """
+    Coalesces search usage increments and flushes them in bulk.
+    """
+
+    def __init__(self, flush_interval: float = None):
+        self.flush_interval = (
+            flush_interval if flush_interval is not None
+            else getattr(settings, 'SEARCH_USAGE_FLUSH_SECONDS', 2)
+        )
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._reset()
+        self._flusher = BackgroundFlusher(self.flush, self.flush_interval, "search-usage-flusher")
+
+        self.flushes = 0
+        self.failed = 0
+
+    def _reset(self) -> None:
+        self._profile_uses = Counter()
+        self._saved_search_uses = Counter()
+        self._saved_search_last_used = {}
+        self._query_counts = Counter()
+        self._query_doc_types = {}
+
+    def add_profile_use(self, profile_id) -> None:
+        with self._lock:
+            self._profile_uses[profile_id] += 1
+        self._flusher.ensure_running()
+
+    def add_saved_search_use(self, saved_search_id) -> None:
+        with self._lock:
+            self._saved_search_uses[saved_search_id] += 1
+            self._saved_search_last_used[saved_search_id] = timezone.now()
+        self._flusher.ensure_running()
+
+    def add_query(self, query_text: str, doc_type: str = None) -> None:
+        query_text = query_text.strip()
+        if not query_text:
+            return
+        with self._lock:
+            self._query_counts[query_text] += 1
+            self._query_doc_types.setdefault(query_text, doc_type or "")
+        self._flusher.ensure_running()
+
+    def flush(self) -> int:
+        """
+        Write all pending increments.
+
+        Returns:
+            int: Number of distinct profiles, saved searches and queries written
+        """
+        from .models import SavedSearch, SearchRankingProfile
+        from .services import QuerySuggestionService
+        from django.db.models import F
+
+        with self._flush_lock:
+            with self._lock:
+                profile_uses = self._profile_uses
+                saved_search_uses = self._saved_search_uses
+                saved_search_last_used = self._saved_search_last_used
+                query_counts = self._query_counts
+                query_doc_types = self._query_doc_types
+                self._reset()
+
+            written = 0
+            now = timezone.now()
+
+            try:
+                for count, profile_ids in _group_by_count(profile_uses).items():
+                    SearchRankingProfile.objects.filter(id__in=profile_ids).update(
+                        usage_count=F('usage_count') + count, updated_at=now
+                    )
+                written += len(profile_uses)
+            except Exception as e:
+                self.failed += len(profile_uses)
+                logger.error(f"Error writing ranking profile usage counts: {e}")
+
+            try:
+                # Few distinct saved searches per interval, each with its own last_used
+                for saved_search_id, count in saved_search_uses.items():
+                    SavedSearch.objects.filter(id=saved_search_id).update(
+                        usage_count=F('usage_count') + count,
+                        last_used=saved_search_last_used[saved_search_id]
+                    )
+                written += len(saved_search_uses)
+            except Exception as e:
+                self.failed += len(saved_search_uses)
+                logger.error(f"Error writing saved search usage counts: {e}")
+
+            try:
+                written += QuerySuggestionService.record_query_counts(query_counts, query_doc_types)
+            except Exception as e:
+                self.failed += len(query_counts)
+                logger.error(f"Error recording {len(query_counts)} buffered queries: {e}")
+
+            if written:
+                self.flushes += 1
+            return written
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Get buffer counters.
+
+        Returns:
+            dict: Pending keys per counter and flush/failure counts
+        """
+        with self._lock:
+            return {
+                'profiles': len(self._profile_uses),
+                'saved_searches': len(self._saved_search_uses),
+                'queries': len(self._query_counts),
+                'flushes': self.flushes,
+                'failed': self.failed,
+            }
+
+
+_search_usage_buffer = None
+_search_usage_buffer_lock = threading.Lock()
+
+
+def get_search_usage_buffer() -> SearchUsageBuffer:
+    """
+    Get the process-wide search usage buffer.
+
+    Returns:
+        SearchUsageBuffer: Shared buffer instance
+    """
+    global _search_usage_buffer
+
+    if _search_usage_buffer is None:
+        with _search_usage_buffer_lock:
+            if _search_usage_buffer is None:
+                _search_usage_buffer = SearchUsageBuffer()
+                atexit.register(_search_usage_buffer.flush)
+
+    return _search_usage_buffer
+
+
+def search_usage_deferred() -> bool:
+    """Whether search usage counters are written in the background."""
+    return getattr(settings, 'SEARCH_DEFERRED_USAGE', True)
+
+
+def record_saved_search_use(saved_search) -> None:
+    """
+    Count a use of a saved search, in the background when deferred usage
+    writes are on.
+
+    Args:
+        saved_search: SavedSearch instance
+    """
+    if search_usage_deferred():
+        get_search_usage_buffer().add_saved_search_use(saved_search.id)
+        return
+
+    saved_search.usage_count += 1
+    saved_search.last_used = timezone.now()
+    saved_search.save(update_fields=['usage_count', 'last_used'])
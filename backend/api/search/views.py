@@ -8,6 +8,7 @@ from datetime import timedelta
 
 from .models import QuerySuggestion, QueryCompletion, SearchRankingProfile, SearchAnalytics
 from .services import QuerySuggestionService, SearchService
+from .usage_buffer import record_saved_search_use
 from .serializers import (
     QuerySuggestionSerializer, QueryCompletionSerializer,
     SearchRankingProfileSerializer, SearchAnalyticsSerializer
@@ -153,10 +154,6 @@ class EnhancedSearchViewSet(viewsets.ViewSet):
                 saved_search_id=saved_search_id
             )
             
-            # Record that this query was used
-            if query_text:
-                QuerySuggestionService().record_query_usage(query_text, results)
-            
             return Response({
                 'results': DocumentSerializer(results, many=True).data,
                 'metadata': metadata
@@ -258,9 +255,7 @@ class SavedSearchViewSet(viewsets.ModelViewSet):
         saved_search = self.get_object()
         
         # Update usage statistics
-        saved_search.usage_count += 1
-        saved_search.last_used = timezone.now()
-        saved_search.save(update_fields=['usage_count', 'last_used'])
+        record_saved_search_use(saved_search)
         
         # Get parameters from saved search
         query_text = saved_search.query_text
@@ -7,8 +7,9 @@ connection security, verification, and other security-related utilities.
 # Import key components for easy access
 from .pii_detector import PIIDetector, get_detector
 from .middleware import PIIFilterMiddleware
+from .request_context import RequestContextMiddleware, RequestContext, get_request_context
 from .headers import SecurityHeadersMiddleware, SecurityHeadersReporter
-from .connection import ConnectionTimeoutMiddleware, get_or_create_tracker
+from .connection import ConnectionTimeoutMiddleware, get_connection_store, get_or_create_tracker
 from .differential_privacy import protect_embedding, protect_embedding_deterministic, get_embedding_protector
 from .verification import SecurityVerifier, get_verifier
 from .error_handling import (
@@ -3,19 +3,16 @@ Connection security utilities for RNA Lab Navigator.
 This module provides connection timeout, automatic termination, and related security features.
 """
 
+import math
 import time
 import threading
 import logging
-from typing import Dict, Any, Optional, Callable
+from typing import Dict, Any, List, NamedTuple, Optional, Callable, Tuple
 from django.conf import settings
 from django.http import HttpRequest, HttpResponse
 
 logger = logging.getLogger(__name__)
 
-# Connection activity tracker
-connection_trackers = {}
-connection_lock = threading.Lock()
-
 
 class ConnectionTracker:
     """
@@ -68,10 +65,335 @@ class ConnectionTracker:
         }
 
 
+class ConnectionState(NamedTuple):
+    """Result of recording activity for a session."""
+    timed_out: bool  # Session was idle past the timeout; it has been terminated
+    last_activity: float  # Timestamp of the last accepted activity
+    total_requests: int
+    start_time: float
+
+
+class TimerWheel:
+    """
+    Hierarchical timing wheel: O(1) scheduling and amortized O(1) expiry.
+    Level 0 has `slots` buckets of one tick each; each higher level covers
+    `slots` times the span of the one below and is cascaded down as time
+    reaches it. Deadlines past the top level wait in its buckets and are
+    re-placed on each cascade.
+    
+    Rescheduling a key just records its new deadline; entries left in old
+    buckets are recognised as stale and dropped when they come due.
+    """
+    
+    def __init__(self, tick_seconds: float = 1.0, slots: int = 64, levels: int = 3, now: float = None):
+        self.tick_seconds = tick_seconds
+        self.slots = slots
+        self.levels = levels
+        self.current = int((time.time() if now is None else now) / tick_seconds)
+        self.wheels = [[{} for _ in range(slots)] for _ in range(levels)]
+        self._deadlines = {}
+    
+    def __len__(self) -> int:
+        return len(self._deadlines)
+    
+    def _place(self, key, tick: int) -> None:
+        delta = tick - self.current
+        for level in range(self.levels):
+            span = self.slots ** (level + 1)
+            if delta < span or level == self.levels - 1:
+                slot = (tick // self.slots ** level) % self.slots
+                self.wheels[level][slot][key] = tick
+                return
+    
+    def schedule(self, key, deadline: float) -> None:
+        """
+        Schedule (or reschedule) a key to expire at a timestamp.
+        
+        Args:
+            key: Hashable key
+            deadline (float): Expiry time in seconds
+        """
+        tick = max(math.ceil(deadline / self.tick_seconds), self.current + 1)
+        self._deadlines[key] = tick
+        self._place(key, tick)
+    
+    def cancel(self, key) -> None:
+        self._deadlines.pop(key, None)
+    
+    def advance(self, now: float) -> List[Any]:
+        """
+        Move the wheel to `now` and collect the keys that came due.
+        
+        Args:
+            now (float): Current time in seconds
+            
+        Returns:
+            list: Expired keys; they are no longer scheduled
+        """
+        target = int(now / self.tick_seconds)
+        expired = []
+        while self.current < target:
+            if not self._deadlines:
+                # Nothing scheduled: jump instead of stepping through empty ticks
+                self.current = target
+                break
+            self.current += 1
+            
+            # Cascade higher levels whose bucket boundary was reached, top first
+            for level in range(self.levels - 1, 0, -1):
+                span = self.slots ** level
+                if self.current % span == 0:
+                    bucket = self.wheels[level][(self.current // span) % self.slots]
+                    entries = list(bucket.items())
+                    bucket.clear()
+                    for key, tick in entries:
+                        if self._deadlines.get(key) == tick:
+                            self._place(key, tick)
+            
+            bucket = self.wheels[0][self.current % self.slots]
+            if bucket:
+                entries = list(bucket.items())
+                bucket.clear()
+                for key, tick in entries:
+                    if self._deadlines.get(key) != tick:
+                        continue  # Rescheduled or cancelled
+                    if tick <= self.current:
+                        del self._deadlines[key]
+                        expired.append(key)
+                    else:
+                        self._place(key, tick)
+        return expired
+
+
+class _ConnectionShard:
+    """One lock, its trackers and their expiry wheel."""
+    
+    __slots__ = ('lock', 'trackers', 'wheel')
+    
+    def __init__(self, wheel: TimerWheel):
+        self.lock = threading.Lock()
+        self.trackers: Dict[str, ConnectionTracker] = {}
+        self.wheel = wheel
+
+
+class LocalConnectionStore:
+    """
+    In-process connection tracking with sharded locks. Each shard expires its
+    sessions from a timer wheel, advanced a little on every request, so there
+    is no periodic sweep over all sessions under one lock.
+    
+    Expired sessions are kept as terminated trackers for
+    `expired_retention_seconds`, so a session that comes back after its
+    timeout is still rejected once, whenever the wheel ran.
+    """
+    
+    def __init__(self, timeout_seconds: int = 1800, shards: int = 16,
+                 expired_retention_seconds: int = 86400):
+        self.timeout_seconds = timeout_seconds
+        self.expired_retention_seconds = expired_retention_seconds
+        now = time.time()
+        self.shards = [_ConnectionShard(TimerWheel(now=now)) for _ in range(max(1, shards))]
+    
+    def _shard(self, session_id: str) -> _ConnectionShard:
+        return self.shards[hash(session_id) % len(self.shards)]
+    
+    def _expire(self, shard: _ConnectionShard, now: float) -> int:
+        """Process due wheel entries of a shard; caller holds its lock."""
+        terminated = 0
+        for session_id in shard.wheel.advance(now):
+            tracker = shard.trackers.get(session_id)
+            if tracker is None:
+                continue
+            if tracker.is_active:
+                # Activity only moves last_activity; the real deadline is checked here
+                deadline = tracker.last_activity + tracker.timeout_seconds
+                if now < deadline:
+                    shard.wheel.schedule(session_id, deadline)
+                    continue
+                tracker.terminate()
+                terminated += 1
+            purge_at = tracker.last_activity + tracker.timeout_seconds + self.expired_retention_seconds
+            if now < purge_at:
+                shard.wheel.schedule(session_id, purge_at)
+            else:
+                del shard.trackers[session_id]
+        return terminated
+    
+    def _new_tracker(self, shard: _ConnectionShard, session_id: str) -> ConnectionTracker:
+        tracker = ConnectionTracker(session_id, timeout_seconds=self.timeout_seconds)
+        shard.trackers[session_id] = tracker
+        shard.wheel.schedule(session_id, tracker.last_activity + tracker.timeout_seconds)
+        return tracker
+    
+    def get_or_create(self, session_id: str) -> ConnectionTracker:
+        shard = self._shard(session_id)
+        with shard.lock:
+            tracker = shard.trackers.get(session_id)
+            if tracker is None or not tracker.is_active:
+                tracker = self._new_tracker(shard, session_id)
+            return tracker
+    
+    def touch(self, session_id: str) -> ConnectionState:
+        shard = self._shard(session_id)
+        now = time.time()
+        with shard.lock:
+            tracker = shard.trackers.get(session_id)
+            if tracker is not None and tracker.check_timeout():
+                if tracker.is_active:
+                    tracker.terminate()
+                del shard.trackers[session_id]
+                shard.wheel.cancel(session_id)
+                return ConnectionState(True, tracker.last_activity, tracker.total_requests, tracker.start_time)
+            
+            self._expire(shard, now)
+            if tracker is None:
+                tracker = self._new_tracker(shard, session_id)
+            tracker.update_activity()
+            return ConnectionState(False, tracker.last_activity, tracker.total_requests, tracker.start_time)
+    
+    def cleanup(self) -> Tuple[int, int]:
+        """
+        Expire due sessions shard by shard.
+        
+        Returns:
+            Tuple of (terminated, active)
+        """
+        terminated = 0
+        active = 0
+        for shard in self.shards:
+            with shard.lock:
+                terminated += self._expire(shard, time.time())
+                active += sum(1 for tracker in shard.trackers.values() if tracker.is_active)
+        return terminated, active
+
+
+# KEYS[1]: sorted set of session -> last activity, KEYS[2]: the session's stats hash
+# ARGV: session id, timeout seconds, stats TTL seconds
+# Returns: {timed_out, last_activity, total_requests, start_time}
+_TOUCH_SCRIPT = """
+if redis.replicate_commands then redis.replicate_commands() end
+
+local clock = redis.call('TIME')
+local now = string.format('%.6f', tonumber(clock[1]) + tonumber(clock[2]) / 1000000)
+
+local last = redis.call('ZSCORE', KEYS[1], ARGV[1])
+if last and tonumber(now) - tonumber(last) > tonumber(ARGV[2]) then
+    local stats = redis.call('HMGET', KEYS[2], 'requests', 'started')
+    redis.call('ZREM', KEYS[1], ARGV[1])
+    redis.call('DEL', KEYS[2])
+    return {1, last, stats[1] or '0', stats[2] or last}
+end
+
+redis.call('ZADD', KEYS[1], now, ARGV[1])
+redis.call('HSETNX', KEYS[2], 'started', now)
+local requests = redis.call('HINCRBY', KEYS[2], 'requests', 1)
+redis.call('EXPIRE', KEYS[2], ARGV[3])
+return {0, now, tostring(requests), redis.call('HGET', KEYS[2], 'started')}
+"""
+
+
+class RedisConnectionStore:
+    """
+    Connection tracking shared by all workers. Last activity lives in one
+    sorted set, so a timeout is judged the same way whichever worker serves
+    the request; touching a session is one script call, and cleanup is a
+    ranged ZREMRANGEBYSCORE rather than a sweep.
+    """
+    
+    # One hash tag keeps the set and the stats hashes in one cluster slot
+    KEY_PREFIX = "conn:{tracker}"
+    
+    def __init__(self, timeout_seconds: int = 1800, expired_retention_seconds: int = 86400, client=None):
+        if client is None:
+            # Same pooled client as the rate limiter
+            from .rate_limit_engine import get_redis_client
+            client = get_redis_client()
+        
+        self.timeout_seconds = timeout_seconds
+        self.expired_retention_seconds = expired_retention_seconds
+        self.client = client
+        self.activity_key = f"{self.KEY_PREFIX}:activity"
+        self.script = self.client.register_script(_TOUCH_SCRIPT)
+    
+    def _stats_key(self, session_id: str) -> str:
+        return f"{self.KEY_PREFIX}:session:{session_id}"
+    
+    def get_or_create(self, session_id: str) -> ConnectionTracker:
+        """Snapshot of a session as a ConnectionTracker (activity is not recorded)."""
+        tracker = ConnectionTracker(session_id, timeout_seconds=self.timeout_seconds)
+        last = self.client.zscore(self.activity_key, session_id)
+        if last is not None:
+            started, requests = self.client.hmget(self._stats_key(session_id), 'started', 'requests')
+            tracker.last_activity = float(last)
+            tracker.start_time = float(started) if started else float(last)
+            tracker.total_requests = int(requests or 0)
+        return tracker
+    
+    def touch(self, session_id: str) -> ConnectionState:
+        timed_out, last_activity, total_requests, start_time = self.script(
+            keys=[self.activity_key, self._stats_key(session_id)],
+            args=[session_id, self.timeout_seconds, self.timeout_seconds + self.expired_retention_seconds],
+        )
+        state = ConnectionState(bool(int(timed_out)), float(last_activity), int(total_requests), float(start_time))
+        if state.timed_out:
+            logger.info(f"Terminated connection for session {session_id} "
+                        f"after {state.total_requests} requests and "
+                        f"{state.last_activity - state.start_time:.1f} seconds")
+        return state
+    
+    def cleanup(self) -> Tuple[int, int]:
+        """
+        Forget sessions idle past the timeout plus the retention period.
+        
+        Returns:
+            Tuple of (removed, active)
+        """
+        now = time.time()
+        removed = self.client.zremrangebyscore(
+            self.activity_key, '-inf', f"({now - self.timeout_seconds - self.expired_retention_seconds}"
+        )
+        active = self.client.zcount(self.activity_key, now - self.timeout_seconds, '+inf')
+        return removed, active
+
+
+_connection_store = None
+_connection_store_lock = threading.Lock()
+
+
+def get_connection_store():
+    """
+    Get the process-wide connection store selected by
+    settings.CONNECTION_TRACKING_BACKEND ('local' or 'redis').
+    
+    Returns:
+        LocalConnectionStore or RedisConnectionStore
+    """
+    global _connection_store
+    
+    if _connection_store is None:
+        with _connection_store_lock:
+            if _connection_store is None:
+                timeout_seconds = getattr(settings, 'CONNECTION_TIMEOUT_SECONDS', 1800)
+                retention = getattr(settings, 'CONNECTION_EXPIRED_RETENTION_SECONDS', 86400)
+                backend = getattr(settings, 'CONNECTION_TRACKING_BACKEND', 'local')
+                if backend == 'redis':
+                    _connection_store = RedisConnectionStore(timeout_seconds, retention)
+                elif backend == 'local':
+                    _connection_store = LocalConnectionStore(
+                        timeout_seconds,
+                        shards=getattr(settings, 'CONNECTION_TRACKER_SHARDS', 16),
+                        expired_retention_seconds=retention,
+                    )
+                else:
+                    raise ValueError(f"Unknown connection tracking backend: {backend}")
+    
+    return _connection_store
+
+
 def get_or_create_tracker(session_id: str) -> ConnectionTracker:
     """
     Get or create a connection tracker for the given session ID.
-    Thread-safe with locking.
+    Only the session's shard is locked.
     
     Args:
         session_id: Session ID
@@ -79,49 +401,18 @@ def get_or_create_tracker(session_id: str) -> ConnectionTracker:
     Returns:
         ConnectionTracker: Tracker for the session
     """
-    with connection_lock:
-        if session_id in connection_trackers:
-            tracker = connection_trackers[session_id]
-            
-            # If terminated, create a new one
-            if not tracker.is_active:
-                tracker = ConnectionTracker(
-                    session_id,
-                    timeout_seconds=getattr(settings, 'CONNECTION_TIMEOUT_SECONDS', 1800)
-                )
-                connection_trackers[session_id] = tracker
-                
-            return tracker
-        else:
-            # Create new tracker
-            tracker = ConnectionTracker(
-                session_id,
-                timeout_seconds=getattr(settings, 'CONNECTION_TIMEOUT_SECONDS', 1800)
-            )
-            connection_trackers[session_id] = tracker
-            return tracker
+    return get_connection_store().get_or_create(session_id)
 
 
 def cleanup_connections():
     """
     Cleanup expired connections.
-    Should be called periodically by a background task.
+    Expiry also happens incrementally on requests; this catches sessions in
+    shards that have seen no traffic.
     """
-    with connection_lock:
-        current_time = time.time()
-        expired_sessions = []
-        
-        for session_id, tracker in connection_trackers.items():
-            if tracker.check_timeout():
-                tracker.terminate()
-                expired_sessions.append(session_id)
-                
-        # Remove terminated trackers
-        for session_id in expired_sessions:
-            del connection_trackers[session_id]
-            
-        logger.info(f"Cleaned up {len(expired_sessions)} expired connections. "
-                   f"Active connections: {len(connection_trackers)}")
+    expired, active = get_connection_store().cleanup()
+    logger.info(f"Cleaned up {expired} expired connections. "
+                f"Active connections: {active}")
 
 
 def start_cleanup_thread(interval_seconds: int = 300):
@@ -167,13 +458,11 @@ class ConnectionTimeoutMiddleware:
             # No session, proceed without tracking
             return self.get_response(request)
             
-        # Get tracker
-        tracker = get_or_create_tracker(session_id)
+        # Record activity; timed-out sessions are terminated by the store
+        state = get_connection_store().touch(session_id)
         
         # Check if connection has timed out
-        if tracker.check_timeout():
-            tracker.terminate()
-            
+        if state.timed_out:
             # Clear session and return timeout response
             request.session.flush()
             
@@ -183,15 +472,12 @@ class ConnectionTimeoutMiddleware:
                 "detail": "Your session has expired due to inactivity."
             }, status=401)
             
-        # Update activity
-        tracker.update_activity()
-        
         # Process request
         response = self.get_response(request)
         
         # Add timeout header
         timeout_seconds = getattr(settings, 'CONNECTION_TIMEOUT_SECONDS', 1800)
-        remaining = int(timeout_seconds - (time.time() - tracker.last_activity))
+        remaining = int(timeout_seconds - (time.time() - state.last_activity))
         response['X-Session-Timeout-In'] = str(remaining)
         
         return response
\ No newline at end of file
@@ -13,10 +13,14 @@ from django.http import HttpRequest, HttpResponse, JsonResponse, FileResponse
 from django.conf import settings
 from PIL import Image
 
-from .pii_detector import get_detector
+from .pii_detector import HIGH_RISK_PII_COUNT, get_detector
+from .request_context import get_request_context, get_route_classifier, replace_request_context
 
 logger = logging.getLogger(__name__)
 
+# Bytes read per chunk when streaming uploaded files through the PII scanner
+PII_SCAN_CHUNK_SIZE = 64 * 1024
+
 
 class PIIFilterMiddleware:
     """
@@ -47,17 +51,21 @@ class PIIFilterMiddleware:
             '/api/feedback/'
         ]
         
+        classifier = get_route_classifier()
+        classifier.register('pii_scan', self.paths_to_scan)
+        classifier.register('pii_excluded', self.excluded_paths)
+        
         logger.info(f"PII Filter Middleware initialized - scan_requests: {self.scan_requests}, "
                     f"scan_responses: {self.scan_responses}, auto_redact: {self.auto_redact}")
     
     def __call__(self, request):
         # Skip middleware for excluded paths
-        for excluded in self.excluded_paths:
-            if request.path.startswith(excluded):
-                return self.get_response(request)
+        context = get_request_context(request)
+        if context.has_route('pii_excluded'):
+            return self.get_response(request)
         
         # Flag to indicate if we need to scan this request
-        should_scan = any(request.path.startswith(path) for path in self.paths_to_scan)
+        should_scan = context.has_route('pii_scan')
         
         # Scan request body for PII if enabled
         if self.scan_requests and should_scan and request.method in ['POST', 'PUT', 'PATCH']:
@@ -66,9 +74,12 @@ class PIIFilterMiddleware:
                 request._body_original = request.body
                 
                 # Handle JSON request bodies
-                if request.content_type == 'application/json':
-                    # Parse JSON and scan for PII
-                    body_dict = json.loads(request.body)
+                if context.content_type == 'application/json':
+                    if context.json_error:
+                        raise ValueError("Request body is not valid JSON")
+                    
+                    # Scan the body parsed once by RequestContextMiddleware
+                    body_dict = context.json_body
                     scan_result = self._scan_json_data(body_dict)
                     
                     # Handle detected PII
@@ -93,6 +104,7 @@ class PIIFilterMiddleware:
                                 # Replace request body with redacted version
                                 redacted_body = self._redact_json_data(body_dict)
                                 request._body = json.dumps(redacted_body).encode('utf-8')
+                                replace_request_context(request, json_body=redacted_body)
                                 
                                 # Add header to indicate redaction
                                 request.META['HTTP_X_PII_REDACTED'] = 'true'
@@ -121,14 +133,15 @@ class PIIFilterMiddleware:
                             logger.warning(f"File too large to scan for PII: {file_obj.name} ({file_obj.size} bytes)")
                             continue
                             
-                        # Read file content for scanning
-                        file_content = file_obj.read()
-                        file_obj.seek(0)  # Reset file pointer
-                        
-                        # Try to decode as text
+                        # Scan the file in overlapping windows instead of reading it whole;
+                        # stop as soon as it is known to be high risk
                         try:
-                            text_content = file_content.decode('utf-8')
-                            scan_result = self.detector.scan_document(text_content)
+                            scan_result = self.detector.scan_stream(
+                                file_obj.chunks(chunk_size=PII_SCAN_CHUNK_SIZE),
+                                stop_after=HIGH_RISK_PII_COUNT + 1,
+                            )
+                            logger.debug(f"PII scan of {file_obj.name}: {scan_result['bytes_scanned']} bytes "
+                                         f"at {scan_result['throughput_mb_s']:.1f} MB/s")
                             
                             if scan_result['has_pii'] and scan_result['risk_level'] == 'high':
                                 # Block high-risk uploads
@@ -145,6 +158,8 @@ class PIIFilterMiddleware:
                         except UnicodeDecodeError:
                             # Not a text file, skip PII scanning
                             pass
+                        finally:
+                            file_obj.seek(0)  # Reset file pointer
                             
                     return response
             
@@ -5,8 +5,10 @@ This is a mock version for demonstration purposes.
 
 import re
 import os
+import time
+import codecs
 import logging
-from typing import Dict, List, Tuple, Set, Optional, Any
+from typing import Dict, Iterable, List, Tuple, Set, Optional, Any
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -27,6 +29,101 @@ PII_PATTERNS = {
     "IP_ADDRESS": r'\b\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}\b',
 }
 
+# All entity types as one alternation of named groups, so text is scanned
+# once; at a given position earlier entries in PII_PATTERNS take precedence
+COMBINED_PII_PATTERN = re.compile(
+    '|'.join(f'(?P<{entity_type}>{pattern})' for entity_type, pattern in PII_PATTERNS.items())
+)
+
+# Every match of the PII patterns lies inside a candidate region: a run of
+# email characters around an '@', or a run of digits and phone punctuation
+# starting with a digit, '(' or '+'. Only these regions are run through
+# COMBINED_PII_PATTERN, so prose without digits or '@' costs a couple of C-level
+# scans. Keep these in step with PII_PATTERNS; entity types without a region
+# finder switch the prefilter off.
+_EMAIL_CHARS = frozenset('ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789._%+|@-')
+_EMAIL_TAIL_RE = re.compile(r'[A-Za-z0-9._%+|@-]*')
+_NUMERIC_RUN_RE = re.compile(r'[\d(+][\d\s().+-]*')
+# Shortest possible phone (10 digits) or IP address ("1.1.1.1") match
+_MIN_NUMERIC_MATCH = 7
+
+
+def _email_regions(text: str, pos: int, endpos: int) -> List[Tuple[int, int]]:
+    """Runs of email characters containing an '@'."""
+    regions = []
+    at = text.find('@', pos, endpos)
+    while at != -1:
+        start = at
+        while start > pos and text[start - 1] in _EMAIL_CHARS:
+            start -= 1
+        end = _EMAIL_TAIL_RE.match(text, at + 1, endpos).end()
+        regions.append((start, end))
+        at = text.find('@', end, endpos)
+    return regions
+
+
+def _numeric_regions(text: str, pos: int, endpos: int) -> List[Tuple[int, int]]:
+    """Runs of digits and phone punctuation long enough to hold a phone number or IP."""
+    return [
+        match.span() for match in _NUMERIC_RUN_RE.finditer(text, pos, endpos)
+        if match.end() - match.start() >= _MIN_NUMERIC_MATCH
+    ]
+
+
+PII_REGION_FINDERS = {
+    "EMAIL": _email_regions,
+    "PHONE": _numeric_regions,
+    "IP_ADDRESS": _numeric_regions,
+}
+
+
+def iter_pii_matches(text: str, pos: int = 0, endpos: Optional[int] = None):
+    """
+    Yield COMBINED_PII_PATTERN matches in `text[pos:endpos]`, in order.
+    Gives the same matches as `COMBINED_PII_PATTERN.finditer(text, pos, endpos)`
+    but only runs the pattern over candidate regions.
+    
+    Args:
+        text: Text to scan
+        pos: Scan start; earlier characters are only used as \b context
+        endpos: Scan end (default: end of text)
+        
+    Yields:
+        re.Match: PII matches; `match.lastgroup` is the entity type
+    """
+    if endpos is None:
+        endpos = len(text)
+    
+    finders = {PII_REGION_FINDERS.get(entity_type) for entity_type in PII_PATTERNS}
+    if None in finders:
+        yield from COMBINED_PII_PATTERN.finditer(text, pos, endpos)
+        return
+    
+    regions = sorted(region for finder in finders for region in finder(text, pos, endpos))
+    merged_start = merged_end = None
+    for start, end in regions:
+        if merged_end is not None and start <= merged_end:
+            merged_end = max(merged_end, end)
+            continue
+        if merged_end is not None:
+            # One character past the region lets trailing \b see the real text
+            yield from COMBINED_PII_PATTERN.finditer(text, merged_start, min(merged_end + 1, endpos))
+        merged_start, merged_end = start, end
+    if merged_end is not None:
+        yield from COMBINED_PII_PATTERN.finditer(text, merged_start, min(merged_end + 1, endpos))
+
+
+# Documents with more entities than this are high risk
+HIGH_RISK_PII_COUNT = 10
+
+# Streaming scan defaults: characters per window, and characters kept from the
+# end of each window so matches cut at the boundary are rescanned whole (PII
+# matches longer than the overlap can be missed)
+STREAM_WINDOW_CHARS = 256 * 1024
+STREAM_OVERLAP_CHARS = 1024
+# Characters kept before a window so \b sees the preceding text
+STREAM_CONTEXT_CHARS = 8
+
 class PIIDetector:
     """
     Simplified class for detecting and redacting PII from text.
@@ -46,7 +143,8 @@ class PIIDetector:
     
     def detect_pii(self, text: str) -> List[Dict[str, Any]]:
         """
-        Detect PII in text using regex patterns.
+        Detect PII in text with one scan of the combined entity pattern
+        over the candidate regions.
         
         Args:
             text: Text to analyze
@@ -54,24 +152,22 @@ class PIIDetector:
         Returns:
             List of PII entities with text, position, and type
         """
-        pii_entities = []
-        
-        # Add regex-based detections
-        for entity_type, pattern in PII_PATTERNS.items():
-            for match in re.finditer(pattern, text):
-                pii_entities.append({
-                    "text": match.group(),
-                    "start": match.start(),
-                    "end": match.end(),
-                    "type": entity_type,
-                    "method": "regex"
-                })
-        
-        return pii_entities
+        return [
+            {
+                "text": match.group(),
+                "start": match.start(),
+                "end": match.end(),
+                "type": match.lastgroup,
+                "method": "regex"
+            }
+            for match in iter_pii_matches(text)
+        ]
     
     def redact_pii(self, text: str) -> Tuple[str, List[Dict[str, Any]]]:
         """
         Detect and redact PII from text.
+        Matches from the single scan never overlap, so the redacted text is
+        assembled in one join.
         
         Args:
             text: Text to redact
@@ -80,20 +176,18 @@ class PIIDetector:
             Tuple of (redacted_text, list_of_redactions)
         """
         entities = self.detect_pii(text)
-        redacted_text = text
-        
-        # Sort entities by start position in reverse order (to preserve indices)
-        sorted_entities = sorted(entities, key=lambda x: x["start"], reverse=True)
-        
-        for entity in sorted_entities:
-            redaction_label = f"[{entity['type']}]"
-            redacted_text = (
-                redacted_text[:entity["start"]] + 
-                redaction_label + 
-                redacted_text[entity["end"]:]
-            )
-            
-        return redacted_text, entities
+        if not entities:
+            return text, entities
+        
+        parts = []
+        position = 0
+        for entity in entities:
+            parts.append(text[position:entity["start"]])
+            parts.append(f"[{entity['type']}]")
+            position = entity["end"]
+        parts.append(text[position:])
+        
+        return ''.join(parts), entities
     
     def redact_document(self, doc_text: str, metadata: Dict[str, Any] = None) -> Tuple[str, Dict[str, Any]]:
         """
@@ -131,8 +225,18 @@ class PIIDetector:
         Returns:
             Dictionary with scan results
         """
-        entities = self.detect_pii(doc_text)
+        return self._scan_result(self.detect_pii(doc_text))
+    
+    def _scan_result(self, entities: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Summarize detected entities as a scan result.
         
+        Args:
+            entities: Detected PII entities
+            
+        Returns:
+            Dictionary with scan results
+        """
         # Count entities by type
         entity_counts = {}
         for entity in entities:
@@ -141,7 +245,7 @@ class PIIDetector:
             
         # Determine risk level
         risk_level = "low"
-        if len(entities) > 10:
+        if len(entities) > HIGH_RISK_PII_COUNT:
             risk_level = "high"
         elif len(entities) > 0:
             risk_level = "medium"
@@ -153,6 +257,90 @@ class PIIDetector:
             "risk_level": risk_level,
             "entities": entities
         }
+    
+    def scan_stream(self, chunks: Iterable[bytes], encoding: str = 'utf-8',
+                    window_chars: int = STREAM_WINDOW_CHARS,
+                    overlap_chars: int = STREAM_OVERLAP_CHARS,
+                    stop_after: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Scan a byte stream (e.g. `UploadedFile.chunks()`) for PII in
+        overlapping windows, holding at most about one window in memory.
+        Entity offsets are character offsets into the decoded stream and match
+        what `scan_document` reports for the whole text.
+        
+        Args:
+            chunks: Iterable of byte chunks
+            encoding: Text encoding of the stream
+            window_chars: Characters scanned per window
+            overlap_chars: Characters carried into the next window; must exceed
+                the longest expected PII match
+            stop_after: Stop once this many entities are found (None = scan all)
+            
+        Returns:
+            Dictionary with scan results plus bytes_scanned, elapsed_seconds,
+            throughput_mb_s and truncated (True if stopped early)
+            
+        Raises:
+            UnicodeDecodeError: If the stream is not valid in `encoding`
+        """
+        started = time.perf_counter()
+        decoder = codecs.getincrementaldecoder(encoding)()
+        entities = []
+        bytes_scanned = 0
+        truncated = False
+        
+        buffer = ''
+        base = 0  # Absolute character offset of buffer[0]
+        lead = 0  # Context characters before the scan position in buffer
+        
+        def scan_window(final: bool) -> int:
+            # Matches that could still grow past the window end are left for the next window
+            # (a match starting at the scan position is taken as is, so the scan always advances).
+            # The next window resumes no later than `limit`: a match that crosses it may start
+            # after text the regex could not match here because it was cut off at the buffer end.
+            limit = len(buffer) if final else len(buffer) - overlap_chars
+            last_end = lead
+            for match in iter_pii_matches(buffer, lead):
+                if not final and match.end() > limit and match.start() > lead:
+                    return max(last_end, min(match.start(), limit))
+                entities.append({
+                    "text": match.group(),
+                    "start": base + match.start(),
+                    "end": base + match.end(),
+                    "type": match.lastgroup,
+                    "method": "regex"
+                })
+                last_end = match.end()
+            return max(limit, last_end)
+        
+        for chunk in chunks:
+            bytes_scanned += len(chunk)
+            buffer += decoder.decode(chunk)
+            if len(buffer) - lead < window_chars + overlap_chars:
+                continue
+            
+            resume = scan_window(final=False)
+            if stop_after is not None and len(entities) >= stop_after:
+                truncated = True
+                break
+            
+            keep_from = max(0, resume - STREAM_CONTEXT_CHARS)
+            lead = resume - keep_from
+            base += keep_from
+            buffer = buffer[keep_from:]
+        else:
+            buffer += decoder.decode(b'', final=True)
+            scan_window(final=True)
+        
+        elapsed = time.perf_counter() - started
+        result = self._scan_result(entities)
+        result.update({
+            "bytes_scanned": bytes_scanned,
+            "elapsed_seconds": elapsed,
+            "throughput_mb_s": bytes_scanned / (1024 * 1024) / elapsed if elapsed > 0 else 0.0,
+            "truncated": truncated,
+        })
+        return result
 
 
 # Singleton instance for easy access
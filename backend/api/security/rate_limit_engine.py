@@ -0,0 +1,392 @@
+"""
+Atomic rate-limiting engine.
+
+Limits are enforced with GCRA (the generic cell rate algorithm): for a limit
+of N requests per window each request advances a stored "theoretical arrival
+time" (TAT) by window / N, and a request is rejected when the TAT would run
+more than one window ahead of now. This is a token bucket of capacity N that
+refills at N / window, stored as a single number per client and scope.
+
+With the Redis backend the block check, the GCRA update and the optional
+block are one Lua script, so a decision costs one round trip and concurrent
+gunicorn workers can never lose updates. The script uses the Redis clock, so
+worker clock skew does not matter either.
+
+An optional in-process pre-check keeps a local copy of each bucket, debited
+only for requests Redis has allowed. Because this process sees a subset of
+the allowed requests, an empty local bucket means the shared bucket is empty
+too, and hot clients are rejected without touching Redis. Blocks reported by
+Redis are remembered locally until they expire.
+"""
+
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import NamedTuple, Optional, Tuple
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "ratelimit"
+
+# Decision codes returned by the backends
+ALLOWED = 1
+DENIED = 0
+BLOCKED = -1
+
+# KEYS[1]: GCRA state (theoretical arrival time, microseconds)
+# KEYS[2]: block marker
+# ARGV: limit, window (microseconds), cost, block duration (ms, 0 = never block)
+# Returns: {decision, count, retry_after_ms, reset_after_ms}
+GCRA_SCRIPT = """
+if redis.replicate_commands then redis.replicate_commands() end
+
+local block_ttl = redis.call('PTTL', KEYS[2])
+if block_ttl > 0 then
+    return {-1, 0, block_ttl, block_ttl}
+end
+
+local limit = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local block_ms = tonumber(ARGV[4])
+local interval = window / limit
+
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) * 1000000 + tonumber(clock[2])
+
+local tat = tonumber(redis.call('GET', KEYS[1])) or now
+if tat < now then
+    tat = now
+end
+local new_tat = tat + interval * cost
+local backlog = new_tat - now
+local count = math.ceil(backlog / interval - 1e-6)
+
+if backlog > window + 0.5 then
+    if block_ms > 0 then
+        redis.call('SET', KEYS[2], '1', 'PX', block_ms)
+        return {0, count, block_ms, block_ms}
+    end
+    return {0, count, math.ceil((backlog - window) / 1000), math.ceil((tat - now) / 1000)}
+end
+
+redis.call('SET', KEYS[1], string.format('%.17g', new_tat), 'PX', math.ceil(backlog / 1000) + 1)
+return {1, count, 0, math.ceil(backlog / 1000)}
+"""
+
+
+class RateLimitResult(NamedTuple):
+    """Outcome of one rate-limit check."""
+    allowed: bool
+    count: int  # Requests counted against the limit, including this one
+    retry_after: float  # Seconds until a request would be allowed (0 when allowed)
+    reset_after: float  # Seconds until the bucket is full again
+    blocked: bool = False  # Client is (now) blocked
+    local: bool = False  # Decided by the in-process pre-check
+
+
+_redis_pool = None
+_redis_pool_lock = threading.Lock()
+
+
+def get_redis_client():
+    """
+    Get a Redis client for rate limiting backed by a process-wide pool.
+    Timeouts are short because the middleware fails open.
+
+    Returns:
+        redis.Redis: Pooled Redis client
+    """
+    global _redis_pool
+    import redis
+
+    if _redis_pool is None:
+        with _redis_pool_lock:
+            if _redis_pool is None:
+                _redis_pool = redis.ConnectionPool.from_url(
+                    getattr(settings, 'RATE_LIMIT_REDIS_URL', settings.REDIS_URL),
+                    max_connections=getattr(settings, 'RATE_LIMIT_REDIS_MAX_CONNECTIONS', 50),
+                    socket_timeout=getattr(settings, 'RATE_LIMIT_REDIS_SOCKET_TIMEOUT', 0.5),
+                )
+
+    return redis.Redis(connection_pool=_redis_pool)
+
+
+class RedisRateLimitBackend:
+    """
+    Shared GCRA state in Redis, one EVALSHA per decision.
+    """
+
+    def __init__(self, client=None):
+        self.client = client or get_redis_client()
+        # register_script runs EVALSHA and loads the script on NOSCRIPT
+        self.script = self.client.register_script(GCRA_SCRIPT)
+
+    def hit(self, state_key: str, block_key: str, limit: int, window_us: int,
+            cost: int, block_ms: int) -> Tuple[int, int, int, int]:
+        decision, count, retry_ms, reset_ms = self.script(
+            keys=[state_key, block_key], args=[limit, window_us, cost, block_ms]
+        )
+        return int(decision), int(count), int(retry_ms), int(reset_ms)
+
+    def block(self, block_key: str, block_ms: int) -> None:
+        self.client.set(block_key, 1, px=block_ms)
+
+
+class LocalRateLimitBackend:
+    """
+    The same GCRA decision kept in process memory, for single-process
+    deployments (offline mode) and load-test baselines.
+    """
+
+    def __init__(self, max_keys: int = 100000):
+        self.max_keys = max_keys
+        self._tats = OrderedDict()
+        self._blocks = {}
+        self._lock = threading.Lock()
+
+    def hit(self, state_key: str, block_key: str, limit: int, window_us: int,
+            cost: int, block_ms: int) -> Tuple[int, int, int, int]:
+        now = time.time() * 1e6
+        interval = window_us / limit
+
+        with self._lock:
+            blocked_until = self._blocks.get(block_key)
+            if blocked_until is not None:
+                if blocked_until > now:
+                    block_ttl = math.ceil((blocked_until - now) / 1000)
+                    return BLOCKED, 0, block_ttl, block_ttl
+                del self._blocks[block_key]
+
+            tat = max(self._tats.get(state_key, now), now)
+            new_tat = tat + interval * cost
+            backlog = new_tat - now
+            count = math.ceil(backlog / interval - 1e-6)
+
+            if backlog > window_us + 0.5:
+                if block_ms > 0:
+                    self._blocks[block_key] = now + block_ms * 1000
+                    return DENIED, count, block_ms, block_ms
+                return DENIED, count, math.ceil((backlog - window_us) / 1000), math.ceil((tat - now) / 1000)
+
+            self._tats[state_key] = new_tat
+            self._tats.move_to_end(state_key)
+            while len(self._tats) > self.max_keys:
+                self._tats.popitem(last=False)
+            return ALLOWED, count, 0, math.ceil(backlog / 1000)
+
+    def block(self, block_key: str, block_ms: int) -> None:
+        with self._lock:
+            self._blocks[block_key] = time.time() * 1e6 + block_ms * 1000
+
+
+class LocalTokenBucket:
+    """
+    Per-process token bucket mirroring the shared one. It is debited only for
+    requests the shared limiter allowed, so it never holds fewer tokens than
+    the shared bucket and an empty local bucket is a safe rejection.
+    """
+
+    __slots__ = ('capacity', 'rate', 'tokens', 'updated')
+
+    def __init__(self, capacity: int, window: float):
+        self.capacity = capacity
+        self.rate = capacity / window
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def available(self, cost: int, now: float) -> bool:
+        self._refill(now)
+        return self.tokens >= cost
+
+    def debit(self, cost: int, now: float) -> None:
+        self._refill(now)
+        self.tokens = max(0.0, self.tokens - cost)
+
+    def seconds_until(self, cost: int) -> float:
+        return max(0.0, (cost - self.tokens) / self.rate)
+
+
+class RateLimiter:
+    """
+    Rate limiter over a shared backend with an optional local pre-check.
+    """
+
+    def __init__(self, backend, local_precheck: bool = True, max_local_keys: int = 10000):
+        """
+        Initialize the limiter.
+
+        Args:
+            backend: RedisRateLimitBackend or LocalRateLimitBackend
+            local_precheck (bool): Reject hot clients from in-process state
+            max_local_keys (int): Maximum local buckets kept (LRU)
+        """
+        self.backend = backend
+        self.local_precheck = local_precheck
+        self.max_local_keys = max_local_keys
+        self._buckets = OrderedDict()
+        self._blocked_until = {}
+        self._lock = threading.Lock()
+        self.local_decisions = 0
+        self.backend_decisions = 0
+
+    @staticmethod
+    def state_key(client_id: str, scope: str) -> str:
+        # The hash tag keeps a client's keys in one Redis Cluster slot
+        return f"{KEY_PREFIX}:{{{client_id}}}:{scope}"
+
+    @staticmethod
+    def block_key(client_id: str) -> str:
+        return f"{KEY_PREFIX}:{{{client_id}}}:blocked"
+
+    def _local_bucket(self, key: str, limit: int, window: float) -> LocalTokenBucket:
+        bucket = self._buckets.get(key)
+        if bucket is None or bucket.capacity != limit or bucket.rate != limit / window:
+            bucket = LocalTokenBucket(limit, window)
+            self._buckets[key] = bucket
+            while len(self._buckets) > self.max_local_keys:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+        return bucket
+
+    def _local_check(self, key: str, block_key: str, limit: int, window: float,
+                     cost: int, block_duration: int) -> Optional[RateLimitResult]:
+        now = time.monotonic()
+        with self._lock:
+            blocked_until = self._blocked_until.get(block_key)
+            if blocked_until is not None:
+                if blocked_until > now:
+                    return RateLimitResult(False, 0, blocked_until - now, blocked_until - now,
+                                           blocked=True, local=True)
+                del self._blocked_until[block_key]
+
+            bucket = self._local_bucket(key, limit, window)
+            # With blocking configured the violation must reach the backend to set the block
+            if block_duration <= 0 and not bucket.available(cost, now):
+                wait = bucket.seconds_until(cost)
+                return RateLimitResult(False, limit + cost, wait, window, local=True)
+        return None
+
+    def _local_record(self, key: str, block_key: str, limit: int, window: float,
+                      cost: int, result: RateLimitResult) -> None:
+        now = time.monotonic()
+        with self._lock:
+            if result.blocked:
+                self._blocked_until[block_key] = now + result.retry_after
+                if len(self._blocked_until) > self.max_local_keys:
+                    self._blocked_until = {k: v for k, v in self._blocked_until.items() if v > now}
+            elif result.allowed:
+                self._local_bucket(key, limit, window).debit(cost, now)
+
+    def hit(self, client_id: str, scope: str, limit: int, window: float,
+            cost: int = 1, block_duration: int = 0) -> RateLimitResult:
+        """
+        Count a request against a limit.
+
+        Args:
+            client_id (str): Client identifier
+            scope (str): What is limited, e.g. a normalized path or action name
+            limit (int): Requests allowed per window
+            window (float): Window length in seconds
+            cost (int): Units this request consumes
+            block_duration (int): Seconds to block the client on a violation (0 = no block)
+
+        Returns:
+            RateLimitResult: Decision with count and retry/reset times
+        """
+        if limit <= 0:
+            return RateLimitResult(False, cost, window, window)
+
+        key = self.state_key(client_id, scope)
+        block_key = self.block_key(client_id)
+
+        if self.local_precheck:
+            result = self._local_check(key, block_key, limit, window, cost, block_duration)
+            if result is not None:
+                self.local_decisions += 1
+                return result
+
+        decision, count, retry_ms, reset_ms = self.backend.hit(
+            key, block_key, limit, int(window * 1e6), cost, int(block_duration * 1000)
+        )
+        self.backend_decisions += 1
+        result = RateLimitResult(
+            allowed=decision == ALLOWED,
+            count=count,
+            retry_after=retry_ms / 1000,
+            reset_after=reset_ms / 1000,
+            blocked=decision == BLOCKED or (decision == DENIED and block_duration > 0),
+        )
+
+        if self.local_precheck:
+            self._local_record(key, block_key, limit, window, cost, result)
+        return result
+
+    def block(self, client_id: str, duration: int) -> None:
+        """
+        Block a client for a duration.
+
+        Args:
+            client_id (str): Client identifier
+            duration (int): Duration in seconds
+        """
+        self.backend.block(self.block_key(client_id), int(duration * 1000))
+
+
+_rate_limiter = None
+_rate_limiter_lock = threading.Lock()
+
+
+def create_rate_limiter(backend_name: str = None, local_precheck: bool = None) -> RateLimiter:
+    """
+    Build a rate limiter from settings.
+
+    Args:
+        backend_name (str, optional): 'redis' or 'local' (default: settings.RATE_LIMIT_BACKEND)
+        local_precheck (bool, optional): Default: settings.RATE_LIMIT_LOCAL_PRECHECK
+
+    Returns:
+        RateLimiter: New limiter
+    """
+    backend_name = backend_name or getattr(settings, 'RATE_LIMIT_BACKEND', 'redis')
+    if local_precheck is None:
+        local_precheck = getattr(settings, 'RATE_LIMIT_LOCAL_PRECHECK', True)
+
+    if backend_name == 'redis':
+        backend = RedisRateLimitBackend()
+    elif backend_name == 'local':
+        backend = LocalRateLimitBackend()
+    else:
+        raise ValueError(f"Unknown rate limit backend: {backend_name}")
+
+    return RateLimiter(
+        backend,
+        local_precheck=local_precheck,
+        max_local_keys=getattr(settings, 'RATE_LIMIT_LOCAL_MAX_KEYS', 10000),
+    )
+
+
+def get_rate_limiter() -> RateLimiter:
+    """
+    Get the process-wide rate limiter.
+
+    Returns:
+        RateLimiter: Shared limiter instance
+    """
+    global _rate_limiter
+
+    if _rate_limiter is None:
+        with _rate_limiter_lock:
+            if _rate_limiter is None:
+                _rate_limiter = create_rate_limiter()
+
+    return _rate_limiter
@@ -4,19 +4,24 @@ Implements OWASP API Security recommendation for rate limiting.
 """
 
 import time
+import math
 import re
 import logging
 from typing import Dict, List, Tuple, Any, Optional
 from django.http import HttpRequest, HttpResponse, JsonResponse
 from django.conf import settings
-from django.core.cache import cache
 from django.contrib.auth.models import AnonymousUser
 
 # Import the analytics security collector
 from api.analytics.collectors import SecurityCollector
+from .rate_limit_engine import RateLimitResult, get_rate_limiter
+from .request_context import PrefixTrie, get_request_context, get_route_classifier
 
 logger = logging.getLogger(__name__)
 
+NUMERIC_SEGMENT_RE = re.compile(r'/\d+/')
+TRAILING_NUMERIC_RE = re.compile(r'/\d+$')
+
 
 class RateLimitExceeded(Exception):
     """Exception raised when rate limit is exceeded"""
@@ -26,7 +31,8 @@ class RateLimitExceeded(Exception):
 class RateLimitingMiddleware:
     """
     Middleware that implements rate limiting for API endpoints.
-    Uses Redis cache to track request counts per client.
+    Counts requests per client with the atomic rate-limiting engine
+    (one Redis round trip per request, see rate_limit_engine).
     """
     
     def __init__(self, get_response):
@@ -50,6 +56,19 @@ class RateLimitingMiddleware:
             '/admin/',
         ]
         
+        classifier = get_route_classifier()
+        classifier.register('rate_limited', self.rate_limited_paths)
+        classifier.register('rate_limit_excluded', self.excluded_paths)
+        
+        # Longest-prefix lookup of per-path limits
+        self.default_rate_limit = self._parse_rate_limit(getattr(settings, 'RATE_LIMIT_DEFAULT', '60/minute'))
+        self.rate_limit_rules = PrefixTrie(
+            (rule_path, self._parse_rate_limit(limit))
+            for rule_path, limit in getattr(settings, 'RATE_LIMIT_RULES', {}).items()
+        )
+        
+        self.limiter = get_rate_limiter()
+        
         logger.info(f"Rate Limiting Middleware initialized - enabled: {self.enabled}")
     
     def __call__(self, request):
@@ -61,34 +80,35 @@ class RateLimitingMiddleware:
         if hasattr(request, 'user') and request.user.is_authenticated and request.user.is_superuser:
             return self.get_response(request)
             
-        for excluded in self.excluded_paths:
-            if request.path.startswith(excluded):
-                return self.get_response(request)
+        context = get_request_context(request)
+        if context.has_route('rate_limit_excluded'):
+            return self.get_response(request)
         
         # Check if path should be rate limited
-        should_limit = False
-        
-        for prefix in self.rate_limited_paths:
-            if request.path.startswith(prefix):
-                should_limit = True
-                break
+        should_limit = context.has_route('rate_limited')
         
         if should_limit:
             try:
                 # Get client identifier (IP address, API key, or user ID)
-                client_id = self._get_client_identifier(request)
+                client_id = context.client_id
                 
                 # Check if client is exempt from rate limiting
                 if self._is_client_exempt(client_id):
                     return self.get_response(request)
                 
-                # Check if client is blocked
-                block_key = f"ratelimit:{client_id}:blocked"
-                if cache.get(block_key):
-                    # Log blocked request if analytics enabled
+                # Get rate limit for this path
+                limit, window, period_name = self._get_rate_limit_for_path(request.path)
+                block_duration = getattr(settings, 'RATE_LIMIT_BLOCK_DURATION', 0)
+                
+                # Block check, count and block on violation in one atomic call
+                result = self._increment_request_count(client_id, request.path, limit, window, block_duration)
+                request_count = result.count
+                
+                if result.blocked and request_count == 0:
+                    # Client was already blocked
                     if getattr(settings, 'RATE_LIMIT_ANALYTICS', False):
                         user = request.user if hasattr(request, 'user') and not isinstance(request.user, AnonymousUser) else None
-                        ip = self._get_client_ip(request)
+                        ip = context.client_ip
                         
                         SecurityCollector.record_rate_limit_event(
                             event_level='blocked',
@@ -103,26 +123,18 @@ class RateLimitingMiddleware:
                     return self._build_rate_limit_response(
                         status=429,
                         message="Too many requests. You have been temporarily blocked due to excessive requests.",
-                        retry_after=cache.ttl(block_key) or 300
+                        retry_after=math.ceil(result.retry_after) or 300
                     )
                 
-                # Get rate limit for this path
-                limit, window, period_name = self._get_rate_limit_for_path(request.path)
-                
-                # Check rate limit
-                request_count = self._increment_request_count(client_id, request.path, window)
-                
                 # Check if rate limit exceeded
-                if request_count > limit:
-                    # Block client if configured to do so
-                    block_duration = getattr(settings, 'RATE_LIMIT_BLOCK_DURATION', 0)
-                    if block_duration > 0:
-                        self._block_client(client_id, block_duration)
+                if not result.allowed:
+                    if result.blocked:
+                        logger.warning(f"Client {client_id} blocked for {block_duration} seconds due to rate limit violation")
                     
                     # Log exceeded rate limit if analytics enabled
                     if getattr(settings, 'RATE_LIMIT_ANALYTICS', False):
                         user = request.user if hasattr(request, 'user') and not isinstance(request.user, AnonymousUser) else None
-                        ip = self._get_client_ip(request)
+                        ip = context.client_ip
                         
                         SecurityCollector.record_rate_limit_event(
                             event_level='exceeded',
@@ -142,14 +154,14 @@ class RateLimitingMiddleware:
                         request_count=request_count,
                         limit=limit,
                         period=period_name,
-                        retry_after=window
+                        retry_after=math.ceil(result.retry_after) or 1
                     )
                 
                 # Log warning for approaching rate limit (80% of limit)
                 if request_count > (limit * 0.8):
                     if getattr(settings, 'RATE_LIMIT_ANALYTICS', False):
                         user = request.user if hasattr(request, 'user') and not isinstance(request.user, AnonymousUser) else None
-                        ip = self._get_client_ip(request)
+                        ip = context.client_ip
                         
                         SecurityCollector.record_rate_limit_event(
                             event_level='warning',
@@ -166,7 +178,7 @@ class RateLimitingMiddleware:
                 response = self.get_response(request)
                 
                 # Add rate limit headers to response
-                self._add_rate_limit_headers(response, request_count, limit, window)
+                self._add_rate_limit_headers(response, request_count, limit, math.ceil(result.reset_after) or 1)
                 
                 return response
             except Exception as e:
@@ -188,19 +200,7 @@ class RateLimitingMiddleware:
         Returns:
             String identifier for the client
         """
-        # First try API key (if using token authentication)
-        auth_header = request.META.get('HTTP_AUTHORIZATION', '')
-        if auth_header.startswith('Bearer ') or auth_header.startswith('Token '):
-            token = auth_header.split(' ')[1]
-            return f"token:{token}"
-        
-        # Next try authenticated user
-        if hasattr(request, 'user') and request.user.is_authenticated:
-            return f"user:{request.user.id}"
-        
-        # Finally use IP address
-        ip = self._get_client_ip(request)
-        return f"ip:{ip}"
+        return get_request_context(request).client_id
     
     def _get_client_ip(self, request: HttpRequest) -> str:
         """
@@ -212,13 +212,7 @@ class RateLimitingMiddleware:
         Returns:
             Client IP address
         """
-        x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-        if x_forwarded_for:
-            # Get first IP in case of multiple proxies
-            ip = x_forwarded_for.split(',')[0].strip()
-        else:
-            ip = request.META.get('REMOTE_ADDR', '0.0.0.0')
-        return ip
+        return get_request_context(request).client_ip
     
     def _is_client_exempt(self, client_id: str) -> bool:
         """
@@ -249,6 +243,7 @@ class RateLimitingMiddleware:
     def _get_rate_limit_for_path(self, path: str) -> Tuple[int, int, str]:
         """
         Get the rate limit for a path from settings.
+        The most specific (longest) matching rule prefix wins.
         
         Args:
             path: The request path
@@ -256,29 +251,7 @@ class RateLimitingMiddleware:
         Returns:
             Tuple of (limit, period_seconds, period_name)
         """
-        # Default rate limit
-        default_rate_limit = getattr(settings, 'RATE_LIMIT_DEFAULT', '60/minute')
-        
-        # Get rate limit rules from settings
-        rate_limit_rules = getattr(settings, 'RATE_LIMIT_RULES', {})
-        
-        # Find the most specific matching rule
-        matching_rule = None
-        max_match_length = 0
-        
-        for rule_path, limit in rate_limit_rules.items():
-            # Exact match
-            if path == rule_path:
-                return self._parse_rate_limit(limit)
-            
-            # Prefix match (most specific one wins)
-            if path.startswith(rule_path) and len(rule_path) > max_match_length:
-                matching_rule = limit
-                max_match_length = len(rule_path)
-        
-        # Use matching rule or default
-        rate_limit = matching_rule or default_rate_limit
-        return self._parse_rate_limit(rate_limit)
+        return self.rate_limit_rules.longest_match(path, self.default_rate_limit)
     
     def _parse_rate_limit(self, rate_limit: str) -> Tuple[int, int, str]:
         """
@@ -319,46 +292,26 @@ class RateLimitingMiddleware:
             logger.error(f"Error parsing rate limit '{rate_limit}': {str(e)}")
             return 60, 60, 'minute'  # Default: 60 per minute
     
-    def _increment_request_count(self, client_id: str, path: str, period_seconds: int) -> int:
+    def _increment_request_count(self, client_id: str, path: str, limit: int,
+                                 period_seconds: int, block_duration: int = 0) -> RateLimitResult:
         """
-        Increment the request count for a client and path.
+        Count a request for a client and path with the atomic rate limiter.
         
         Args:
             client_id: Client identifier
             path: Request path
+            limit: Requests allowed per period
             period_seconds: Rate limit period in seconds
+            block_duration: Seconds to block the client on a violation (0 = no block)
             
         Returns:
-            Current request count in the period
+            RateLimitResult with the request count in the period
         """
         # Create a normalized path key (remove numeric IDs from path for grouping similar endpoints)
-        norm_path = re.sub(r'/\d+/', '/:id/', path)
-        norm_path = re.sub(r'/\d+$', '/:id', norm_path)
-        
-        # Create cache keys
-        count_key = f"ratelimit:{client_id}:{norm_path}:count"
-        expires_key = f"ratelimit:{client_id}:{norm_path}:expires"
-        
-        # Get current count and expiration time
-        count = cache.get(count_key, 0)
-        expires = cache.get(expires_key)
+        norm_path = NUMERIC_SEGMENT_RE.sub('/:id/', path)
+        norm_path = TRAILING_NUMERIC_RE.sub('/:id', norm_path)
         
-        current_time = int(time.time())
-        
-        if not expires or current_time > expires:
-            # First request in a new period
-            expires = current_time + period_seconds
-            count = 1
-            
-            # Set cache with expiration
-            cache.set(count_key, count, period_seconds)
-            cache.set(expires_key, expires, period_seconds)
-        else:
-            # Increment the count
-            count += 1
-            cache.set(count_key, count, cache.ttl(count_key))
-        
-        return count
+        return self.limiter.hit(client_id, norm_path, limit, period_seconds, block_duration=block_duration)
     
     def _block_client(self, client_id: str, duration: int = None) -> None:
         """
@@ -371,8 +324,7 @@ class RateLimitingMiddleware:
         if duration is None:
             duration = getattr(settings, 'RATE_LIMIT_BLOCK_DURATION', 300)
         
-        block_key = f"ratelimit:{client_id}:blocked"
-        cache.set(block_key, True, duration)
+        self.limiter.block(client_id, duration)
         
         logger.warning(f"Client {client_id} blocked for {duration} seconds due to rate limit violation")
     
@@ -483,21 +435,7 @@ def check_rate_limit(client_id: str, action: str, limit: int = None, window: int
         else:
             window = 60
     
-    cache_key = f"ratelimit:{client_id}:{action}:count"
-    count = cache.get(cache_key, 0)
-    
-    if count == 0:
-        # First request, set initial count
-        cache.set(cache_key, 1, window)
-        return True
-    
-    # Check if limit exceeded
-    if count >= limit:
-        return False
-    
-    # Increment count
-    cache.incr(cache_key)
-    return True
+    return get_rate_limiter().hit(client_id, f"action:{action}", limit, window).allowed
 
 
 def track_rate_limit(request: HttpRequest, action: str, limit: int = None, window: int = None) -> bool:
@@ -562,7 +500,6 @@ def block_client(client_id: str, duration: int = None) -> None:
     if duration is None:
         duration = getattr(settings, 'RATE_LIMIT_BLOCK_DURATION', 300)
     
-    block_key = f"ratelimit:{client_id}:blocked"
-    cache.set(block_key, True, duration)
+    get_rate_limiter().block(client_id, duration)
     
     logger.warning(f"Client {client_id} blocked for {duration} seconds")
\ No newline at end of file
@@ -0,0 +1,327 @@
+"""
+Shared, parse-once request context for the security and analytics middleware.
+
+RequestContextMiddleware runs early and builds an immutable RequestContext:
+the decoded JSON body, its flattened string leaves, the client IP and client
+identifier, and the route labels for the path. WAF, PII filtering, rate
+limiting and analytics all read it instead of re-reading `request.body`,
+re-running `json.loads`, re-resolving the client IP and looping over path
+prefix lists on every call.
+
+Route labels come from a prefix trie. Middleware registers its path prefixes
+under a label at start-up (`get_route_classifier().register(...)`), and each
+request path is classified with one walk of the trie.
+"""
+
+import json
+import logging
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field, replace
+from typing import Any, Dict, FrozenSet, Iterable, Iterator, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Attribute holding the context on the request
+REQUEST_CONTEXT_ATTR = 'security_context'
+
+JSON_BODY_METHODS = ('POST', 'PUT', 'PATCH')
+
+
+class PrefixTrie:
+    """
+    Character trie mapping path prefixes to values.
+    """
+
+    _VALUE = object()
+
+    def __init__(self, items: Iterable[Tuple[str, Any]] = ()):
+        self._root = {}
+        for prefix, value in items:
+            self.insert(prefix, value)
+
+    def insert(self, prefix: str, value: Any) -> None:
+        node = self._root
+        for char in prefix:
+            node = node.setdefault(char, {})
+        node[self._VALUE] = value
+
+    def iter_matches(self, path: str) -> Iterator[Tuple[str, Any]]:
+        """
+        Yield (prefix, value) for every stored prefix of `path`, shortest first.
+        """
+        node = self._root
+        if self._VALUE in node:
+            yield '', node[self._VALUE]
+        for index, char in enumerate(path):
+            node = node.get(char)
+            if node is None:
+                return
+            if self._VALUE in node:
+                yield path[:index + 1], node[self._VALUE]
+
+    def longest_match(self, path: str, default: Any = None) -> Any:
+        """
+        Value of the longest stored prefix of `path`.
+        """
+        value = default
+        for _, value in self.iter_matches(path):
+            pass
+        return value
+
+
+class RouteClassifier:
+    """
+    Classifies request paths into labels ('waf_excluded', 'rate_limited', ...)
+    from the path prefixes registered for each label.
+    """
+
+    def __init__(self, cache_size: int = 2048):
+        self._prefixes: Dict[str, set] = {}
+        self._trie = None
+        self._lock = threading.Lock()
+        self._cache = OrderedDict()
+        self.cache_size = cache_size
+
+    def register(self, label: str, prefixes: Iterable[str]) -> None:
+        """
+        Register path prefixes for a label.
+
+        Args:
+            label (str): Route label, e.g. 'pii_scan'
+            prefixes: Path prefixes that carry the label
+        """
+        with self._lock:
+            self._prefixes.setdefault(label, set()).update(prefixes)
+            self._trie = None
+            self._cache.clear()
+
+    def _build(self) -> PrefixTrie:
+        labels_by_prefix: Dict[str, set] = {}
+        for label, prefixes in self._prefixes.items():
+            for prefix in prefixes:
+                labels_by_prefix.setdefault(prefix, set()).add(label)
+        return PrefixTrie((prefix, frozenset(labels)) for prefix, labels in labels_by_prefix.items())
+
+    def classify(self, path: str) -> FrozenSet[str]:
+        """
+        Labels whose prefixes match a path.
+
+        Args:
+            path (str): Request path
+
+        Returns:
+            frozenset: Route labels
+        """
+        with self._lock:
+            labels = self._cache.get(path)
+            if labels is not None:
+                self._cache.move_to_end(path)
+                return labels
+            if self._trie is None:
+                self._trie = self._build()
+            trie = self._trie
+
+        labels = frozenset().union(*(value for _, value in trie.iter_matches(path)))
+
+        with self._lock:
+            self._cache[path] = labels
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return labels
+
+
+_route_classifier = None
+_route_classifier_lock = threading.Lock()
+
+
+def get_route_classifier() -> RouteClassifier:
+    """
+    Get the process-wide route classifier.
+
+    Returns:
+        RouteClassifier: Shared classifier instance
+    """
+    global _route_classifier
+
+    if _route_classifier is None:
+        with _route_classifier_lock:
+            if _route_classifier is None:
+                _route_classifier = RouteClassifier()
+
+    return _route_classifier
+
+
+def flatten_strings(data: Any) -> Tuple[str, ...]:
+    """
+    All string leaves of decoded JSON, in document order, without recursion.
+
+    Args:
+        data: Decoded JSON value
+
+    Returns:
+        tuple: String leaves
+    """
+    leaves = []
+    stack = [data]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, str):
+            leaves.append(item)
+        elif isinstance(item, dict):
+            stack.extend(reversed(list(item.values())))
+        elif isinstance(item, list):
+            stack.extend(reversed(item))
+    return tuple(leaves)
+
+
+def get_client_ip(request) -> str:
+    """
+    Client IP address, taking the first X-Forwarded-For entry behind a proxy.
+
+    Args:
+        request: The HTTP request
+
+    Returns:
+        str: Client IP address
+    """
+    x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
+    if x_forwarded_for:
+        return x_forwarded_for.split(',')[0].strip()
+    return request.META.get('REMOTE_ADDR', '0.0.0.0')
+
+
+@dataclass(frozen=True)
+class RequestContext:
+    """
+    Immutable, parse-once view of a request shared by the middleware stack.
+    Use `dataclasses.replace` (see `replace_request_context`) to derive an
+    updated context, e.g. after a body has been redacted.
+    """
+    path: str
+    method: str
+    content_type: str
+    client_ip: str
+    routes: FrozenSet[str]
+    json_body: Any = None
+    json_error: bool = False
+    string_leaves: Tuple[str, ...] = ()
+    # Resolved on first use: forcing request.user costs a session lookup
+    _lazy: Dict[str, Any] = field(default_factory=dict, repr=False, compare=False)
+    _request: Any = field(default=None, repr=False, compare=False)
+
+    @property
+    def has_json_body(self) -> bool:
+        return self.json_body is not None
+
+    def has_route(self, label: str) -> bool:
+        return label in self.routes
+
+    @property
+    def client_id(self) -> str:
+        """
+        Rate-limiting client identifier: API token, then user ID, then IP.
+        """
+        if 'client_id' not in self._lazy:
+            request = self._request
+            auth_header = request.META.get('HTTP_AUTHORIZATION', '') if request is not None else ''
+            if auth_header.startswith('Bearer ') or auth_header.startswith('Token '):
+                client_id = f"token:{auth_header.split(' ')[1]}"
+            elif request is not None and hasattr(request, 'user') and request.user.is_authenticated:
+                client_id = f"user:{request.user.id}"
+            else:
+                client_id = f"ip:{self.client_ip}"
+            self._lazy['client_id'] = client_id
+        return self._lazy['client_id']
+
+
+def build_request_context(request) -> RequestContext:
+    """
+    Parse a request once into a RequestContext.
+    Only JSON bodies of POST/PUT/PATCH requests are read, so uploads are
+    left to Django's streaming multipart parser.
+
+    Args:
+        request: The HTTP request
+
+    Returns:
+        RequestContext: Context for the request
+    """
+    content_type = getattr(request, 'content_type', '') or ''
+    json_body = None
+    json_error = False
+
+    if request.method in JSON_BODY_METHODS and content_type == 'application/json':
+        try:
+            if request.body:
+                json_body = json.loads(request.body.decode('utf-8'))
+        except (ValueError, UnicodeDecodeError):
+            json_error = True
+        except Exception as e:
+            # Body already consumed or too large; consumers fall back to their own handling
+            logger.debug(f"Request body not available for context: {e}")
+            json_error = True
+
+    return RequestContext(
+        path=request.path,
+        method=request.method,
+        content_type=content_type,
+        client_ip=get_client_ip(request),
+        routes=get_route_classifier().classify(request.path),
+        json_body=json_body,
+        json_error=json_error,
+        string_leaves=flatten_strings(json_body) if json_body is not None else (),
+        _request=request,
+    )
+
+
+def get_request_context(request) -> RequestContext:
+    """
+    Get the context for a request, building it if the middleware has not run
+    (e.g. when it is missing from MIDDLEWARE).
+
+    Args:
+        request: The HTTP request
+
+    Returns:
+        RequestContext: Context for the request
+    """
+    context = getattr(request, REQUEST_CONTEXT_ATTR, None)
+    if context is None:
+        context = build_request_context(request)
+        setattr(request, REQUEST_CONTEXT_ATTR, context)
+    return context
+
+
+def replace_request_context(request, **changes) -> RequestContext:
+    """
+    Replace the request's context with an updated copy.
+
+    Args:
+        request: The HTTP request
+        **changes: Fields to change; `string_leaves` is recomputed when
+            `json_body` changes
+
+    Returns:
+        RequestContext: The new context
+    """
+    if 'json_body' in changes and 'string_leaves' not in changes:
+        body = changes['json_body']
+        changes['string_leaves'] = flatten_strings(body) if body is not None else ()
+    context = replace(get_request_context(request), **changes)
+    setattr(request, REQUEST_CONTEXT_ATTR, context)
+    return context
+
+
+class RequestContextMiddleware:
+    """
+    Middleware that builds the shared RequestContext before the security and
+    analytics middleware run.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        setattr(request, REQUEST_CONTEXT_ATTR, build_request_context(request))
+        return self.get_response(request)
@@ -5,8 +5,7 @@ Implements OWASP recommended protections against common web attacks.
 
 import re
 import logging
-import json
-from urllib.parse import parse_qs, urlparse
+from urllib.parse import parse_qs
 
 from django.http import HttpResponse, JsonResponse
 from django.conf import settings
@@ -15,6 +14,8 @@ from django.utils.deprecation import MiddlewareMixin
 from django.core.cache import cache
 
 from api.analytics.collectors import SecurityCollector
+from .waf_engine import WAFEngine, iter_request_strings
+from .request_context import get_request_context, get_route_classifier
 
 logger = logging.getLogger(__name__)
 
@@ -47,6 +48,12 @@ class WAFMiddleware(MiddlewareMixin):
             'sensitive_data': self._compile_sensitive_data_patterns(),
         }
         
+        # Literal prefilter over every pattern, confirmed per pattern in order, with a verdict cache
+        self.engine = WAFEngine(
+            self.patterns,
+            cache_size=getattr(settings, 'WAF_VERDICT_CACHE_SIZE', 4096)
+        )
+        
         # Paths to exclude from WAF checks
         self.excluded_paths = getattr(settings, 'WAF_EXCLUDED_PATHS', [
             '/admin/',  # Admin panel has its own security
@@ -55,6 +62,8 @@ class WAFMiddleware(MiddlewareMixin):
             '/health/',  # Health check doesn't need WAF protection
         ])
         
+        get_route_classifier().register('waf_excluded', self.excluded_paths)
+        
         logger.info(f"WAF Middleware initialized - enabled: {self.enabled}, security level: {self.security_level}")
     
     def _compile_xss_patterns(self):
@@ -279,33 +288,13 @@ class WAFMiddleware(MiddlewareMixin):
         else:  # high
             return common_patterns + medium_patterns + high_patterns
     
-    def _check_attack_vectors(self, request_data, attack_type):
-        """
-        Check request data against attack patterns.
-        
-        Args:
-            request_data: String data to check
-            attack_type: Type of attack patterns to check against
-            
-        Returns:
-            Tuple of (is_attack, matched_pattern)
-        """
-        if not request_data or not isinstance(request_data, str):
-            return False, None
-        
-        for pattern in self.patterns.get(attack_type, []):
-            match = pattern.search(request_data)
-            if match:
-                return True, match.group(0)
-        
-        return False, None
-    
-    def _get_request_data(self, request):
+    def _get_request_data(self, request, context):
         """
         Extract data from request for inspection.
         
         Args:
             request: The HTTP request
+            context: Shared RequestContext for the request
             
         Returns:
             Dictionary of data extracted from the request
@@ -324,23 +313,23 @@ class WAFMiddleware(MiddlewareMixin):
         # Query string
         query_string = request.META.get('QUERY_STRING', '')
         if query_string:
-            parsed_url = urlparse(request.build_absolute_uri())
-            data['query'] = parse_qs(parsed_url.query)
+            data['query'] = parse_qs(query_string)
         
         # POST data (if applicable)
         if request.method == 'POST':
-            if hasattr(request, 'body') and request.body:
-                try:
-                    # Try to parse as JSON
-                    if request.content_type == 'application/json':
-                        body_data = json.loads(request.body.decode('utf-8'))
-                        data['body'] = body_data
-                    else:
-                        # For form data
-                        data['body'] = request.POST.dict()
-                except (ValueError, UnicodeDecodeError):
+            if context.content_type == 'application/json':
+                if context.json_error:
                     # If can't parse as JSON, just use the raw body
                     data['body'] = request.body.decode('utf-8', errors='ignore')
+                else:
+                    # String leaves of the JSON body, parsed once for all middleware
+                    data['body'] = context.string_leaves
+            else:
+                try:
+                    # For form data
+                    data['body'] = request.POST.dict()
+                except ValueError:
+                    data['body'] = request.body.decode('utf-8', errors='ignore')
         
         return data
     
@@ -354,40 +343,9 @@ class WAFMiddleware(MiddlewareMixin):
         Returns:
             Tuple of (is_attack, attack_type, matched_pattern)
         """
-        # Check headers
-        for header, value in request_data.get('headers', {}).items():
-            for attack_type in self.patterns.keys():
-                is_attack, pattern = self._check_attack_vectors(value, attack_type)
-                if is_attack:
-                    return True, attack_type, pattern
-        
-        # Check query parameters
-        for param, values in request_data.get('query', {}).items():
-            for value in values:
-                for attack_type in self.patterns.keys():
-                    is_attack, pattern = self._check_attack_vectors(value, attack_type)
-                    if is_attack:
-                        return True, attack_type, pattern
-        
-        # Check body data
-        body = request_data.get('body')
-        if body:
-            if isinstance(body, dict):
-                # For JSON/form data, check each value
-                for key, value in body.items():
-                    if isinstance(value, str):
-                        for attack_type in self.patterns.keys():
-                            is_attack, pattern = self._check_attack_vectors(value, attack_type)
-                            if is_attack:
-                                return True, attack_type, pattern
-            elif isinstance(body, str):
-                # For raw body data
-                for attack_type in self.patterns.keys():
-                    is_attack, pattern = self._check_attack_vectors(body, attack_type)
-                    if is_attack:
-                        return True, attack_type, pattern
-        
-        return False, None, None
+        # Headers, query values and every string leaf of the body, each
+        # checked against all attack classes in a single prefilter pass
+        return self.engine.scan(iter_request_strings(request_data))
     
     def _is_ip_blocked(self, ip_address):
         """
@@ -469,12 +427,12 @@ class WAFMiddleware(MiddlewareMixin):
                 return None
         
         # Skip WAF checks for excluded paths
-        path = request.path
-        if any(path.startswith(excluded) for excluded in self.excluded_paths):
+        context = get_request_context(request)
+        if context.has_route('waf_excluded'):
             return None
         
         # Extract request data
-        request_data = self._get_request_data(request)
+        request_data = self._get_request_data(request, context)
         
         # Scan request data for attack patterns
         is_attack, attack_type, pattern = self._scan_request_data(request_data)
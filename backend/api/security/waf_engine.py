@@ -0,0 +1,275 @@
+"""
+Prefiltered multi-pattern matcher for the WAF scan path.
+
+For every configured pattern the engine derives, from the parsed regex, a
+small set of literal strings of which at least one must occur in any match
+(e.g. {"select", "insert", ...} for an SQL keyword pattern). Scanning a value
+casefolds it once and runs cheap substring checks; only patterns whose
+literals are present are confirmed with the real regex. Patterns are still
+confirmed in configuration order, so the reported attack type and matched
+text are the same as running every pattern in turn. Verdicts for repeated
+identical values are kept in a small LRU cache.
+"""
+
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, FrozenSet, Iterable, Iterator, List, Optional, Pattern, Tuple
+
+try:
+    from re import _parser as sre_parse, _constants as sre_constants
+except ImportError:  # Python < 3.11
+    import sre_parse
+    import sre_constants
+
+logger = logging.getLogger(__name__)
+
+# Upper bound on alternatives tracked per required-literal set
+_MAX_LITERAL_SET = 16
+
+# re.IGNORECASE matches dotted capital I and dotless i to ASCII i, but casefold()
+# turns U+0130 into 'i' plus a combining dot and keeps U+0131, so map them first
+_FOLD_FIXUPS = str.maketrans({'\u0130': 'i', '\u0131': 'i'})
+
+
+def fold(value: str) -> str:
+    """Casefold a value so every case-insensitive match contains its literals."""
+    return value.translate(_FOLD_FIXUPS).casefold()
+
+
+def _exact_strings(items) -> Optional[FrozenSet[str]]:
+    """Finite set of strings a parsed (sub)pattern matches exactly, if small."""
+    strings = frozenset([''])
+    for op, av in items:
+        element = _exact_item(op, av)
+        if element is None or len(strings) * len(element) > _MAX_LITERAL_SET:
+            return None
+        strings = frozenset(a + b for a in strings for b in element)
+    return strings
+
+
+def _exact_item(op, av) -> Optional[FrozenSet[str]]:
+    if op is sre_constants.LITERAL:
+        return frozenset([chr(av)])
+    if op is sre_constants.IN:
+        if len(av) <= _MAX_LITERAL_SET and all(code is sre_constants.LITERAL for code, _ in av):
+            return frozenset(chr(value) for _, value in av)
+        return None
+    if op is sre_constants.SUBPATTERN:
+        return _exact_strings(av[-1])
+    if op is sre_constants.BRANCH:
+        strings = set()
+        for branch in av[1]:
+            exact = _exact_strings(branch)
+            if exact is None:
+                return None
+            strings |= exact
+        return frozenset(strings) if len(strings) <= _MAX_LITERAL_SET else None
+    return None
+
+
+def _required_item(op, av) -> Optional[FrozenSet[str]]:
+    if op is sre_constants.SUBPATTERN:
+        return _required_strings(av[-1])
+    if op is sre_constants.BRANCH:
+        strings = set()
+        for branch in av[1]:
+            required = _required_strings(branch)
+            if not required:
+                return None
+            strings |= required
+        return frozenset(strings) if len(strings) <= _MAX_LITERAL_SET else None
+    if op in (sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT) and av[0] >= 1:
+        return _required_strings(av[2])
+    return None
+
+
+def _required_strings(items) -> Optional[FrozenSet[str]]:
+    """
+    Strings of which at least one occurs in every match of a parsed pattern.
+    Consecutive exact elements are multiplied out (`etc(/|\\)passwd` gives
+    {"etc/passwd", "etc\\passwd"}); the strongest candidate set is returned.
+    """
+    candidates = []
+    run = frozenset([''])
+    for op, av in items:
+        element = _exact_item(op, av)
+        if element is not None and len(run) * len(element) <= _MAX_LITERAL_SET:
+            run = frozenset(a + b for a in run for b in element)
+            continue
+        if run != frozenset(['']):
+            candidates.append(run)
+        run = element if element is not None else frozenset([''])
+        if element is None:
+            required = _required_item(op, av)
+            if required:
+                candidates.append(required)
+    if run != frozenset(['']):
+        candidates.append(run)
+
+    candidates = [c for c in candidates if '' not in c]
+    if not candidates:
+        return None
+    # Prefer the set whose shortest string is longest, then the smallest set
+    return max(candidates, key=lambda c: (min(len(s) for s in c), -len(c)))
+
+
+def required_literals(pattern: Pattern) -> Optional[Tuple[str, ...]]:
+    """
+    Casefolded literals of which at least one must occur in any match.
+
+    Args:
+        pattern: Compiled regex
+
+    Returns:
+        tuple: Literals, or None if none could be derived (always confirm)
+    """
+    try:
+        parsed = sre_parse.parse(pattern.pattern, pattern.flags)
+        literals = _required_strings(parsed)
+    except Exception as e:
+        logger.debug(f"No literal prefilter for WAF pattern {pattern.pattern!r}: {e}")
+        return None
+    if not literals:
+        return None
+    # Case-insensitive matches casefold to the casefolded literal
+    return tuple(sorted({literal.casefold() for literal in literals}))
+
+
+def iter_request_strings(request_data: Dict[str, Any]) -> Iterator[str]:
+    """
+    Yield every string the WAF inspects: header values, query values and all
+    string leaves of the body, walking nested JSON once without recursion.
+
+    Args:
+        request_data: Dictionary with optional 'headers', 'query' and 'body' keys
+
+    Yields:
+        str: Values to scan, in request order
+    """
+    for value in request_data.get('headers', {}).values():
+        if isinstance(value, str):
+            yield value
+
+    for values in request_data.get('query', {}).values():
+        for value in values:
+            if isinstance(value, str):
+                yield value
+
+    body = request_data.get('body')
+    if not body:
+        return
+
+    stack = [body]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, str):
+            yield item
+        elif isinstance(item, dict):
+            stack.extend(reversed(list(item.values())))
+        elif isinstance(item, (list, tuple)):
+            stack.extend(reversed(item))
+
+
+class WAFEngine:
+    """
+    Literal-prefiltered pattern matcher with a verdict cache.
+    """
+
+    # Values longer than this are keyed by digest instead of by value
+    DIGEST_THRESHOLD = 256
+
+    def __init__(self, patterns: Dict[str, List[Pattern]], cache_size: int = 4096,
+                 max_cached_length: int = 65536):
+        """
+        Initialize the engine.
+
+        Args:
+            patterns: Attack type -> compiled patterns, in checking order
+            cache_size (int): Maximum cached verdicts (0 disables the cache)
+            max_cached_length (int): Longest value whose verdict is cached
+        """
+        self.checks = [
+            (attack_type, [(pattern, required_literals(pattern)) for pattern in compiled])
+            for attack_type, compiled in patterns.items()
+            if compiled
+        ]
+
+        self.cache_size = cache_size
+        self.max_cached_length = max_cached_length
+        self._verdicts = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _cache_key(self, value: str):
+        if len(value) <= self.DIGEST_THRESHOLD:
+            return value
+        return hashlib.blake2b(value.encode('utf-8', errors='surrogatepass'), digest_size=16).digest()
+
+    def _match(self, value: str) -> Optional[Tuple[str, str]]:
+        folded = fold(value)
+        for attack_type, checks in self.checks:
+            for pattern, literals in checks:
+                if literals is not None:
+                    # Plain loop: a generator per pattern costs more than the check
+                    for literal in literals:
+                        if literal in folded:
+                            break
+                    else:
+                        continue
+                match = pattern.search(value)
+                if match:
+                    return attack_type, match.group(0)
+        return None
+
+    def scan_value(self, value: str) -> Optional[Tuple[str, str]]:
+        """
+        Scan one value.
+
+        Args:
+            value (str): Value to scan
+
+        Returns:
+            Tuple of (attack_type, matched_text), or None if the value is clean
+        """
+        if self.cache_size <= 0 or len(value) > self.max_cached_length:
+            return self._match(value)
+
+        key = self._cache_key(value)
+        with self._lock:
+            if key in self._verdicts:
+                self._verdicts.move_to_end(key)
+                self.hits += 1
+                return self._verdicts[key]
+            self.misses += 1
+
+        verdict = self._match(value)
+
+        with self._lock:
+            self._verdicts[key] = verdict
+            while len(self._verdicts) > self.cache_size:
+                self._verdicts.popitem(last=False)
+        return verdict
+
+    def scan(self, values: Iterable[str]) -> Tuple[bool, Optional[str], Optional[str]]:
+        """
+        Scan values until the first attack is found. Duplicate values within
+        one request are scanned once.
+
+        Args:
+            values: Strings to scan
+
+        Returns:
+            Tuple of (is_attack, attack_type, matched_pattern)
+        """
+        seen = set()
+        for value in values:
+            if not value or value in seen:
+                continue
+            seen.add(value)
+            verdict = self.scan_value(value)
+            if verdict:
+                return True, verdict[0], verdict[1]
+        return False, None, None
@@ -13,10 +13,8 @@ from django.core.mail import send_mail
 
 from api.models import Document, EvaluationSet, EvaluationRun
 from api.ingestion.chunking_utils import chunk_text
-from api.ingestion.embeddings_utils import (
-    create_schema_if_not_exists,
-    add_document_chunk_to_weaviate
-)
+from api.ingestion.embeddings_utils import create_schema_if_not_exists
+from api.ingestion.batch_ingest import BatchIngestionEngine
 from api.evaluation.evaluation_utils import (
     run_evaluation,
     compare_runs,
@@ -46,6 +44,9 @@ def fetch_biorxiv_preprints():
     
     total_papers = 0
     
+    # Chunks from all papers are embedded and stored in batches
+    engine = BatchIngestionEngine()
+    
     # Try each keyword
     for keyword in rna_keywords:
         try:
@@ -92,8 +93,8 @@ def fetch_biorxiv_preprints():
                     # Chunk the text
                     chunks = chunk_text(full_text)
                     
-                    # Add each chunk to Weaviate
-                    for i, chunk in enumerate(chunks):
+                    # Queue each chunk for batched embedding and storage
+                    for chunk in chunks:
                         metadata = {
                             "doc_type": "paper",
                             "title": title,
@@ -102,12 +103,7 @@ def fetch_biorxiv_preprints():
                             "source": f"bioRxiv: {doi}"
                         }
                         
-                        # Add to Weaviate
-                        add_document_chunk_to_weaviate(chunk, metadata)
-                        
-                        # Rate limiting to avoid API rate limits
-                        if i > 0 and i % 5 == 0:
-                            time.sleep(1)
+                        engine.add_chunk(chunk, metadata)
                     
                     total_papers += 1
             
@@ -118,7 +114,9 @@ def fetch_biorxiv_preprints():
             print(f"Error fetching papers for keyword '{keyword}': {e}")
             continue
     
-    return f"Fetched and processed {total_papers} new preprints."
+    stats = engine.close()
+    
+    return f"Fetched and processed {total_papers} new preprints ({stats.summary()})."
 
 
 @shared_task(name="run_weekly_evaluation")
@@ -19,10 +19,10 @@ from django.conf import settings
 from django.utils import timezone
 from django.db.models import Avg, Sum, Count
 import numpy as np
-import hashlib
 import json
-from sentence_transformers import CrossEncoder
-from .offline import get_llm_client, get_cross_encoder, is_offline_mode
+import time
+from .offline import get_llm_client, is_offline_mode
+from .model_registry import get_model
 
 from .models import QueryHistory, Feedback, QueryCache, Figure
 from .serializers import (
@@ -34,6 +34,7 @@ from .serializers import (
     FigureSerializer
 )
 from .ingestion.embeddings_utils import search_weaviate
+from .rag.answer_cache import get_answer_cache
 from .analytics.hooks import measure_query_time, measure_llm_time, log_query
 from .analytics.collectors import ActivityCollector, MetricsCollector, AuditCollector
 
@@ -54,25 +55,22 @@ class QueryView(APIView):
     RAG endpoint for querying the vector store and generating answers.
     """
     
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        # Load cross-encoder model for reranking
-        try:
-            # First try to use the enhanced cross-encoder reranking
-            try:
-                from .search.reranking import get_cross_encoder
-                self.cross_encoder = get_cross_encoder()
-            except (ImportError, Exception) as e:
-                # Fall back to existing cross-encoder if enhanced one is not available
-                self.cross_encoder = get_cross_encoder()
-        except Exception as e:
-            print(f"Warning: Could not load cross-encoder: {e}")
-            self.cross_encoder = None
+    @property
+    def cross_encoder(self):
+        """
+        Cross-encoder for the fallback reranking path, loaded on first use
+        rather than whenever a view is instantiated.
+        """
+        # First try the enhanced reranking model, then the offline-aware fallback
+        model = get_model('cross_encoder')
+        if model is None:
+            model = get_model('offline_cross_encoder')
+        return model
             
     def check_query_cache(self, query, doc_type=""):
         """
-        Check if the query is in the cache and return the cached response if found.
-        Updates the hit count and last_accessed time if cache hit.
+        Check if the query (or a close paraphrase) is in the cache and return
+        the cached response if found. Hit counts are updated asynchronously.
         
         Args:
             query (str): The user's query
@@ -81,30 +79,9 @@ class QueryView(APIView):
         Returns:
             dict: Cached response or None if no cache hit
         """
-        # Create a hash of the query + doc_type for efficient lookup
-        query_key = f"{query.lower().strip()}_{doc_type}"
-        query_hash = hashlib.sha256(query_key.encode()).hexdigest()
-        
         try:
-            # Look for the query in cache
-            cached_query = QueryCache.objects.get(query_hash=query_hash)
-            
-            # Update cache metadata
-            cached_query.hit_count += 1
-            cached_query.last_accessed = timezone.now()
-            cached_query.save()
-            
-            # Return the cached response
-            return {
-                "answer": cached_query.answer,
-                "sources": cached_query.sources,
-                "confidence_score": cached_query.confidence_score,
-                "status": "success" if cached_query.confidence_score >= 0.45 else "low_confidence",
-                "cache_hit": True
-            }
-        except QueryCache.DoesNotExist:
-            # No cache hit
-            return None
+            cached_response, self.query_embedding = get_answer_cache().lookup(query, doc_type)
+            return cached_response
         except Exception as e:
             print(f"Error checking query cache: {e}")
             return None
@@ -123,24 +100,14 @@ class QueryView(APIView):
         Returns:
             bool: True if successfully cached, False otherwise
         """
-        try:
-            # Create a hash of the query + doc_type
-            query_key = f"{query.lower().strip()}_{doc_type}"
-            query_hash = hashlib.sha256(query_key.encode()).hexdigest()
-            
-            # Save to cache
-            QueryCache.objects.create(
-                query_hash=query_hash,
-                query_text=query,
-                doc_type=doc_type,
-                answer=answer,
-                sources=sources,
-                confidence_score=confidence_score
-            )
-            return True
-        except Exception as e:
-            print(f"Error saving to query cache: {e}")
-            return False
+        return get_answer_cache().store(
+            query=query,
+            doc_type=doc_type,
+            answer=answer,
+            sources=sources,
+            confidence_score=confidence_score,
+            embedding=getattr(self, 'query_embedding', None)
+        )
             
     def select_model(self, query, results, tier="default"):
         """
@@ -313,11 +280,12 @@ class QueryView(APIView):
         try:
             from .rag.enhanced_rag import enhance_rag_context
             
-            # Apply RAG enhancements to results
+            # Apply RAG enhancements to results, reusing rerank_results' scores
             enhanced_results = enhance_rag_context(
                 query=query,
                 chunks=results,
-                max_context_chunks=max_results
+                max_context_chunks=max_results,
+                already_reranked=True
             )
             
             # If successful, use the enhanced results
@@ -579,6 +547,7 @@ class QueryView(APIView):
                     # Metrics will be recorded after streaming completes
                     
                     full_answer = ""
+                    first_token_time = None
                     
                     # Yield initial metadata as SSE
                     metadata = {
@@ -588,30 +557,26 @@ class QueryView(APIView):
                     }
                     yield f"data: {json.dumps(metadata)}\n\n"
                     
-                    # Stream the content chunks
-                    if is_offline_mode():
-                        # Handle local model streaming (may be simulated)
+                    # Stream the content chunks. If the client disconnects, Django
+                    # closes this generator and the finally block stops generation.
+                    try:
                         for chunk in response:
-                            if hasattr(chunk, 'choices') and chunk.choices and hasattr(chunk.choices[0], 'delta'):
-                                content = chunk.choices[0].delta.content
-                                if content:
-                                    full_answer += content
-                                    data = {
-                                        "type": "content",
-                                        "content": content
-                                    }
-                                    yield f"data: {json.dumps(data)}\n\n"
-                    else:
-                        # Handle OpenAI streaming
-                        for chunk in response:
-                            if chunk.choices and chunk.choices[0].delta.content:
-                                content = chunk.choices[0].delta.content
+                            if not chunk.choices:
+                                continue
+                            content = getattr(chunk.choices[0].delta, 'content', None)
+                            if content:
+                                if first_token_time is None:
+                                    first_token_time = time.time()
                                 full_answer += content
                                 data = {
                                     "type": "content",
                                     "content": content
                                 }
                                 yield f"data: {json.dumps(data)}\n\n"
+                    finally:
+                        close_stream = getattr(response, 'close', None)
+                        if close_stream is not None:
+                            close_stream()
                     
                     # Calculate confidence after we have the full answer
                     confidence_score = self.calculate_confidence_score(full_answer, reranked_results)
@@ -627,6 +592,15 @@ class QueryView(APIView):
                     # Estimate token counts (approximation for streaming)
                     prompt_tokens = len(prompt.split()) * 1.3  # Rough estimate
                     completion_tokens = len(full_answer.split()) * 1.3  # Rough estimate
+                    stream_metrics = {
+                        'time_to_first_token_ms': (
+                            (first_token_time - llm_start_time) * 1000 if first_token_time else None
+                        ),
+                    }
+                    # The local engine counts sampled tokens and times decoding itself
+                    stream_metrics.update(getattr(response, 'metrics', None) or {})
+                    if stream_metrics.get('completion_tokens'):
+                        completion_tokens = stream_metrics['completion_tokens']
                     
                     MetricsCollector.record_llm_generation_time(
                         model=selected_model,
@@ -636,7 +610,8 @@ class QueryView(APIView):
                         metadata={
                             'streaming': True,
                             'confidence_score': confidence_score,
-                            'status': status_value
+                            'status': status_value,
+                            **stream_metrics
                         }
                     )
                     
@@ -980,6 +955,7 @@ class QueryCacheView(APIView):
             try:
                 entry = QueryCache.objects.get(id=entry_id)
                 entry.delete()
+                get_answer_cache().clear()
                 return Response({"message": f"Cache entry {entry_id} deleted"})
             except QueryCache.DoesNotExist:
                 return Response(
@@ -990,6 +966,7 @@ class QueryCacheView(APIView):
             # Clear entire cache
             count = QueryCache.objects.count()
             QueryCache.objects.all().delete()
+            get_answer_cache().clear()
             return Response({"message": f"{count} cache entries cleared"})
 
 
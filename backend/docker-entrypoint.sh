@@ -103,6 +103,13 @@ python initialize_db.py || {
 echo "Collecting static files..."
 python manage.py collectstatic --noinput
 
+# Start the shared rerank server so gunicorn workers share one cross-encoder copy
+# (workers fall back to loading their own model if it is not reachable)
+if [ -n "$RERANK_SERVER_SOCKET" ]; then
+  echo "Starting shared rerank server on $RERANK_SERVER_SOCKET..."
+  python manage.py run_rerank_server --socket "$RERANK_SERVER_SOCKET" &
+fi
+
 # Start Gunicorn server
 echo "Starting Gunicorn server..."
 exec gunicorn rna_backend.wsgi:application --bind 0.0.0.0:$PORT --workers 4 --timeout 120
\ No newline at end of file
@@ -0,0 +1,12 @@
+"""
+Gunicorn configuration, loaded automatically from the working directory.
+
+Command-line flags in docker-entrypoint.sh take precedence over these values.
+"""
+
+
+def post_worker_init(worker):
+    # Load the models in settings.MODEL_WARMUP after fork, before the worker
+    # accepts requests, so the first request does not pay for the load
+    from api.model_registry import warm_up_models
+    warm_up_models()
@@ -1,6 +1,7 @@
 import os
 from celery import Celery
 from celery.schedules import crontab
+from celery.signals import worker_process_init
 from django.conf import settings
 
 # Set the default Django settings module for the 'celery' program.
@@ -110,6 +111,12 @@ app.conf.beat_schedule = {
     },
 }
 
+@worker_process_init.connect
+def warm_up_worker_models(**kwargs):
+    # Load the models in settings.MODEL_WARMUP in each forked worker process
+    from api.model_registry import warm_up_models
+    warm_up_models()
+
 @app.task(bind=True, ignore_result=True)
 def debug_task(self):
     print(f'Request: {self.request!r}')
\ No newline at end of file
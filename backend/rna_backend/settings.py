@@ -73,6 +73,7 @@ MIDDLEWARE = [
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
     "api.security.error_handling.SecurityMiddleware",  # Security error handling (must be first)
     "api.security.headers.SecurityHeadersMiddleware",  # Security headers
+    "api.security.request_context.RequestContextMiddleware",  # Parse request once for security/analytics middleware
     "api.security.waf.WAFMiddleware",  # Web Application Firewall protection
     "api.security.middleware.PIIFilterMiddleware",  # PII detection and filtering
     "api.security.rate_limiting.RateLimitingMiddleware",  # API rate limiting
@@ -107,6 +108,11 @@ RATE_LIMIT_RULES = {
 }
 RATE_LIMIT_BLOCK_DURATION = 300  # 5 minutes block for limit violations
 RATE_LIMIT_ANALYTICS = True  # Log rate limit events
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "redis")  # 'redis' (shared, atomic Lua script) or 'local' (single process)
+RATE_LIMIT_LOCAL_PRECHECK = os.getenv("RATE_LIMIT_LOCAL_PRECHECK", "True") == "True"  # Reject hot clients from in-process buckets
+RATE_LIMIT_LOCAL_MAX_KEYS = 10000  # Maximum in-process buckets per worker
+RATE_LIMIT_REDIS_SOCKET_TIMEOUT = 0.5  # Seconds; the middleware fails open on Redis errors
+RATE_LIMIT_REDIS_MAX_CONNECTIONS = 50  # Redis connection pool size for rate limiting
 
 # Web Application Firewall (WAF) settings
 WAF_ENABLED = False  # Enable WAF protection
@@ -119,11 +125,15 @@ WAF_EXCLUDED_PATHS = [
 WAF_SECURITY_LEVEL = 'low'  # Options: 'low', 'medium', 'high'
 WAF_BLOCK_IP_DURATION = 600  # 10 minutes block for repeated attacks
 WAF_MAX_VIOLATIONS = 3  # Number of violations before blocking IP
+WAF_VERDICT_CACHE_SIZE = 4096  # Cached scan verdicts for repeated identical values
 
 # Connection security settings
 ENABLE_CONNECTION_TIMEOUT = True
 CONNECTION_TIMEOUT_SECONDS = 1800  # 30 minutes of inactivity
 CONNECTION_CLEANUP_INTERVAL = 300  # 5 minutes between cleanup runs
+CONNECTION_TRACKING_BACKEND = os.getenv("CONNECTION_TRACKING_BACKEND", "local")  # 'local' (per process, sharded) or 'redis' (shared by all workers)
+CONNECTION_TRACKER_SHARDS = 16  # Lock shards for local connection tracking
+CONNECTION_EXPIRED_RETENTION_SECONDS = 86400  # How long a timed-out session is remembered so its next request is rejected
 MAX_CONNECTIONS_PER_IP = 10  # Maximum simultaneous connections per IP
 
 # Differential privacy settings
@@ -252,9 +262,19 @@ CACHES = {
     }
 }
 
+# Redis connection used by the embedding cache
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379")
+
+# Embedding cache settings
+EMBEDDING_CACHE_DTYPE = os.getenv("EMBEDDING_CACHE_DTYPE", "float32")  # 'float32' or 'float16'
+EMBEDDING_CACHE_TTL = 60 * 60 * 24 * 30  # 30 days
+EMBEDDING_CACHE_MAX_CONNECTIONS = 50  # Redis connection pool size
+
 # Weaviate settings
 WEAVIATE_URL = os.getenv("WEAVIATE_URL", "http://localhost:8080")
 WEAVIATE_API_KEY = os.getenv("WEAVIATE_API_KEY", "")
+VECTOR_SEARCH_TIMEOUT = float(os.getenv("VECTOR_SEARCH_TIMEOUT", "10"))  # Seconds to wait for each collection query
+VECTOR_SEARCH_MAX_WORKERS = int(os.getenv("VECTOR_SEARCH_MAX_WORKERS", "8"))  # Threads for concurrent collection queries
 
 # Weaviate mTLS settings
 WEAVIATE_TLS_ENABLED = os.getenv("WEAVIATE_TLS_ENABLED", "False") == "True"
@@ -274,11 +294,31 @@ LLM_FORCE_ISOLATION = os.getenv("LLM_FORCE_ISOLATION", "False") == "True"
 OLLAMA_API_URL = os.getenv("OLLAMA_API_URL", "http://localhost:11434")
 OLLAMA_DEFAULT_MODEL = os.getenv("OLLAMA_DEFAULT_MODEL", "llama3:8b")
 OLLAMA_TIMEOUT = int(os.getenv("OLLAMA_TIMEOUT", "60"))
+LLM_HTTP_POOL_SIZE = int(os.getenv("LLM_HTTP_POOL_SIZE", "20"))  # Keep-alive connections per LLM endpoint per process
+LLM_HTTP_CONNECT_TIMEOUT = 5  # Seconds to establish a connection to an LLM endpoint
+LLM_HTTP_MAX_RETRIES = 2  # Retries for failed OpenAI requests
+LLM_HTTP_TIMEOUTS = {}  # Per-endpoint (connect, read) overrides, e.g. {'ollama': (2, 120)}
 
 # Local embedding model settings
 LOCAL_EMBEDDING_MODEL_PATH = os.getenv("LOCAL_EMBEDDING_MODEL_PATH", "")
 LOCAL_EMBEDDING_TOKENIZER_PATH = os.getenv("LOCAL_EMBEDDING_TOKENIZER_PATH", "")
 LOCAL_EMBEDDING_DIMENSION = int(os.getenv("LOCAL_EMBEDDING_DIMENSION", "768"))
+LOCAL_EMBEDDING_MAX_LENGTH = 512  # Tokens per text before truncation
+LOCAL_EMBEDDING_BATCH_SIZE = int(os.getenv("LOCAL_EMBEDDING_BATCH_SIZE", "32"))  # Texts per ONNX inference call
+LOCAL_EMBEDDING_INTRA_OP_THREADS = int(os.getenv("LOCAL_EMBEDDING_INTRA_OP_THREADS", "0"))  # ONNX Runtime threads per operator (0 = auto)
+LOCAL_EMBEDDING_INTER_OP_THREADS = int(os.getenv("LOCAL_EMBEDDING_INTER_OP_THREADS", "0"))  # ONNX Runtime threads across operators (0 = auto)
+
+# Models loaded once per worker right after fork (comma-separated registry names, e.g. "cross_encoder,local_llm"); others load on first use
+MODEL_WARMUP = [name.strip() for name in os.getenv("MODEL_WARMUP", "").split(",") if name.strip()]
+MODEL_LOAD_RETRY_SECONDS = int(os.getenv("MODEL_LOAD_RETRY_SECONDS", "60"))  # Wait before retrying a model that failed to load
+
+# Batched ingestion settings
+INGESTION_BATCH_SIZE = int(os.getenv("INGESTION_BATCH_SIZE", "64"))  # Chunks per embedding request
+INGESTION_MAX_WORKERS = int(os.getenv("INGESTION_MAX_WORKERS", "4"))  # Concurrent embedding requests
+EMBEDDING_REQUESTS_PER_MINUTE = int(os.getenv("EMBEDDING_REQUESTS_PER_MINUTE", "3000"))
+EMBEDDING_TOKENS_PER_MINUTE = int(os.getenv("EMBEDDING_TOKENS_PER_MINUTE", "1000000"))
+PDF_EXTRACTION_WORKERS = int(os.getenv("PDF_EXTRACTION_WORKERS", "0")) or None  # Processes for PDF page extraction (default: CPU count)
+PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", "8"))  # Pages extracted per worker task
 
 # Static files (CSS, JavaScript, Images)
 # https://docs.djangoproject.com/en/4.2/howto/static-files/
@@ -321,10 +361,42 @@ REST_FRAMEWORK = {
 CHUNK_SIZE = 400
 CHUNK_OVERLAP = 100
 
+# Search settings
+SUGGESTION_INDEX_REFRESH_SECONDS = 30  # How often workers sync the semantic suggestion index
+AUTOCOMPLETE_TOP_K = 20  # Completions kept per trie node (upper bound on the autocomplete limit)
+AUTOCOMPLETE_INDEX_REFRESH_SECONDS = 30  # How often workers sync the autocomplete index
+AUTOCOMPLETE_FLUSH_SECONDS = 5  # How often recorded completion counts are written
+AUTOCOMPLETE_WRITE_BEHIND = os.getenv('AUTOCOMPLETE_WRITE_BEHIND', 'True') == 'True'  # Batch completion writes instead of writing per query
+SEARCH_DEFERRED_USAGE = os.getenv('SEARCH_DEFERRED_USAGE', 'True') == 'True'  # Write search usage counters after the response
+SEARCH_USAGE_FLUSH_SECONDS = 2  # How often coalesced search usage counters are written
+RERANK_BATCH_SIZE = 32  # Cross-encoder pairs per forward pass
+RERANK_SCORE_CACHE_SIZE = 10000  # Cached (query, chunk) cross-encoder scores per worker
+RERANK_MICRO_BATCHING = os.getenv('RERANK_MICRO_BATCHING', 'True') == 'True'  # Merge concurrent rerank requests into one predict call
+RERANK_BATCH_WAIT_MS = float(os.getenv('RERANK_BATCH_WAIT_MS', '5'))  # How long a batch waits for more requests
+RERANK_MAX_BATCH_PAIRS = int(os.getenv('RERANK_MAX_BATCH_PAIRS', '128'))  # Upper bound on pairs in one merged batch
+RERANK_SERVER_SOCKET = os.getenv('RERANK_SERVER_SOCKET', '')  # Unix socket of a shared run_rerank_server process (started by docker-entrypoint.sh when set)
+RERANK_SERVER_TIMEOUT = float(os.getenv('RERANK_SERVER_TIMEOUT', '10'))  # Seconds to wait for the shared rerank server
+
+# Query answer cache settings
+QUERY_CACHE_LRU_SIZE = 1024  # In-process LRU entries per worker
+QUERY_CACHE_LRU_TTL = 300  # Seconds before an in-process entry is re-read from the database
+QUERY_CACHE_HIT_FLUSH_SECONDS = 5  # Interval for batched hit-count write-back
+SEMANTIC_CACHE_ENABLED = True  # Reuse answers for paraphrased queries
+SEMANTIC_CACHE_SIMILARITY_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_SIMILARITY_THRESHOLD", "0.93"))
+SEMANTIC_CACHE_REFRESH_SECONDS = 30  # How often workers sync cached query embeddings
+
 # Analytics settings
 ANALYTICS_ENABLED = True
 ANALYTICS_RETENTION_DAYS = 90  # Days to keep raw analytics data
 ANALYTICS_MONITOR_SYSTEM = True  # Enable system performance monitoring
+ANALYTICS_BUFFERED_WRITES = os.getenv('ANALYTICS_BUFFERED_WRITES', 'True') == 'True'  # Write request-path metrics in the background
+ANALYTICS_BUFFER_MAX_SIZE = 10000  # Queued analytics rows per process before the oldest are dropped
+ANALYTICS_BUFFER_BATCH_SIZE = 500  # Rows per bulk insert; a full batch triggers an early flush
+ANALYTICS_BUFFER_FLUSH_MS = 1000  # Maximum delay before queued analytics rows are written
+METRIC_ROLLUPS_ENABLED = os.getenv('METRIC_ROLLUPS_ENABLED', 'True') == 'True'  # Maintain minute/hour/day rollups for SystemMetric
+METRIC_ROLLUP_SKETCH_ACCURACY = 0.01  # Relative error of rollup quantile estimates (p50/p95/p99)
+METRIC_ROLLUP_MINUTE_RETENTION_DAYS = 7  # Days of per-minute rollup buckets to keep
+METRIC_ROLLUP_HOUR_RETENTION_DAYS = 90  # Days of per-hour rollup buckets to keep; day buckets are kept
 ANALYTICS_SENSITIVE_PATHS = [
     '/admin/',
     '/api/auth/',
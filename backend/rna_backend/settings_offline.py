@@ -17,6 +17,7 @@ LOCAL_LLM_CONFIG = {
     "ctx_size": 4096,
     "n_gpu_layers": -1,  # Use all available GPU layers
     "embedding_model_path": os.path.join(BASE_DIR, "models", "embeddings", "all-MiniLM-L6-v2"),
+    "prompt_cache_mb": 512,  # KV-state snapshots of shared prompt prefixes; 0 disables
 }
 
 # Configure Cross Encoder to use local model
@@ -41,6 +42,9 @@ CACHES = {
     }
 }
 
+# No Redis offline: keep rate limit buckets in process memory
+RATE_LIMIT_BACKEND = "local"
+
 # Celery configuration for offline mode (using filesystem broker)
 CELERY_BROKER_URL = f"filesystem://{os.path.join(BASE_DIR, 'celery_broker')}"
 CELERY_BROKER_TRANSPORT_OPTIONS = {
@@ -63,6 +67,8 @@ USE_LOCAL_VECTOR_DB = True
 LOCAL_VECTOR_DB_CONFIG = {
     "engine": "qdrant",  # or "chroma", "faiss"
     "path": os.path.join(BASE_DIR, "vector_db"),
+    "faiss_compact_threshold": 50000,  # Logged vectors before the FAISS snapshot is rewritten
+    "faiss_mmap": True,  # Memory-map FAISS snapshots so workers share pages
 }
 
 # Disable network-dependent components